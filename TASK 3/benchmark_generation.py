@@ -0,0 +1,125 @@
+import argparse
+import json
+import os
+import threading
+import time
+import numpy as np
+import logging
+
+from generate_and_save_midi import WEIGHTS_FILENAME, MusicGenerator, generate_music_sequence, load_music_data, load_vocabulary
+from generation_scheduler import GenerationScheduler
+from lstm_engine import ENGINES, NUMPY_ENGINES, NumpyLSTM, create_engine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TASK3_DIR = os.path.abspath(os.path.dirname(__file__))
+LENGTHS = (50, 200, 1000)
+
+def bench_engine(engine, music_data, lengths, repeats, seed=0):
+    """Notes/sec of `generate_music_sequence` with `engine` for each piece length"""
+    model, network_input, note_to_int, int_to_note, n_vocab, sequence_length = music_data
+    results = {}
+    for length in lengths:
+        np.random.seed(seed)
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            generate_music_sequence(model, network_input, note_to_int, int_to_note, n_vocab, sequence_length,
+                                    num_notes=length, engine=engine)
+            times.append(time.perf_counter() - start)
+        best = min(times)
+        results[length] = {
+            'best_s': best,
+            'mean_s': sum(times) / len(times),
+            'notes_per_s': length / best
+        }
+    return results
+
+def bench_concurrent(generator, clients, length, max_batch):
+    """Notes/sec of `clients` simultaneous pieces, one after another and through the batching scheduler"""
+    start = time.perf_counter()
+    for seed in range(clients):
+        generator.generate('default', length, seed=seed)
+    sequential = time.perf_counter() - start
+
+    scheduler = GenerationScheduler(generator, max_batch)
+    generator.attach_scheduler(scheduler)
+    threads = [threading.Thread(target=generator.generate, args=('default', length), kwargs={'seed': seed})
+               for seed in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batched = time.perf_counter() - start
+    stats = scheduler.stats()
+    scheduler.close()
+    generator.attach_scheduler(None)
+
+    return {
+        'clients': clients,
+        'length': length,
+        'sequential_notes_per_s': clients * length / sequential,
+        'batched_notes_per_s': clients * length / batched,
+        'mean_batch': stats['mean_batch'],
+        'mean_queue_wait_ms': stats['queue_wait_ms']['mean']
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark notes/sec of the music generation engines')
+    parser.add_argument('--engines', nargs='+', default=list(ENGINES), choices=list(ENGINES),
+                       help='Engines to compare (predict is the original per-note model.predict loop)')
+    parser.add_argument('--lengths', type=int, nargs='+', default=list(LENGTHS), help='Piece lengths in notes')
+    parser.add_argument('--repeats', type=int, default=3, help='Runs per length (the best one is reported)')
+    parser.add_argument('--clients', type=int, default=0,
+                       help='Also generate this many pieces concurrently through the batching scheduler')
+    parser.add_argument('--max-batch', type=int, default=16, help='Scheduler batch size for --clients')
+    parser.add_argument('--json', default=None, help='Write results to this JSON file')
+
+    args = parser.parse_args()
+
+    if all(name in NUMPY_ENGINES for name in args.engines):
+        music_data = (None,) + load_vocabulary(TASK3_DIR)
+    else:
+        music_data = load_music_data(TASK3_DIR)
+    model, network_input, n_vocab = music_data[0], music_data[1], music_data[4]
+
+    print("🎵 Music Generation Benchmark")
+    print("=" * 60)
+    results = {}
+    for name in args.engines:
+        engine = create_engine(name, NumpyLSTM(os.path.join(TASK3_DIR, WEIGHTS_FILENAME))
+                               if name in NUMPY_ENGINES else model, n_vocab)
+        # Warm up: graph tracing is a startup cost, not a per-note one
+        engine.step([0], engine.start([network_input[0]])[1])
+        results[name] = bench_engine(engine, music_data, args.lengths, args.repeats)
+        for length, result in results[name].items():
+            print(f"{name:<12} {length:>5} notes: {result['best_s'] * 1000:8.1f} ms, "
+                  f"{result['notes_per_s']:8.1f} notes/s")
+
+    if 'predict' in results:
+        print("\nSpeedup over model.predict:")
+        for name in results:
+            if name != 'predict':
+                speedups = [f"{length}: {results[name][length]['notes_per_s'] / results['predict'][length]['notes_per_s']:.1f}x"
+                            for length in args.lengths]
+                print(f"  {name:<12} {', '.join(speedups)}")
+
+    if args.clients:
+        print(f"\nConcurrent generation ({args.clients} clients, {args.lengths[0]} notes each):")
+        for name in args.engines:
+            generator = MusicGenerator(TASK3_DIR, engine=name)
+            result = bench_concurrent(generator, args.clients, args.lengths[0], args.max_batch)
+            results[name]['concurrent'] = result
+            print(f"  {name:<12} sequential {result['sequential_notes_per_s']:8.1f} notes/s, "
+                  f"batched {result['batched_notes_per_s']:8.1f} notes/s "
+                  f"(mean batch {result['mean_batch']:.1f}, mean queue wait {result['mean_queue_wait_ms']:.1f} ms)")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'repeats': args.repeats, 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+if __name__ == '__main__':
+    main()
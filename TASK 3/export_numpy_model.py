@@ -0,0 +1,69 @@
+import argparse
+import os
+import sys
+import numpy as np
+import logging
+
+from generate_and_save_midi import MODEL_FILENAME, WEIGHTS_FILENAME, generate_music_sequence, load_music_data
+from lstm_engine import NumpyLSTM, create_engine, export_weights
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TASK3_DIR = os.path.abspath(os.path.dirname(__file__))
+
+def check_parity(music_data, weights_path, seeds=5, num_notes=100, tolerance=1e-5):
+    """Compare the NumPy engines with the Keras model; returns True when they agree.
+
+    Every window of the sequence table goes through `model.predict` and the
+    NumPy window engine, then whole pieces are generated with each NumPy engine
+    and its Keras counterpart from the same seeds, which must pick the same notes.
+    """
+    model, network_input, note_to_int, int_to_note, n_vocab, sequence_length = music_data
+    lstm = NumpyLSTM(weights_path)
+    ok = True
+
+    keras_probabilities = create_engine('predict', model, n_vocab).start(network_input)[0]
+    numpy_probabilities = create_engine('numpy-window', lstm, n_vocab).start(network_input)[0]
+    difference = np.abs(keras_probabilities - numpy_probabilities).max()
+    argmax_matches = np.mean(keras_probabilities.argmax(axis=1) == numpy_probabilities.argmax(axis=1))
+    print(f"predict vs numpy-window on {len(network_input)} windows: max |diff| {difference:.2e}, "
+          f"argmax agreement {argmax_matches:.1%}")
+    ok &= difference <= tolerance and argmax_matches == 1.0
+
+    for keras_name, numpy_name in (('window', 'numpy-window'), ('stepwise', 'numpy')):
+        keras_engine = create_engine(keras_name, model, n_vocab)
+        numpy_engine = create_engine(numpy_name, lstm, n_vocab)
+        mismatches = 0
+        for seed in range(seeds):
+            for style in ('default', 'jazz'):
+                pieces = [generate_music_sequence(model, network_input, note_to_int, int_to_note, n_vocab,
+                                                  sequence_length, num_notes=num_notes, style=style, engine=engine,
+                                                  rng=np.random.RandomState(seed))
+                          for engine in (keras_engine, numpy_engine)]
+                mismatches += pieces[0] != pieces[1]
+        print(f"{keras_name} vs {numpy_name}: {seeds * 2 - mismatches}/{seeds * 2} pieces of {num_notes} notes identical")
+        ok &= mismatches == 0
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the Keras music model to .npz weights for the NumPy engines')
+    parser.add_argument('--output', default=os.path.join(TASK3_DIR, WEIGHTS_FILENAME), help='Output .npz file')
+    parser.add_argument('--check', action='store_true',
+                       help='Check that the NumPy engines reproduce the Keras model (exits 1 on mismatch)')
+    parser.add_argument('--tolerance', type=float, default=1e-5, help='Largest allowed probability difference')
+
+    args = parser.parse_args()
+
+    music_data = load_music_data(TASK3_DIR)
+    export_weights(music_data[0], args.output, os.path.join(TASK3_DIR, MODEL_FILENAME))
+    logger.info(f"Exported weights to {args.output} ({os.path.getsize(args.output) / 1024:.0f} KB)")
+
+    if args.check:
+        if not check_parity(music_data, args.output, tolerance=args.tolerance):
+            print("❌ NumPy engines do not match the Keras model")
+            sys.exit(1)
+        print("✅ NumPy engines match the Keras model")
+
+if __name__ == '__main__':
+    main()
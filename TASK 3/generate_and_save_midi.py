@@ -2,16 +2,22 @@ import pickle
 import numpy as np
 import argparse
 import os
-from keras.models import load_model
+import threading
+import time
 from music21 import instrument, note, stream, chord
+from lstm_engine import ENGINES, NUMPY_ENGINES, NumpyLSTM, PredictEngine, create_engine, file_digest
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def load_music_data():
+MODEL_FILENAME = 'music_model.h5'
+# Weights exported by export_numpy_model.py for the NumPy engines
+WEIGHTS_FILENAME = 'music_model.npz'
+
+def load_vocabulary(data_dir=''):
     try:
-        with open('notes.pkl', 'rb') as f:
+        with open(os.path.join(data_dir, 'notes.pkl'), 'rb') as f:
             notes = pickle.load(f)
         
         pitches = sorted(set(notes))
@@ -28,55 +34,79 @@ def load_music_data():
         if not network_input:
             raise ValueError("Not enough data to generate music.")
         
-        model = load_model('music_model.h5')
-        
-        return model, network_input, note_to_int, int_to_note, n_vocab, sequence_length
+        return network_input, note_to_int, int_to_note, n_vocab, sequence_length
         
     except Exception as e:
         logger.error(f"Error loading music data: {e}")
         raise
 
+def load_music_data(data_dir=''):
+    # Imported here so the NumPy engines never pull in TensorFlow
+    from keras.models import load_model
+    
+    network_input, note_to_int, int_to_note, n_vocab, sequence_length = load_vocabulary(data_dir)
+    try:
+        model = load_model(os.path.join(data_dir, MODEL_FILENAME))
+    except Exception as e:
+        logger.error(f"Error loading music model: {e}")
+        raise
+    
+    return model, network_input, note_to_int, int_to_note, n_vocab, sequence_length
+
+def default_engine(data_dir=''):
+    """The NumPy engine when exported weights exist, the Keras step-wise engine otherwise"""
+    return 'numpy' if os.path.exists(os.path.join(data_dir, WEIGHTS_FILENAME)) else 'stepwise'
+
+def apply_temperature(prediction, temperature):
+    if temperature != 1.0:
+        prediction = np.log(prediction) / temperature
+        prediction = np.exp(prediction)
+        prediction = prediction / np.sum(prediction)
+    return prediction
+
+def choose_notes(prediction, note_index, style='default'):
+    """Indices of the notes played at this step; the first one continues the sequence"""
+    if style == 'jazz' and note_index % 4 == 0:
+        return np.argsort(prediction)[-3:]
+    return [np.argmax(prediction)]
+
+def seed_pattern(network_input, style='default', rng=np.random):
+    """Style-dependent random starting window, copied so the shared sequence table is never modified"""
+    if style == 'classical':
+        start = rng.randint(0, len(network_input)//2)
+    elif style == 'jazz':
+        start = rng.randint(len(network_input)//4, len(network_input)-1)
+    else:
+        start = rng.randint(0, len(network_input)-1)
+    return list(network_input[start])
+
+def note_duration(style='default'):
+    if style == 'ambient':
+        return 1.0
+    elif style == 'rock':
+        return 0.25
+    return 0.5
+
 def generate_music_sequence(model, network_input, note_to_int, int_to_note, n_vocab, sequence_length, 
-                          num_notes=50, temperature=0.7, style='default'):
+                          num_notes=50, temperature=0.7, style='default', engine=None, rng=np.random):
     try:
-        if style == 'classical':
-            start = np.random.randint(0, len(network_input)//2)
-        elif style == 'jazz':
-            start = np.random.randint(len(network_input)//4, len(network_input)-1)
-        else:
-            start = np.random.randint(0, len(network_input)-1)
-        
-        pattern = network_input[start]
+        pattern = seed_pattern(network_input, style, rng)
+        duration = note_duration(style)
         output_notes = []
         
-        if style == 'ambient':
-            note_duration = 1.0
-        elif style == 'rock':
-            note_duration = 0.25
-        else:
-            note_duration = 0.5
+        if engine is None:
+            engine = PredictEngine(model, n_vocab)
+        prediction, state = engine.start([pattern])
         
         for note_index in range(num_notes):
-            prediction_input = np.reshape(pattern, (1, sequence_length, 1)) / float(n_vocab)
-            prediction = model.predict(prediction_input, verbose=0)
-            
-            if temperature != 1.0:
-                prediction = np.log(prediction) / temperature
-                prediction = np.exp(prediction)
-                prediction = prediction / np.sum(prediction)
-            
-            if style == 'jazz' and note_index % 4 == 0:
-                indices = np.argsort(prediction[0])[-3:]
-            else:
-                index = np.argmax(prediction)
-                indices = [index]
+            indices = choose_notes(apply_temperature(prediction[0], temperature), note_index, style)
             
             for idx in indices:
                 result = int_to_note[idx]
-                output_notes.append((result, note_duration))
+                output_notes.append((result, duration))
             
-            pattern.append(indices[0])
-            pattern = pattern[1:]
+            if note_index < num_notes - 1:
+                prediction, state = engine.step([indices[0]], state)
         
         return output_notes
         
@@ -121,6 +151,103 @@ def create_midi_stream(output_notes, style='default'):
         logger.error(f"Error creating MIDI stream: {e}")
         raise
 
+class MusicGenerator:
+    """Model, vocabulary and sequence table loaded once and reused for every piece.
+
+    The backend keeps one instance for the life of the process, so a request
+    only pays for generating its notes and writing the MIDI file. Without a
+    scheduler pieces are generated one at a time under a lock (Keras models are
+    not safe to call from several threads at once); with one attached
+    (`attach_scheduler`) concurrent requests are generated together in batches.
+    The load time and per-request timings are kept for /health.
+    """
+    def __init__(self, data_dir='', engine=None):
+        start = time.perf_counter()
+        engine = engine or default_engine(data_dir)
+        if engine in NUMPY_ENGINES:
+            (self.network_input, self.note_to_int, self.int_to_note,
+             self.n_vocab, self.sequence_length) = load_vocabulary(data_dir)
+            self.model = NumpyLSTM(os.path.join(data_dir, WEIGHTS_FILENAME))
+            self.model_version = self.model.version
+            model_path = os.path.join(data_dir, MODEL_FILENAME)
+            if os.path.exists(model_path) and file_digest(model_path) != self.model_version:
+                logger.warning(f"{WEIGHTS_FILENAME} was not exported from the current {MODEL_FILENAME}; "
+                               f"run export_numpy_model.py again")
+        else:
+            (self.model, self.network_input, self.note_to_int, self.int_to_note,
+             self.n_vocab, self.sequence_length) = load_music_data(data_dir)
+            self.model_version = file_digest(os.path.join(data_dir, MODEL_FILENAME))
+        self.engine = create_engine(engine, self.model, self.n_vocab)
+        # The first call builds the inference graph; do it before any request
+        self.engine.step([0], self.engine.start([self.network_input[0]])[1])
+        self.load_seconds = time.perf_counter() - start
+        self.loaded_at = time.time()
+        logger.info(f"Music model loaded in {self.load_seconds:.2f}s ({self.n_vocab} notes in vocabulary, "
+                    f"{self.engine.name} engine)")
+
+        self.scheduler = None
+        self.lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.notes_generated = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_seconds = None
+
+    def attach_scheduler(self, scheduler):
+        self.scheduler = scheduler
+
+    def generate(self, style='default', num_notes=50, temperature=0.7, seed=None):
+        """List of (note, duration) for one piece; the same seed gives the same piece"""
+        if self.scheduler is not None:
+            return self.scheduler.generate(style, num_notes, temperature, seed)
+        rng = np.random.RandomState(seed) if seed is not None else np.random
+        with self.lock:
+            return generate_music_sequence(
+                self.model, self.network_input, self.note_to_int, self.int_to_note, self.n_vocab,
+                self.sequence_length, num_notes=num_notes, temperature=temperature, style=style,
+                engine=self.engine, rng=rng
+            )
+
+    def compose(self, output_path, style='default', num_notes=50, temperature=0.7, seed=None):
+        """Generate a piece and write it to `output_path` as MIDI; returns the notes"""
+        start = time.perf_counter()
+        try:
+            output_notes = self.generate(style, num_notes, temperature, seed)
+            create_midi_stream(output_notes, style).write('midi', fp=output_path)
+        except Exception:
+            with self.stats_lock:
+                self.failures += 1
+            raise
+        elapsed = time.perf_counter() - start
+        with self.stats_lock:
+            self.requests += 1
+            self.notes_generated += len(output_notes)
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+            self.last_seconds = elapsed
+        return output_notes
+
+    def stats(self):
+        return {
+            'loaded': True,
+            'engine': self.engine.name,
+            'model_version': self.model_version,
+            'load_ms': self.load_seconds * 1000,
+            'loaded_at': self.loaded_at,
+            'uptime_s': time.time() - self.loaded_at,
+            'vocabulary': self.n_vocab,
+            'sequences': len(self.network_input),
+            'requests': self.requests,
+            'failures': self.failures,
+            'notes_generated': self.notes_generated,
+            'last_ms': self.last_seconds * 1000 if self.last_seconds is not None else None,
+            'mean_ms': self.total_seconds / self.requests * 1000 if self.requests else None,
+            'max_ms': self.max_seconds * 1000,
+            'scheduler': self.scheduler.stats() if self.scheduler is not None else None
+        }
+
 def main():
     parser = argparse.ArgumentParser(description='Generate MIDI music using LSTM model')
     parser.add_argument('--style', default='default', choices=['classical', 'jazz', 'pop', 'ambient', 'rock', 'default'],
@@ -128,22 +255,18 @@ def main():
     parser.add_argument('--length', type=int, default=50, help='Number of notes to generate')
     parser.add_argument('--temperature', type=float, default=0.7, help='Creativity temperature (0.1-2.0)')
     parser.add_argument('--output', default='generated_music.mid', help='Output MIDI filename')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for a reproducible piece')
+    parser.add_argument('--engine', default=None, choices=list(ENGINES),
+                       help='Inference engine (numpy/stepwise carry the LSTM state, numpy-window/window/predict '
+                            're-run the full window; default numpy when music_model.npz exists, else stepwise)')
     
     args = parser.parse_args()
     
     try:
         logger.info(f"Generating {args.style} music with {args.length} notes...")
         
-        model, network_input, note_to_int, int_to_note, n_vocab, sequence_length = load_music_data()
-        
-        output_notes = generate_music_sequence(
-            model, network_input, note_to_int, int_to_note, n_vocab, sequence_length,
-            num_notes=args.length, temperature=args.temperature, style=args.style
-        )
-        
-        output_stream = create_midi_stream(output_notes, args.style)
-        
-        output_stream.write('midi', fp=args.output)
+        generator = MusicGenerator(engine=args.engine)
+        generator.compose(args.output, args.style, args.length, args.temperature, args.seed)
         logger.info(f"Generated music saved to {args.output}")
         
         return True
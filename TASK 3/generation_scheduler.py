@@ -0,0 +1,217 @@
+import itertools
+import queue
+import threading
+import time
+from collections import deque
+import numpy as np
+import logging
+
+from generate_and_save_midi import apply_temperature, choose_notes, note_duration, seed_pattern
+from lstm_engine import concat_states, take_states
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class GenerationJob:
+    """One piece to generate; `wait` blocks until the scheduler finished it"""
+    ids = itertools.count(1)
+
+    def __init__(self, style='default', num_notes=50, temperature=0.7, seed=None):
+        self.id = next(self.ids)
+        self.style = style
+        self.num_notes = int(num_notes)
+        self.temperature = float(temperature)
+        self.seed = seed
+        self.rng = np.random.RandomState(seed) if seed is not None else np.random
+        self.duration = note_duration(style)
+        self.output_notes = []
+        self.note_index = 0
+        self.error = None
+        self.done = threading.Event()
+        self.queued = time.perf_counter()
+        self.started = None
+        self.finished = None
+
+    def wait(self, timeout=None):
+        """The generated (note, duration) list; raises the job's error if it failed"""
+        if not self.done.wait(timeout):
+            raise TimeoutError(f"Generation job {self.id} did not finish in {timeout}s")
+        if self.error is not None:
+            raise self.error
+        return self.output_notes
+
+class GenerationScheduler:
+    """Generates concurrent requests together, one batched engine step per note.
+
+    Requests are queued as jobs, each with its own style, length, temperature
+    and random seed. A single worker thread owns the engine: at every step it
+    admits waiting jobs into the batch (up to `max_batch`, their seed windows
+    fed in one batched `start`), samples the next note of every active job from
+    its row of the batched prediction, retires the jobs that reached their
+    length and advances the rest with one batched `step`. Since only the worker
+    calls the model, requests need no lock around it.
+    """
+    def __init__(self, generator, max_batch=16, window=5.0):
+        self.generator = generator
+        self.engine = generator.engine
+        self.max_batch = max(1, int(max_batch))
+        self.window = window
+        self.jobs = queue.Queue()
+        self.running = True
+
+        self.lock = threading.Lock()
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.steps = 0
+        self.batched_rows = 0
+        self.notes_generated = 0
+        self.recent_steps = deque()
+        self.waits = deque(maxlen=100)
+        self.durations = deque(maxlen=100)
+
+        self.thread = threading.Thread(target=self.run, name='generation-scheduler', daemon=True)
+        self.thread.start()
+
+    def submit(self, style='default', num_notes=50, temperature=0.7, seed=None):
+        if num_notes < 1:
+            raise ValueError("num_notes must be at least 1")
+        if not self.running:
+            raise RuntimeError("Generation scheduler is stopped")
+        job = GenerationJob(style, num_notes, temperature, seed)
+        self.jobs.put(job)
+        return job
+
+    def generate(self, style='default', num_notes=50, temperature=0.7, seed=None, timeout=None):
+        """Submit a job and wait for its notes"""
+        return self.submit(style, num_notes, temperature, seed).wait(timeout)
+
+    def admit(self, active):
+        """Waiting jobs that fit in the batch; blocks while nothing is active"""
+        admitted = []
+        while len(active) + len(admitted) < self.max_batch:
+            try:
+                job = self.jobs.get(block=not active and not admitted, timeout=0.5)
+            except queue.Empty:
+                break
+            if job is None:
+                break
+            job.started = time.perf_counter()
+            admitted.append(job)
+        return admitted
+
+    def run(self):
+        active = []
+        probabilities = state = None
+        while self.running or active:
+            admitted = []
+            try:
+                admitted = self.admit(active)
+                if admitted:
+                    patterns = [seed_pattern(self.generator.network_input, job.style, job.rng) for job in admitted]
+                    new_probabilities, new_state = self.engine.start(patterns)
+                    if active:
+                        probabilities = np.concatenate([probabilities, new_probabilities])
+                        state = concat_states(state, new_state)
+                    else:
+                        probabilities, state = new_probabilities, new_state
+                    active += admitted
+                    with self.lock:
+                        self.active = len(active)
+                if not active:
+                    continue
+
+                rows, tokens = [], []
+                for row, job in enumerate(active):
+                    indices = choose_notes(apply_temperature(probabilities[row], job.temperature),
+                                           job.note_index, job.style)
+                    job.output_notes.extend((self.generator.int_to_note[idx], job.duration) for idx in indices)
+                    job.note_index += 1
+                    if job.note_index < job.num_notes:
+                        rows.append(row)
+                        tokens.append(indices[0])
+                    else:
+                        self.finish(job)
+
+                self.record_step(len(active))
+                active = [active[row] for row in rows]
+                if active:
+                    probabilities, state = self.engine.step(tokens, take_states(state, rows))
+            except Exception as e:
+                logger.error(f"Error in batched generation step: {e}")
+                # Jobs that completed earlier in this step keep their result
+                for job in active + [job for job in admitted if job not in active]:
+                    if job.finished is None:
+                        self.finish(job, e)
+                active = []
+            with self.lock:
+                self.active = len(active)
+
+    def finish(self, job, error=None):
+        job.error = error
+        job.finished = time.perf_counter()
+        with self.lock:
+            if error is None:
+                self.completed += 1
+                self.waits.append(job.started - job.queued)
+                self.durations.append(job.finished - job.queued)
+            else:
+                self.failed += 1
+        job.done.set()
+
+    def record_step(self, batch_size):
+        now = time.perf_counter()
+        with self.lock:
+            self.steps += 1
+            self.batched_rows += batch_size
+            self.notes_generated += batch_size
+            self.recent_steps.append((now, batch_size))
+            while self.recent_steps[0][0] < now - self.window:
+                self.recent_steps.popleft()
+
+    def notes_per_second(self):
+        now = time.perf_counter()
+        recent = [(t, n) for t, n in self.recent_steps if t >= now - self.window]
+        if len(recent) < 2:
+            return 0.0
+        return sum(n for _, n in recent[1:]) / (recent[-1][0] - recent[0][0] or 1e-9)
+
+    def stats(self):
+        with self.lock:
+            waits = list(self.waits)
+            durations = list(self.durations)
+            return {
+                'engine': self.engine.name,
+                'max_batch': self.max_batch,
+                'queued': self.jobs.qsize(),
+                'active': self.active,
+                'completed': self.completed,
+                'failed': self.failed,
+                'steps': self.steps,
+                'mean_batch': self.batched_rows / self.steps if self.steps else None,
+                'notes_generated': self.notes_generated,
+                'notes_per_s': self.notes_per_second(),
+                'queue_wait_ms': {
+                    'last': waits[-1] * 1000 if waits else None,
+                    'mean': sum(waits) / len(waits) * 1000 if waits else None,
+                    'max': max(waits) * 1000 if waits else None
+                },
+                'request_ms': {
+                    'last': durations[-1] * 1000 if durations else None,
+                    'mean': sum(durations) / len(durations) * 1000 if durations else None,
+                    'max': max(durations) * 1000 if durations else None
+                }
+            }
+
+    def close(self):
+        """Finish the active jobs, fail the queued ones and stop the worker"""
+        self.running = False
+        self.jobs.put(None)
+        self.thread.join(timeout=5.0)
+        while True:
+            try:
+                job = self.jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                self.finish(job, RuntimeError("Generation scheduler stopped"))
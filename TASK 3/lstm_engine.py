@@ -0,0 +1,256 @@
+import hashlib
+import numpy as np
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def normalize(tokens, n_vocab):
+    """Note indices as the float network inputs the model was trained on"""
+    return np.asarray(tokens, dtype=np.float32) / float(n_vocab)
+
+def concat_states(first, second):
+    """Engine state of two batches stacked into one"""
+    if isinstance(first, list):
+        return [np.concatenate([a, b]) for a, b in zip(first, second)]
+    return np.concatenate([first, second])
+
+def take_states(state, rows):
+    """Engine state of the sequences at `rows` of a batch"""
+    if isinstance(state, list):
+        return [s[rows] for s in state]
+    return state[rows]
+
+class PredictEngine:
+    """Next-note probabilities from `model.predict` over the whole sliding window.
+
+    Every engine has the same interface: `start(patterns)` takes a batch of
+    seed windows (lists of note indices) and returns (probabilities, state),
+    `step(tokens, state)` appends one note per sequence and returns the next
+    probabilities and state. Probabilities have shape (batch, n_vocab). States
+    are NumPy arrays (or lists of them) with the batch on the first axis, so
+    sequences can be merged and dropped with `concat_states`/`take_states`.
+    """
+    name = 'predict'
+
+    def __init__(self, model, n_vocab):
+        self.model = model
+        self.n_vocab = n_vocab
+
+    def forward(self, windows):
+        return self.model.predict(normalize(windows, self.n_vocab)[..., np.newaxis], verbose=0)
+
+    def start(self, patterns):
+        windows = np.array(patterns, dtype=np.int64)
+        return self.forward(windows), windows
+
+    def step(self, tokens, windows):
+        windows = np.concatenate([windows[:, 1:], np.asarray(tokens, dtype=np.int64)[:, np.newaxis]], axis=1)
+        return self.forward(windows), windows
+
+class WindowEngine(PredictEngine):
+    """Same sliding window as `PredictEngine`, run through a compiled
+    `model(x, training=False)` call instead of the `predict` batching machinery.
+    Outputs match `model.predict`."""
+    name = 'window'
+
+    def __init__(self, model, n_vocab):
+        import tensorflow as tf
+        super().__init__(model, n_vocab)
+        sequence_length = model.input_shape[1]
+        self.call = tf.function(lambda x: model(x, training=False),
+                                input_signature=[tf.TensorSpec([None, sequence_length, 1], tf.float32)])
+
+    def forward(self, windows):
+        return self.call(normalize(windows, self.n_vocab)[..., np.newaxis]).numpy()
+
+def lstm_weights(model):
+    """(LSTM layers, Dense layer) of a model shaped like train_lstm_model.py builds it"""
+    lstms = [layer for layer in model.layers if type(layer).__name__ == 'LSTM']
+    dense = model.layers[-1]
+    others = [layer for layer in model.layers if layer not in lstms and layer is not dense]
+    if not lstms or type(dense).__name__ != 'Dense' or any(type(layer).__name__ != 'Dropout' for layer in others):
+        raise ValueError("Expected a stack of LSTM (and Dropout) layers followed by a Dense output layer")
+    return lstms, dense
+
+class StepEngine:
+    """Step-wise LSTM inference that carries the hidden state forward.
+
+    The LSTM weights of the trained model are taken out of the Keras layers and
+    run as a single-timestep cell in a compiled function, with the (h, c) state
+    of every layer passed in and out explicitly. The seed window is fed once;
+    after that each note costs one cell step per layer instead of re-running
+    both layers over the whole window.
+
+    The first prediction equals the window model's. Later ones condition on
+    the whole piece so far rather than on the last `sequence_length` notes
+    only, so the generated notes differ from the sliding-window engines.
+    """
+    name = 'stepwise'
+
+    def __init__(self, model, n_vocab):
+        import tensorflow as tf
+        self.n_vocab = n_vocab
+        lstms, dense = lstm_weights(model)
+        self.layers = []
+        for layer in lstms:
+            kernel, recurrent_kernel, bias = layer.get_weights()
+            self.layers.append((tf.constant(kernel), tf.constant(recurrent_kernel), tf.constant(bias),
+                                layer.cell.activation, layer.cell.recurrent_activation))
+        dense_kernel, dense_bias = [tf.constant(w) for w in dense.get_weights()]
+        dense_activation = dense.activation
+        self.units = [layer.units for layer in lstms]
+
+        def cell_step(x, states):
+            new_states = []
+            for (kernel, recurrent_kernel, bias, activation, recurrent_activation), h, c in zip(
+                    self.layers, states[0::2], states[1::2]):
+                z = tf.matmul(x, kernel) + tf.matmul(h, recurrent_kernel) + bias
+                i, f, g, o = tf.split(z, 4, axis=1)
+                c = recurrent_activation(f) * c + recurrent_activation(i) * activation(g)
+                h = recurrent_activation(o) * activation(c)
+                new_states += [h, c]
+                x = h
+            return dense_activation(tf.matmul(x, dense_kernel) + dense_bias), new_states
+
+        state_spec = [tf.TensorSpec([None, units], tf.float32) for units in self.units for _ in (0, 1)]
+        self.cell_step = tf.function(cell_step, input_signature=[tf.TensorSpec([None, 1], tf.float32), state_spec])
+
+    def initial_state(self, batch_size):
+        return [np.zeros((batch_size, units), dtype=np.float32) for units in self.units for _ in (0, 1)]
+
+    def step(self, tokens, state):
+        probabilities, state = self.cell_step(normalize(tokens, self.n_vocab)[:, np.newaxis], state)
+        return probabilities.numpy(), [s.numpy() for s in state]
+
+    def start(self, patterns):
+        patterns = np.array(patterns, dtype=np.int64)
+        state = self.initial_state(len(patterns))
+        for column in patterns.T:
+            probabilities, state = self.step(column, state)
+        return probabilities, state
+
+def file_digest(path):
+    """SHA-256 of a file, used as the model version"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def export_weights(model, path, source_path=None):
+    """Write the LSTM/Dense weights of `model` to a compressed .npz for the NumPy engines"""
+    lstms, dense = lstm_weights(model)
+    arrays = {
+        'layers': np.array(len(lstms)),
+        'sequence_length': np.array(model.input_shape[1]),
+        'dense_kernel': dense.get_weights()[0].astype(np.float32),
+        'dense_bias': dense.get_weights()[1].astype(np.float32),
+        'dense_activation': np.array(dense.activation.__name__),
+        'version': np.array(file_digest(source_path) if source_path else '')
+    }
+    for index, layer in enumerate(lstms):
+        kernel, recurrent_kernel, bias = layer.get_weights()
+        arrays[f'lstm{index}_kernel'] = kernel.astype(np.float32)
+        arrays[f'lstm{index}_recurrent_kernel'] = recurrent_kernel.astype(np.float32)
+        arrays[f'lstm{index}_bias'] = bias.astype(np.float32)
+        arrays[f'lstm{index}_activation'] = np.array(layer.cell.activation.__name__)
+        arrays[f'lstm{index}_recurrent_activation'] = np.array(layer.cell.recurrent_activation.__name__)
+    np.savez_compressed(path, **arrays)
+
+def sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+def softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+NUMPY_ACTIVATIONS = {'tanh': np.tanh, 'sigmoid': sigmoid, 'softmax': softmax}
+
+class NumpyLSTM:
+    """The exported LSTM stack and Dense output layer evaluated with NumPy only"""
+    def __init__(self, path):
+        with np.load(path) as data:
+            weights = {key: data[key] for key in data.files}
+
+        def activation(key):
+            name = str(weights[key])
+            if name not in NUMPY_ACTIVATIONS:
+                raise ValueError(f"Unsupported activation in {path}: {name}")
+            return NUMPY_ACTIVATIONS[name]
+
+        self.layers = [(weights[f'lstm{i}_kernel'], weights[f'lstm{i}_recurrent_kernel'], weights[f'lstm{i}_bias'],
+                        activation(f'lstm{i}_activation'), activation(f'lstm{i}_recurrent_activation'))
+                       for i in range(int(weights['layers']))]
+        self.dense_kernel = weights['dense_kernel']
+        self.dense_bias = weights['dense_bias']
+        self.dense_activation = activation('dense_activation')
+        self.units = [recurrent_kernel.shape[0] for _, recurrent_kernel, _, _, _ in self.layers]
+        self.sequence_length = int(weights['sequence_length'])
+        self.version = str(weights['version'])
+
+    def initial_state(self, batch_size):
+        return [np.zeros((batch_size, units), dtype=np.float32) for units in self.units for _ in (0, 1)]
+
+    def cell_step(self, x, states):
+        """One timestep: (batch, 1) inputs and [h, c] per layer -> (probabilities, new states)"""
+        new_states = []
+        for (kernel, recurrent_kernel, bias, activation, recurrent_activation), h, c in zip(
+                self.layers, states[0::2], states[1::2]):
+            z = x @ kernel + h @ recurrent_kernel + bias
+            i, f, g, o = np.split(z, 4, axis=1)
+            c = recurrent_activation(f) * c + recurrent_activation(i) * activation(g)
+            h = recurrent_activation(o) * activation(c)
+            new_states += [h, c]
+            x = h
+        return self.dense_activation(x @ self.dense_kernel + self.dense_bias), new_states
+
+class NumpyStepEngine:
+    """`StepEngine` on exported weights: no TensorFlow needed at serve time"""
+    name = 'numpy'
+
+    def __init__(self, model, n_vocab):
+        self.lstm = model
+        self.n_vocab = n_vocab
+
+    def step(self, tokens, state):
+        return self.lstm.cell_step(normalize(tokens, self.n_vocab)[:, np.newaxis], state)
+
+    def start(self, patterns):
+        patterns = np.array(patterns, dtype=np.int64)
+        state = self.lstm.initial_state(len(patterns))
+        for column in patterns.T:
+            probabilities, state = self.step(column, state)
+        return probabilities, state
+
+class NumpyWindowEngine(PredictEngine):
+    """Sliding-window engine on exported weights, numerically equivalent to `model.predict`"""
+    name = 'numpy-window'
+
+    def __init__(self, model, n_vocab):
+        super().__init__(model, n_vocab)
+        self.lstm = model
+
+    def forward(self, windows):
+        inputs = normalize(windows, self.n_vocab)
+        state = self.lstm.initial_state(len(inputs))
+        for column in inputs.T:
+            probabilities, state = self.lstm.cell_step(column[:, np.newaxis], state)
+        return probabilities
+
+ENGINES = {
+    'predict': PredictEngine,
+    'window': WindowEngine,
+    'stepwise': StepEngine,
+    'numpy': NumpyStepEngine,
+    'numpy-window': NumpyWindowEngine
+}
+
+# Engines that run on the exported .npz weights instead of the Keras model
+NUMPY_ENGINES = ('numpy', 'numpy-window')
+
+def create_engine(name, model, n_vocab):
+    """Engine `name` over a Keras model, or over a NumpyLSTM for the NUMPY_ENGINES"""
+    if name not in ENGINES:
+        raise ValueError(f"Unknown generation engine: {name} (choose from {', '.join(ENGINES)})")
+    return ENGINES[name](model, n_vocab)
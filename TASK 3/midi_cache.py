@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MIDI_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+def midi_id(style, length, temperature, seed, model_version, engine):
+    """Content address of a generated piece: everything that determines its notes"""
+    key = json.dumps([style, int(length), round(float(temperature), 6), int(seed), model_version, engine])
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+def valid_midi_id(value):
+    return bool(MIDI_ID_PATTERN.match(value or ''))
+
+class MidiCache:
+    """On-disk LRU cache of generated MIDI files named by their content address.
+
+    `get_or_create` returns the cached file of an ID or runs `create(path)` to
+    write it. Files are written under a temporary name and renamed, so readers
+    never see a partial file, and concurrent requests for the same ID wait for
+    the one generation in flight instead of repeating it. Reads refresh an
+    entry's position; after every write the least recently used files are
+    deleted until the cache fits in `max_bytes` and `max_files`. Access times
+    are kept as file modification times, so existing files are picked up on
+    startup in LRU order.
+    """
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024, max_files=1000):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        os.makedirs(directory, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.in_flight = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load()
+
+    def path(self, midi_id):
+        return os.path.join(self.directory, f'{midi_id}.mid')
+
+    def load(self):
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith('.tmp'):
+                os.remove(path)
+            elif name.endswith('.mid') and valid_midi_id(name[:-4]):
+                stat = os.stat(path)
+                files.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, midi_id, size in sorted(files):
+            self.entries[midi_id] = size
+            self.total_bytes += size
+        with self.lock:
+            self.evict()
+        logger.info(f"MIDI cache: {len(self.entries)} files, {self.total_bytes / 1024:.0f} KB in {self.directory}")
+
+    def touch(self, midi_id):
+        try:
+            os.utime(self.path(midi_id))
+        except OSError:
+            pass
+
+    def get(self, midi_id):
+        """Path of a cached file (marking it recently used), or None"""
+        with self.lock:
+            if midi_id not in self.entries:
+                return None
+            self.entries.move_to_end(midi_id)
+        self.touch(midi_id)
+        return self.path(midi_id)
+
+    def get_or_create(self, midi_id, create):
+        """(path, cached) for `midi_id`, calling `create(path)` to write the file on a miss"""
+        while True:
+            with self.lock:
+                cached = midi_id in self.entries
+                if cached:
+                    self.entries.move_to_end(midi_id)
+                    self.hits += 1
+                else:
+                    pending = self.in_flight.get(midi_id)
+                    if pending is None:
+                        pending = self.in_flight[midi_id] = threading.Event()
+                        self.misses += 1
+                        break
+            if cached:
+                self.touch(midi_id)
+                return self.path(midi_id), True
+            # Someone else is generating this piece; use their file (or retry if they failed)
+            pending.wait()
+
+        temporary = self.path(midi_id) + '.tmp'
+        try:
+            create(temporary)
+            os.replace(temporary, self.path(midi_id))
+            size = os.path.getsize(self.path(midi_id))
+            with self.lock:
+                self.entries[midi_id] = size
+                self.total_bytes += size
+                self.evict(keep=midi_id)
+        except Exception:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[midi_id]
+            pending.set()
+        return self.path(midi_id), False
+
+    def evict(self, keep=None):
+        """Drop least recently used files over the limits; called with the lock held"""
+        while self.entries and (self.total_bytes > self.max_bytes or len(self.entries) > self.max_files):
+            midi_id, size = next(iter(self.entries.items()))
+            if midi_id == keep:
+                break
+            del self.entries[midi_id]
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self.path(midi_id))
+            except OSError as e:
+                logger.warning(f"Could not remove cached MIDI {midi_id}: {e}")
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'files': len(self.entries),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'max_files': self.max_files,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'evictions': self.evictions,
+                'in_flight': len(self.in_flight)
+            }
@@ -1,11 +1,16 @@
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
-import subprocess
+from werkzeug.exceptions import NotFound
 import os
 import json
 import logging
+import threading
 from datetime import datetime
 import re
+import secrets
+from generate_and_save_midi import MusicGenerator
+from generation_scheduler import GenerationScheduler
+from midi_cache import MidiCache, midi_id, valid_midi_id
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -14,7 +19,9 @@ app = Flask(__name__)
 CORS(app)
 
 TASK3_DIR = os.path.abspath(os.path.dirname(__file__))
-MIDI_FILENAME = 'generated_music.mid'
+MIDI_CACHE_DIR = os.path.join(TASK3_DIR, 'midi_cache')
+MIDI_CACHE_MAX_BYTES = 64 * 1024 * 1024
+MIDI_CACHE_MAX_FILES = 1000
 
 MUSIC_STYLES = {
     'classical': {'length': 100, 'temperature': 0.8, 'style': 'classical'},
@@ -25,6 +32,35 @@ MUSIC_STYLES = {
     'default': {'length': 50, 'temperature': 0.7, 'style': 'general'}
 }
 
+# Generated pieces, one file per (style, length, temperature, seed, model version, engine)
+midi_cache = MidiCache(MIDI_CACHE_DIR, MIDI_CACHE_MAX_BYTES, MIDI_CACHE_MAX_FILES)
+# Most recent piece, served by the legacy /download_midi route
+last_midi_id = None
+
+# Concurrent requests generated together in one batch, at most
+MAX_BATCH = 16
+
+# Resident generator: the model and vocabulary are loaded once per process
+generator = None
+generator_error = None
+generator_lock = threading.Lock()
+
+def get_generator():
+    """The shared MusicGenerator with its batching scheduler, loaded on first use (or at startup)"""
+    global generator, generator_error
+    with generator_lock:
+        if generator is None:
+            try:
+                # NumPy engine (no TensorFlow) when music_model.npz exists, Keras otherwise
+                loaded = MusicGenerator(TASK3_DIR)
+                loaded.attach_scheduler(GenerationScheduler(loaded, MAX_BATCH))
+                generator = loaded
+                generator_error = None
+            except Exception as e:
+                generator_error = str(e)
+                raise
+        return generator
+
 def validate_prompt(prompt):
     if not isinstance(prompt, str):
         return False, "Prompt must be a string"
@@ -74,39 +110,46 @@ def generate_music():
                 'error': f'Invalid prompt: {validation_result}'
             }), 400
         
+        seed = data.get('seed')
+        if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool) or not 0 <= seed < 2**32):
+            return jsonify({
+                'error': 'Invalid seed: must be an integer between 0 and 2**32 - 1'
+            }), 400
+        
+        if seed is None:
+            seed = secrets.randbelow(2**32)
+        
         style = detect_music_style(prompt)
         style_params = MUSIC_STYLES[style]
         
         logger.info(f"Generating {style} music for prompt: {prompt}")
         
+        global last_midi_id
         try:
-            result = subprocess.run(
-                ['python', 'generate_and_save_midi.py', '--style', style, '--length', str(style_params['length'])],
-                cwd=TASK3_DIR,
-                check=True,
-                capture_output=True,
-                text=True
-            )
-        
-            if result.returncode == 0:
-                msg = f"🎵 Generated {style} music based on your prompt: '{prompt}'. The composition features {style_params['length']} notes with a {style} style."
-                return jsonify({
-                    'result': msg,
-                    'midi_url': f'http://127.0.0.1:{app.config["PORT"]}/download_midi',
-                    'style': style,
-                    'length': style_params['length'],
-                    'timestamp': datetime.utcnow().isoformat()
-                })
-            else:
-                return jsonify({
-                    'error': f"Music generation failed: {result.stderr}"
-                }), 500
-                
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Subprocess error: {e}")
+            music_generator = get_generator()
+            piece_id = midi_id(style, style_params['length'], style_params['temperature'], seed,
+                               music_generator.model_version, music_generator.engine.name)
+            _, cached = midi_cache.get_or_create(piece_id, lambda path: music_generator.compose(
+                path, style, style_params['length'], style_params['temperature'], seed
+            ))
+            last_midi_id = piece_id
+        except Exception as e:
+            logger.error(f"Generation error: {e}")
             return jsonify({
                 'error': f"Error generating music: {str(e)}"
             }), 500
+        
+        msg = f"🎵 Generated {style} music based on your prompt: '{prompt}'. The composition features {style_params['length']} notes with a {style} style."
+        return jsonify({
+            'result': msg,
+            'midi_url': f'http://127.0.0.1:{app.config["PORT"]}/download_midi/{piece_id}',
+            'midi_id': piece_id,
+            'cached': cached,
+            'style': style,
+            'length': style_params['length'],
+            'seed': seed,
+            'timestamp': datetime.utcnow().isoformat()
+        })
             
     except Exception as e:
         logger.error(f"Error in generate_music endpoint: {str(e)}")
@@ -114,14 +157,26 @@ def generate_music():
             'error': 'An unexpected error occurred. Please try again later.'
         }), 500
 
+def midi_not_found():
+    return jsonify({'error': 'Music file not found. It may have expired, please generate it again.'}), 404
+
 @app.route('/download_midi')
-def download_midi():
-    """Download the generated MIDI file."""
+@app.route('/download_midi/<piece_id>')
+def download_midi(piece_id=None):
+    """Download a generated MIDI file (the most recent one without an ID)."""
     try:
-        if not os.path.exists(os.path.join(TASK3_DIR, MIDI_FILENAME)):
+        piece_id = piece_id or last_midi_id
+        if piece_id is None:
             return jsonify({'error': 'No music file available. Please generate music first.'}), 404
         
-        return send_from_directory(TASK3_DIR, MIDI_FILENAME, as_attachment=True)
+        if not valid_midi_id(piece_id) or midi_cache.get(piece_id) is None:
+            return midi_not_found()
+        
+        return send_from_directory(MIDI_CACHE_DIR, f'{piece_id}.mid', as_attachment=True,
+                                   download_name=f'generated_music_{piece_id[:8]}.mid')
+    except NotFound:
+        # Evicted between the cache lookup and opening the file
+        return midi_not_found()
     except Exception as e:
         logger.error(f"Error downloading MIDI: {e}")
         return jsonify({'error': 'Error downloading file'}), 500
@@ -137,6 +192,8 @@ def health_check():
         'timestamp': datetime.utcnow().isoformat(),
         'model_loaded': model_exists,
         'notes_loaded': notes_exists,
+        'generator': generator.stats() if generator is not None else {'loaded': False, 'error': generator_error},
+        'midi_cache': midi_cache.stats(),
         'available_styles': list(MUSIC_STYLES.keys())
     }), 200
 
@@ -165,6 +222,7 @@ def model_info():
         info = {
             'model_exists': os.path.exists(model_path),
             'notes_exists': os.path.exists(notes_path),
+            'weights_exists': os.path.exists(os.path.join(TASK3_DIR, 'music_model.npz')),
             'model_size': os.path.getsize(model_path) if os.path.exists(model_path) else 0
         }
         
@@ -186,5 +244,11 @@ if __name__ == '__main__':
     print("🏥 Health check: http://localhost:5010/health")
     print("🎼 Available styles: classical, jazz, pop, ambient, rock")
     
+    try:
+        get_generator()
+    except Exception as e:
+        logger.error(f"Music model not loaded at startup, will retry on the first request: {e}")
+    
     app.config['PORT'] = 5010
-    app.run(host='0.0.0.0', port=app.config['PORT'], debug=True)
\ No newline at end of file
+    # The reloader would start a second process and load the model twice
+    app.run(host='0.0.0.0', port=app.config['PORT'], debug=True, use_reloader=False)
\ No newline at end of file
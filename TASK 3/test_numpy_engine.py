@@ -0,0 +1,58 @@
+import importlib.util
+import os
+import unittest
+import numpy as np
+
+from generate_and_save_midi import MODEL_FILENAME, WEIGHTS_FILENAME, load_music_data
+from lstm_engine import NumpyLSTM, create_engine, file_digest, normalize
+
+TASK3_DIR = os.path.abspath(os.path.dirname(__file__))
+HAS_TENSORFLOW = importlib.util.find_spec('tensorflow') is not None
+TOLERANCE = 1e-5
+
+@unittest.skipUnless(HAS_TENSORFLOW, 'TensorFlow is needed to run the Keras model')
+class NumpyEngineParityTest(unittest.TestCase):
+    """The NumPy engines on music_model.npz must reproduce the Keras model in music_model.h5"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.model, network_input, _, _, cls.n_vocab, _ = load_music_data(TASK3_DIR)
+        cls.lstm = NumpyLSTM(os.path.join(TASK3_DIR, WEIGHTS_FILENAME))
+        indices = np.linspace(0, len(network_input) - 1, 8).astype(int)
+        cls.windows = np.array([network_input[i] for i in indices], dtype=np.int64)
+
+    def keras_probabilities(self, windows):
+        return self.model.predict(normalize(windows, self.n_vocab)[..., np.newaxis], verbose=0)
+
+    def test_weights_version_matches_model_file(self):
+        self.assertEqual(self.lstm.version, file_digest(os.path.join(TASK3_DIR, MODEL_FILENAME)))
+
+    def test_window_engine_matches_predict(self):
+        probabilities = create_engine('numpy-window', self.lstm, self.n_vocab).start(self.windows)[0]
+        np.testing.assert_allclose(probabilities, self.keras_probabilities(self.windows), atol=TOLERANCE)
+
+    def test_window_engine_step_matches_predict(self):
+        engine = create_engine('numpy-window', self.lstm, self.n_vocab)
+        tokens = np.arange(len(self.windows)) % self.n_vocab
+        probabilities = engine.step(tokens, engine.start(self.windows)[1])[0]
+        shifted = np.concatenate([self.windows[:, 1:], tokens[:, np.newaxis]], axis=1)
+        np.testing.assert_allclose(probabilities, self.keras_probabilities(shifted), atol=TOLERANCE)
+
+    def test_step_engine_start_matches_predict(self):
+        # Before any generated note the step engine has seen exactly the seed window
+        probabilities = create_engine('numpy', self.lstm, self.n_vocab).start(self.windows)[0]
+        np.testing.assert_allclose(probabilities, self.keras_probabilities(self.windows), atol=TOLERANCE)
+
+    def test_step_engine_matches_keras_step_engine(self):
+        keras_engine = create_engine('stepwise', self.model, self.n_vocab)
+        numpy_engine = create_engine('numpy', self.lstm, self.n_vocab)
+        keras_state = keras_engine.start(self.windows)[1]
+        numpy_state = numpy_engine.start(self.windows)[1]
+        for step in range(5):
+            tokens = (np.arange(len(self.windows)) + step) % self.n_vocab
+            keras_probabilities, keras_state = keras_engine.step(tokens, keras_state)
+            numpy_probabilities, numpy_state = numpy_engine.step(tokens, numpy_state)
+            np.testing.assert_allclose(numpy_probabilities, keras_probabilities, atol=TOLERANCE)
+
+if __name__ == '__main__':
+    unittest.main()
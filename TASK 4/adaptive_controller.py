@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+import math
+import time
+from collections import deque
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Stages that make up one detector pass
+DETECTOR_STAGES = ('blob', 'forward', 'decode', 'nms')
+
+def scaled_input_size(input_size, scale):
+    """`input_size` scaled by `scale`, rounded to the multiples of 32 YOLO needs"""
+    return tuple(max(32, int(round(side * scale / 32.0)) * 32) for side in input_size)
+
+class AdaptiveController:
+    """Paces a session's processing loop and trades detection quality for speed.
+
+    The loop reports each frame's processing time through `frame_done`, which
+    returns how long to sleep to hold `pace_fps` (no fixed sleep). When a target
+    (`target_fps` and/or `latency_budget` seconds per frame) is set, every
+    `window` frames the controller splits the measured frame time into detector
+    time per pass and everything else, using the stage metrics, and predicts the
+    frame time of each level of a quality ladder:
+
+      1. detect every 1, 2, ... `max_detect_interval` frames
+      2. then shrink the network input size down to `min_input_width`
+      3. then, if even the cheapest level is over budget, skip source frames
+         (reader frame step, up to `max_frame_step`)
+
+    The best level predicted to fit in `headroom` of the budget is applied to all
+    trackers and readers of the session. Input size changes only resize the
+    trackers' blobs; the shared network is not reloaded. Each change is kept in
+    `decisions`.
+    """
+    def __init__(self, trackers, metrics, target_fps=None, latency_budget=None, max_detect_interval=4,
+                 min_input_width=256, max_frame_step=4, window=30, headroom=0.9):
+        self.trackers = trackers
+        self.metrics = metrics
+        self.readers = []
+        self.target_fps = float(target_fps) if target_fps else None
+        self.latency_budget = float(latency_budget) if latency_budget else None
+        self.pace_fps = self.target_fps
+        self.max_frame_step = max(1, int(max_frame_step))
+        self.window = max(1, int(window))
+        self.headroom = headroom
+
+        tracker = trackers[0]
+        self.base_interval = tracker.detect_interval
+        self.base_input_size = tuple(tracker.input_size)
+        self.levels = self.build_levels(max(self.base_interval, int(max_detect_interval)), min_input_width)
+        self.level = 0
+        self.frame_step = None
+
+        self.frame_seconds = None
+        self.detector_seconds = None
+        self.window_frames = 0
+        self.window_seconds = 0.0
+        self.window_totals = metrics.totals()
+        self.frames = 0
+        self.decisions = deque(maxlen=20)
+
+    @property
+    def budget(self):
+        """Seconds allowed per frame, or None when only pacing"""
+        budgets = [b for b in (1.0 / self.target_fps if self.target_fps else None, self.latency_budget) if b]
+        return min(budgets) if budgets else None
+
+    def resizable(self):
+        # ONNX exports have a fixed input shape; the face detector has none
+        tracker = self.trackers[0]
+        return tracker.model is not None and tracker.model.output_format != 'yolov5'
+
+    def build_levels(self, max_interval, min_input_width):
+        """Quality ladder of (detect interval, input size), best first"""
+        levels = [(interval, self.base_input_size) for interval in range(self.base_interval, max_interval + 1)]
+        if self.resizable():
+            scale = 0.8
+            while self.base_input_size[0] * scale >= min_input_width:
+                size = scaled_input_size(self.base_input_size, scale)
+                if size != levels[-1][1]:
+                    levels.append((max_interval, size))
+                scale -= 0.2
+        return levels
+
+    def attach_readers(self, readers):
+        self.readers = readers
+        self.base_step = readers[0].frame_step if readers else 1
+        self.frame_step = self.base_step
+
+    def frame_done(self, seconds):
+        """Record one processed frame; returns the seconds to sleep before the next one"""
+        self.frames += 1
+        self.frame_seconds = seconds if self.frame_seconds is None else 0.9 * self.frame_seconds + 0.1 * seconds
+        self.window_frames += 1
+        self.window_seconds += seconds
+        if self.budget and self.window_frames >= self.window:
+            self.adjust()
+        if self.pace_fps:
+            return max(0.0, 1.0 / self.pace_fps - seconds)
+        return 0.0
+
+    def adjust(self):
+        totals = self.metrics.totals()
+        passes = self.delta(totals, 'forward')[0]
+        detector_time = sum(self.delta(totals, stage)[1] for stage in DETECTOR_STAGES)
+        frame_time = self.window_seconds / self.window_frames
+        if passes:
+            self.detector_seconds = detector_time / passes
+        pass_rate = passes / self.window_frames
+
+        self.window_totals = totals
+        self.window_frames = 0
+        self.window_seconds = 0.0
+
+        detector = self.detector_seconds or 0.0
+        other = max(0.0, frame_time - detector * pass_rate)
+        interval, size = self.levels[self.level]
+        pixels = size[0] * size[1]
+
+        def predict(level):
+            level_interval, level_size = self.levels[level]
+            level_rate = pass_rate * interval / level_interval if pass_rate else 1.0 / level_interval
+            return other + detector * level_size[0] * level_size[1] / pixels * level_rate
+
+        budget = self.budget
+        level = next((i for i in range(len(self.levels)) if predict(i) <= budget * self.headroom),
+                     len(self.levels) - 1)
+        step = self.base_step if self.frame_step is not None else None
+        if step is not None and level == len(self.levels) - 1 and predict(level) > budget:
+            step = min(self.max_frame_step, self.base_step * math.ceil(predict(level) / budget))
+
+        if level != self.level or step != self.frame_step:
+            self.apply(level, step, frame_time, budget)
+
+    def delta(self, totals, stage):
+        count, total = totals.get(stage, (0, 0.0))
+        previous_count, previous_total = self.window_totals.get(stage, (0, 0.0))
+        return count - previous_count, total - previous_total
+
+    def apply(self, level, step, frame_time, budget):
+        interval, size = self.levels[level]
+        for tracker in self.trackers:
+            tracker.detect_interval = interval
+            tracker.motion_prediction = interval > 1
+            tracker.set_input_size(size)
+        for reader in self.readers:
+            reader.frame_step = step
+
+        direction = 'degrade' if (level, step or 0) > (self.level, self.frame_step or 0) else 'upgrade'
+        decision = {
+            'time': time.time(),
+            'frame': self.frames,
+            'action': direction,
+            'frame_ms': frame_time * 1000,
+            'budget_ms': budget * 1000,
+            'detect_interval': interval,
+            'input_size': list(size),
+            'frame_step': step
+        }
+        self.decisions.append(decision)
+        logger.info(f"Adaptive {direction}: {frame_time * 1000:.1f} ms/frame vs {budget * 1000:.1f} ms budget -> "
+                    f"detect every {interval} frame(s) at {size[0]}x{size[1]}, frame step {step}")
+        self.level = level
+        self.frame_step = step
+
+    def stats(self):
+        interval, size = self.levels[self.level]
+        return {
+            'enabled': bool(self.budget),
+            'target_fps': self.target_fps,
+            'latency_budget_ms': self.latency_budget * 1000 if self.latency_budget else None,
+            'pace_fps': self.pace_fps,
+            'frame_ms': self.frame_seconds * 1000 if self.frame_seconds is not None else None,
+            'detector_ms': self.detector_seconds * 1000 if self.detector_seconds is not None else None,
+            'level': self.level,
+            'levels': len(self.levels),
+            'detect_interval': interval,
+            'input_size': list(size),
+            'frame_step': self.frame_step,
+            'decisions': list(self.decisions)
+        }
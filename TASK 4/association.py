@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import logging
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+try:
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+except ImportError:
+    min_weight_full_bipartite_matching = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cost assigned to pairs rejected by the gate; any match at this cost is discarded
+GATED_COST = 1e6
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU between two (N, 4) and (M, 4) arrays of [x, y, w, h] boxes"""
+    a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+
+    ax2 = a[:, 0] + a[:, 2]
+    ay2 = a[:, 1] + a[:, 3]
+    bx2 = b[:, 0] + b[:, 2]
+    by2 = b[:, 1] + b[:, 3]
+
+    inter_w = np.minimum(ax2[:, None], bx2[None, :]) - np.maximum(a[:, 0][:, None], b[:, 0][None, :])
+    inter_h = np.minimum(ay2[:, None], by2[None, :]) - np.maximum(a[:, 1][:, None], b[:, 1][None, :])
+    intersection = np.clip(inter_w, 0, None) * np.clip(inter_h, 0, None)
+
+    area_a = a[:, 2] * a[:, 3]
+    area_b = b[:, 2] * b[:, 3]
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+def pair_iou(boxes_a, boxes_b):
+    """IoU of row-aligned (K, 4) arrays of [x, y, w, h] boxes"""
+    inter_w = (np.minimum(boxes_a[:, 0] + boxes_a[:, 2], boxes_b[:, 0] + boxes_b[:, 2])
+               - np.maximum(boxes_a[:, 0], boxes_b[:, 0]))
+    inter_h = (np.minimum(boxes_a[:, 1] + boxes_a[:, 3], boxes_b[:, 1] + boxes_b[:, 3])
+               - np.maximum(boxes_a[:, 1], boxes_b[:, 1]))
+    intersection = np.clip(inter_w, 0, None) * np.clip(inter_h, 0, None)
+    union = boxes_a[:, 2] * boxes_a[:, 3] + boxes_b[:, 2] * boxes_b[:, 3] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+def box_centers(boxes):
+    """Centers of an (N, 4) array of [x, y, w, h] boxes"""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    return np.stack([boxes[:, 0] + boxes[:, 2] / 2, boxes[:, 1] + boxes[:, 3] / 2], axis=1)
+
+def center_distance_matrix(boxes_a, boxes_b):
+    """Pairwise Euclidean distance between box centers"""
+    diff = box_centers(boxes_a)[:, None, :] - box_centers(boxes_b)[None, :, :]
+    return np.sqrt(np.sum(diff * diff, axis=2))
+
+def hungarian(cost):
+    """Minimum-cost assignment for a dense cost matrix.
+
+    Returns (rows, cols) index arrays like scipy's linear_sum_assignment, which is
+    used when available. The fallback is the O(n^3) shortest augmenting path
+    method with the inner relaxation step vectorized over columns.
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    if cost.size == 0:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+    if linear_sum_assignment is not None:
+        return linear_sum_assignment(cost)
+
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    assigned_row = np.zeros(m + 1, dtype=int)
+    way = np.zeros(m + 1, dtype=int)
+
+    for i in range(1, n + 1):
+        assigned_row[0] = i
+        j0 = 0
+        min_slack = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = assigned_row[j0]
+            slack = cost[i0 - 1] - u[i0] - v[1:]
+            free = ~used[1:]
+            improve = free & (slack < min_slack[1:])
+            min_slack[1:][improve] = slack[improve]
+            way[1:][improve] = j0
+
+            candidates = np.where(free, min_slack[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+
+            u[assigned_row[used]] += delta
+            v[used] -= delta
+            min_slack[~used] -= delta
+            j0 = j1
+            if assigned_row[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            assigned_row[j0] = assigned_row[j1]
+            j0 = j1
+
+    cols = np.flatnonzero(assigned_row[1:])
+    rows = assigned_row[1:][cols] - 1
+    if transposed:
+        rows, cols = cols, rows
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+def sparse_greedy_assignment(pairs_a, pairs_b, costs):
+    """Cheapest-pair-first assignment over a list of candidate pairs (no dense matrix)"""
+    rows, cols = [], []
+    used_rows, used_cols = set(), set()
+    for k in np.argsort(costs, kind='stable'):
+        a, b = int(pairs_a[k]), int(pairs_b[k])
+        if a in used_rows or b in used_cols:
+            continue
+        used_rows.add(a)
+        used_cols.add(b)
+        rows.append(a)
+        cols.append(b)
+    return np.array(rows, dtype=int), np.array(cols, dtype=int)
+
+def sparse_assignment(pairs_a, pairs_b, costs, num_a, num_b):
+    """Optimal assignment over candidate pairs only, with scipy's sparse LAPJVsp solver.
+
+    Every row and column may stay unmatched: row i gets a dummy column and
+    column j a dummy row, both at a cost above any pair, and the dummies of a
+    candidate pair can be matched to each other. The full matching of this
+    (num_a + num_b) square graph is a maximum-cardinality, minimum-cost
+    assignment of the real pairs; edge count stays linear in the pairs.
+    """
+    unmatched = 1.0 + 2.0 * (float(costs.max()) + 1.0) if len(costs) else 1.0
+    a_dummies = np.arange(num_a)
+    b_dummies = np.arange(num_b)
+    rows = np.concatenate([pairs_a, a_dummies, num_a + b_dummies, num_a + pairs_b])
+    cols = np.concatenate([pairs_b, num_b + a_dummies, b_dummies, num_b + pairs_a])
+    # Shifted by 1 so no stored edge has weight 0
+    weights = np.concatenate([costs + 1.0, np.full(num_a + num_b, unmatched), np.ones(len(costs))])
+    size = num_a + num_b
+    graph = coo_matrix((weights, (rows, cols)), shape=(size, size)).tocsr()
+    matched_cols = min_weight_full_bipartite_matching(graph)[1][:num_a]
+    real = matched_cols < num_b
+    return np.flatnonzero(real), matched_cols[real]
+
+def greedy_assignment(cost):
+    """Cheapest-pair-first assignment; faster than optimal but not globally minimal"""
+    cost = np.asarray(cost, dtype=np.float64)
+    if cost.size == 0:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+
+    rows, cols = [], []
+    used_rows = np.zeros(cost.shape[0], dtype=bool)
+    used_cols = np.zeros(cost.shape[1], dtype=bool)
+    for flat in np.argsort(cost, axis=None):
+        r, c = divmod(int(flat), cost.shape[1])
+        if used_rows[r] or used_cols[c]:
+            continue
+        used_rows[r] = used_cols[c] = True
+        rows.append(r)
+        cols.append(c)
+        if len(rows) == min(cost.shape):
+            break
+    return np.array(rows, dtype=int), np.array(cols, dtype=int)
+
+class SpatialGrid:
+    """Uniform grid over box centers used to find gate-compatible pairs.
+
+    Boxes are sorted by cell and each detection's 3 x 3 neighbourhood is looked
+    up with binary searches, so candidate generation is vectorized and roughly
+    linear in the number of boxes instead of N x M.
+    """
+    def __init__(self, cell_size):
+        self.cell_size = float(cell_size)
+
+    def candidate_pairs(self, centers_a, centers_b, max_distance):
+        cells_a = np.floor(centers_a / self.cell_size).astype(np.int64)
+        cells_b = np.floor(centers_b / self.cell_size).astype(np.int64)
+        # One integer key per cell, with room for the -1/+1 neighbours on every side
+        low = np.minimum(cells_a.min(axis=0), cells_b.min(axis=0)) - 1
+        rows = max(cells_a[:, 1].max(), cells_b[:, 1].max()) - low[1] + 2
+        keys_b = (cells_b[:, 0] - low[0]) * rows + (cells_b[:, 1] - low[1])
+        order = np.argsort(keys_b, kind='stable')
+        sorted_keys = keys_b[order]
+
+        pairs_a, pairs_b = [], []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                keys = (cells_a[:, 0] + dx - low[0]) * rows + (cells_a[:, 1] + dy - low[1])
+                first = np.searchsorted(sorted_keys, keys, 'left')
+                counts = np.searchsorted(sorted_keys, keys, 'right') - first
+                total = int(counts.sum())
+                if not total:
+                    continue
+                index_a = np.repeat(np.arange(len(centers_a)), counts)
+                offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                pairs_a.append(index_a)
+                pairs_b.append(order[np.repeat(first, counts) + offsets])
+        if not pairs_a:
+            return np.empty(0, dtype=int), np.empty(0, dtype=int)
+
+        pairs_a = np.concatenate(pairs_a)
+        pairs_b = np.concatenate(pairs_b)
+        diff = centers_b[pairs_b] - centers_a[pairs_a]
+        close = np.sum(diff * diff, axis=1) < max_distance ** 2
+        return pairs_a[close], pairs_b[close]
+
+def _connected_components(pairs_a, pairs_b, offset):
+    """Group bipartite candidate pairs into independent components.
+
+    Vectorized label propagation with pointer jumping: every node keeps the
+    smallest node index it is known to be connected to. Returns one array of
+    pair indices per component.
+    """
+    nodes_a = pairs_a
+    nodes_b = pairs_b + offset
+    labels = np.arange(offset + int(pairs_b.max()) + 1 if len(pairs_b) else offset)
+    while True:
+        label_a, label_b = labels[nodes_a], labels[nodes_b]
+        low = np.minimum(label_a, label_b)
+        updated = labels.copy()
+        for nodes in (label_a, label_b, nodes_a, nodes_b):
+            np.minimum.at(updated, nodes, low)
+        while True:
+            jumped = updated[updated]
+            if np.array_equal(jumped, updated):
+                break
+            updated = jumped
+        if np.array_equal(updated, labels):
+            break
+        labels = updated
+
+    pair_labels = labels[nodes_a]
+    order = np.argsort(pair_labels, kind='stable')
+    boundaries = np.flatnonzero(np.diff(pair_labels[order])) + 1
+    return np.split(order, boundaries)
+
+class Associator:
+    """Matches detections to existing tracks one-to-one.
+
+    metric: 'iou' (1 - IoU), 'distance' (center distance / max_distance) or
+            'hybrid' (sum of both), gated by center distance < max_distance and,
+            for 'iou', by IoU >= min_iou
+    method: 'hungarian' (optimal) or 'greedy'
+    Above `grid_threshold` boxes a SpatialGrid finds candidate pairs and only
+    those pairs are costed; no N x M matrix is built. The Hungarian method then
+    runs scipy's sparse solver on the candidate graph, or without scipy solves
+    each connected group of candidates on its own cost matrix, falling back to
+    greedy for groups with more than `max_component` detections or tracks
+    (crowds can chain thousands of boxes into one group).
+    """
+    METRICS = ('iou', 'distance', 'hybrid')
+    METHODS = ('hungarian', 'greedy')
+
+    def __init__(self, metric='hybrid', method='hungarian', max_distance=100, min_iou=0.1,
+                 grid_threshold=1000, max_component=500):
+        if metric not in self.METRICS:
+            raise ValueError(f"Unknown association metric: {metric}")
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown assignment method: {method}")
+        self.metric = metric
+        self.method = method
+        self.max_distance = max_distance
+        self.min_iou = min_iou
+        self.grid_threshold = grid_threshold
+        self.max_component = max_component
+        self.grid = SpatialGrid(max_distance)
+
+    def cost_matrix(self, detection_boxes, track_boxes):
+        """Gated cost matrix; rejected pairs get GATED_COST"""
+        distance = center_distance_matrix(detection_boxes, track_boxes)
+        gate = distance < self.max_distance
+
+        if self.metric == 'distance':
+            cost = distance / self.max_distance
+        else:
+            iou = iou_matrix(detection_boxes, track_boxes)
+            if self.metric == 'iou':
+                cost = 1.0 - iou
+                gate &= iou >= self.min_iou
+            else:
+                cost = (1.0 - iou) + distance / self.max_distance
+
+        return np.where(gate, cost, GATED_COST)
+
+    def pair_costs(self, detection_boxes, track_boxes):
+        """(cost, gate) of row-aligned detection/track box pairs, same metric as cost_matrix"""
+        diff = box_centers(detection_boxes) - box_centers(track_boxes)
+        distance = np.sqrt(np.sum(diff * diff, axis=1))
+        gate = distance < self.max_distance
+
+        if self.metric == 'distance':
+            return distance / self.max_distance, gate
+        iou = pair_iou(detection_boxes, track_boxes)
+        if self.metric == 'iou':
+            return 1.0 - iou, gate & (iou >= self.min_iou)
+        return (1.0 - iou) + distance / self.max_distance, gate
+
+    def _assign(self, cost):
+        if self.method == 'greedy':
+            rows, cols = greedy_assignment(cost)
+        else:
+            rows, cols = hungarian(cost)
+        valid = cost[rows, cols] < GATED_COST
+        return rows[valid], cols[valid]
+
+    def associate(self, detection_boxes, track_boxes):
+        """Return (matches, unmatched_detections, unmatched_tracks) as index lists"""
+        detection_boxes = np.asarray(detection_boxes, dtype=np.float64).reshape(-1, 4)
+        track_boxes = np.asarray(track_boxes, dtype=np.float64).reshape(-1, 4)
+        num_detections, num_tracks = len(detection_boxes), len(track_boxes)
+
+        matches = []
+        if num_detections and num_tracks:
+            if max(num_detections, num_tracks) <= self.grid_threshold:
+                rows, cols = self._assign(self.cost_matrix(detection_boxes, track_boxes))
+                matches = list(zip(rows.tolist(), cols.tolist()))
+            else:
+                matches = self._associate_gridded(detection_boxes, track_boxes)
+
+        matched_detections = {d for d, _ in matches}
+        matched_tracks = {t for _, t in matches}
+        unmatched_detections = [d for d in range(num_detections) if d not in matched_detections]
+        unmatched_tracks = [t for t in range(num_tracks) if t not in matched_tracks]
+        return matches, unmatched_detections, unmatched_tracks
+
+    def _associate_gridded(self, detection_boxes, track_boxes):
+        pairs_d, pairs_t = self.grid.candidate_pairs(
+            box_centers(detection_boxes), box_centers(track_boxes), self.max_distance
+        )
+        costs, gate = self.pair_costs(detection_boxes[pairs_d], track_boxes[pairs_t])
+        pairs_d, pairs_t, costs = pairs_d[gate], pairs_t[gate], costs[gate]
+        if not len(costs):
+            return []
+
+        if self.method == 'greedy':
+            rows, cols = sparse_greedy_assignment(pairs_d, pairs_t, costs)
+            return list(zip(rows.tolist(), cols.tolist()))
+        if min_weight_full_bipartite_matching is not None:
+            rows, cols = sparse_assignment(pairs_d, pairs_t, costs, len(detection_boxes), len(track_boxes))
+            return list(zip(rows.tolist(), cols.tolist()))
+
+        matches = []
+        for component in _connected_components(pairs_d, pairs_t, len(detection_boxes)):
+            dets, rows = np.unique(pairs_d[component], return_inverse=True)
+            tracks, cols = np.unique(pairs_t[component], return_inverse=True)
+            if max(len(dets), len(tracks)) > self.max_component:
+                rows, cols = sparse_greedy_assignment(rows, cols, costs[component])
+            else:
+                cost = np.full((len(dets), len(tracks)), GATED_COST)
+                cost[rows, cols] = costs[component]
+                rows, cols = self._assign(cost)
+            matches.extend(zip(dets[rows].tolist(), tracks[cols].tolist()))
+        return matches
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from urllib.parse import parse_qs
+import logging
+
+import web_interface
+from live_stats import SSE_KEEPALIVE, sse_event
+from streaming import multipart_chunk
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'index.html')
+
+class UpdateHub:
+    """Fans update notifications from the processing thread out to every waiting
+    coroutine on the event loop.
+
+    The source (a FrameBroadcaster or StatsPublisher) calls `notify` from the
+    processing thread; it hops onto the loop and wakes all waiters at once by
+    setting and replacing a single Event.
+    """
+    def __init__(self, source):
+        self.source = source
+        self.loop = None
+        self.event = asyncio.Event()
+
+    def attach(self, loop):
+        self.loop = loop
+        self.source.add_listener(self.notify)
+
+    def detach(self):
+        self.source.remove_listener(self.notify)
+
+    def notify(self, version):
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        self.event.set()
+        self.event = asyncio.Event()
+
+    async def wait(self, timeout):
+        """Wait for the next update; False on timeout"""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+class FrameHub(UpdateHub):
+    """Update hub of a FrameBroadcaster, for /video_feed viewers"""
+    @property
+    def broadcaster(self):
+        return self.source
+
+    async def wait_for_frame(self, last_version, timeout=1.0):
+        """Return (version, jpeg, timestamp) of a frame newer than `last_version`,
+        or (last_version, None, None) on timeout"""
+        version, jpeg, timestamp = self.broadcaster.peek()
+        if version == last_version:
+            if not await self.wait(timeout):
+                return last_version, None, None
+            version, jpeg, timestamp = self.broadcaster.peek()
+
+        if jpeg is None:
+            # Not encoded yet (first viewer after an idle period): encode off the loop
+            version, jpeg = await asyncio.get_running_loop().run_in_executor(
+                None, self.broadcaster.latest
+            )
+            timestamp = self.broadcaster.timestamp
+        return version, jpeg, timestamp
+
+class DetectionApp:
+    """ASGI application serving the same routes as the Flask web interface.
+
+    Control routes reuse the web_interface helpers (run in the default executor
+    since they block on camera and model setup); /video_feed streams from one
+    event loop, so viewers cost a coroutine each rather than an OS thread.
+    """
+    def __init__(self):
+        self.loop = None
+        self.hubs = {}
+        self.routes = {
+            ('GET', '/'): self.index,
+            ('GET', '/video_feed'): self.video_feed,
+            ('GET', '/get_stats'): self.get_stats,
+            ('GET', '/stats_stream'): self.stats_stream,
+            ('GET', '/sessions'): self.list_sessions,
+            ('GET', '/health'): self.health,
+            ('GET', '/metrics'): self.metrics,
+            ('POST', '/start_detection'): self.start_detection,
+            ('POST', '/stop_detection'): self.stop_detection,
+            ('POST', '/save_frame'): self.save_frame,
+        }
+
+    def hub_for(self, source, hub_class=FrameHub):
+        """Update hub of a session's broadcaster or stats publisher, attached to
+        the loop on first viewer"""
+        hub = self.hubs.get(source)
+        if hub is None:
+            hub = self.hubs[source] = hub_class(source)
+            hub.attach(self.loop or asyncio.get_running_loop())
+        return hub
+
+    def release_hub(self, source, users):
+        hub = self.hubs.get(source)
+        if hub is not None and users == 0:
+            hub.detach()
+            del self.hubs[source]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        # /video_feed/<id>, /get_stats/<id> and /stats_stream/<id> address a named session
+        path = scope['path'].rstrip('/') or '/'
+        session_id = web_interface.DEFAULT_SESSION
+        base, _, suffix = path[1:].partition('/')
+        if suffix and base in ('video_feed', 'get_stats', 'stats_stream'):
+            path, session_id = f"/{base}", suffix
+
+        handler = self.routes.get((scope['method'], path))
+        if handler is None:
+            await self.send_json(send, {'error': 'Not found'}, 404)
+            return
+        await handler(scope, receive, send, session_id)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.loop = asyncio.get_running_loop()
+                await self.run_blocking(web_interface.warm_up_models)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for hub in self.hubs.values():
+                    hub.detach()
+                self.hubs.clear()
+                await self.run_blocking(web_interface.sessions.stop_all)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def send_response(self, send, body, status=200, content_type=b'application/json'):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', content_type),
+                        (b'access-control-allow-origin', b'*')]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def send_json(self, send, payload, status=200):
+        await self.send_response(send, json.dumps(payload).encode(), status)
+
+    async def read_json(self, receive):
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        return json.loads(body) if body else {}
+
+    async def read_json_or_empty(self, receive):
+        try:
+            return await self.read_json(receive)
+        except ValueError:
+            return {}
+
+    async def wait_for_disconnect(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def run_blocking(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    async def index(self, scope, receive, send, session_id):
+        with open(TEMPLATE_PATH, 'rb') as f:
+            await self.send_response(send, f.read(), content_type=b'text/html; charset=utf-8')
+
+    async def get_stats(self, scope, receive, send, session_id):
+        await self.send_json(send, web_interface.session_stats(session_id))
+
+    async def stats_stream(self, scope, receive, send, session_id, keepalive=15.0):
+        """Server-Sent Events: the current statistics snapshot, then every new one"""
+        session = web_interface.sessions.get(session_id)
+        if session is None:
+            await self.send_json(send, {'error': f'No running session: {session_id}'}, 404)
+            return
+
+        publisher = session.publisher
+        hub = self.hub_for(publisher, UpdateHub)
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', b'text/event-stream'),
+                        (b'cache-control', b'no-cache'),
+                        (b'access-control-allow-origin', b'*')]
+        })
+
+        disconnect = asyncio.ensure_future(self.wait_for_disconnect(receive))
+        publisher.add_subscriber()
+        try:
+            last_version = None
+            last_sent = time.monotonic()
+            while not disconnect.done() and not publisher.closed:
+                version, _, data = publisher.peek()
+                if version == last_version:
+                    # Short waits so a disconnect is noticed promptly
+                    if not await hub.wait(1.0) and time.monotonic() - last_sent >= keepalive:
+                        await send({'type': 'http.response.body', 'body': SSE_KEEPALIVE, 'more_body': True})
+                        last_sent = time.monotonic()
+                    continue
+                last_version = version
+                await send({'type': 'http.response.body', 'body': sse_event(data, version), 'more_body': True})
+                last_sent = time.monotonic()
+            await send({'type': 'http.response.body', 'body': b''})
+        except (OSError, asyncio.CancelledError):
+            pass
+        finally:
+            publisher.remove_subscriber()
+            self.release_hub(publisher, publisher.subscribers)
+            disconnect.cancel()
+
+    async def list_sessions(self, scope, receive, send, session_id):
+        await self.send_json(send, web_interface.sessions.describe())
+
+    async def health(self, scope, receive, send, session_id):
+        payload = web_interface.health_status()
+        payload['server'] = 'asgi'
+        await self.send_json(send, payload)
+
+    async def metrics(self, scope, receive, send, session_id):
+        await self.send_response(send, web_interface.metrics_text().encode(),
+                                 content_type=b'text/plain; version=0.0.4')
+
+    async def start_detection(self, scope, receive, send, session_id):
+        try:
+            data = await self.read_json(receive)
+        except ValueError:
+            await self.send_json(send, {'error': 'Invalid JSON body'}, 400)
+            return
+        payload, status = await self.run_blocking(web_interface.start_detection_with, data)
+        await self.send_json(send, payload, status)
+
+    async def stop_detection(self, scope, receive, send, session_id):
+        data = await self.read_json_or_empty(receive)
+        payload, status = await self.run_blocking(
+            web_interface.stop_detection_now, str(data.get('id', session_id))
+        )
+        await self.send_json(send, payload, status)
+
+    async def save_frame(self, scope, receive, send, session_id):
+        data = await self.read_json_or_empty(receive)
+        payload, status = await self.run_blocking(
+            web_interface.save_current_frame, str(data.get('id', session_id))
+        )
+        await self.send_json(send, payload, status)
+
+    async def video_feed(self, scope, receive, send, session_id):
+        session = web_interface.sessions.get(session_id)
+        if session is None:
+            await self.send_json(send, {'error': f'No running session: {session_id}'}, 404)
+            return
+
+        query = parse_qs(scope.get('query_string', b'').decode())
+        max_fps = float(query['max_fps'][0]) if 'max_fps' in query else session.max_fps
+        min_interval = 1.0 / float(max_fps) if max_fps else 0.0
+
+        broadcaster = session.broadcaster
+        hub = self.hub_for(broadcaster)
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', b'multipart/x-mixed-replace; boundary=frame'),
+                        (b'cache-control', b'no-cache'),
+                        (b'access-control-allow-origin', b'*')]
+        })
+
+        disconnect = asyncio.ensure_future(self.wait_for_disconnect(receive))
+        broadcaster.add_viewer()
+        try:
+            last_version = 0
+            last_sent = 0.0
+            while not disconnect.done() and not broadcaster.closed:
+                version, jpeg, timestamp = await hub.wait_for_frame(last_version)
+                if jpeg is None:
+                    continue
+
+                if min_interval:
+                    delay = last_sent + min_interval - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                        continue
+                    last_sent = time.monotonic()
+
+                last_version = version
+                await send({
+                    'type': 'http.response.body',
+                    'body': multipart_chunk(jpeg, timestamp),
+                    'more_body': True
+                })
+            await send({'type': 'http.response.body', 'body': b''})
+        except (OSError, asyncio.CancelledError):
+            pass
+        finally:
+            broadcaster.remove_viewer()
+            self.release_hub(broadcaster, broadcaster.viewers)
+            disconnect.cancel()
+
+app = DetectionApp()
+
+def main():
+    parser = argparse.ArgumentParser(description='Async (ASGI) server for the detection web interface')
+    parser.add_argument('--host', type=str, default='0.0.0.0', help='Bind address')
+    parser.add_argument('--port', type=int, default=5020, help='Port to listen on')
+
+    args = parser.parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        print("❌ uvicorn is required for the async server. Install it with: pip install uvicorn")
+        return
+
+    print("🌐 Object Detection Web Interface (async)")
+    print("=" * 40)
+    print(f"Server will run on http://localhost:{args.port}")
+    print(f"Health check: http://localhost:{args.port}/health")
+    print("=" * 40)
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level='info')
+
+if __name__ == '__main__':
+    main()
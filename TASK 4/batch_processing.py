@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+
+import csv
+import multiprocessing
+import os
+import time
+import cv2
+import numpy as np
+import logging
+
+from association import Associator, hungarian, iou_matrix
+from motion_gate import MotionGate
+from object_detection_tracking import ObjectTracker
+from overlay import TrailBuffer, snapshot_tracks
+from video_io import open_reader, open_writer, scaled_size
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.m4v', '.mpg', '.mpeg', '.wmv')
+
+# Tracker of the current worker process, created once by init_worker
+_tracker = None
+
+def list_videos(directory):
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(VIDEO_EXTENSIONS)
+    )
+
+def video_info(path, max_width=None):
+    """Frame count, fps and the size of frames as tracked (after any downscale)"""
+    cap = cv2.VideoCapture(path)
+    width, height = scaled_size(int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                                int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), max_width)
+    info = {
+        'frames': int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+        'fps': cap.get(cv2.CAP_PROP_FPS) or 25.0,
+        'width': width,
+        'height': height
+    }
+    cap.release()
+    return info
+
+def plan_segments(frame_count, segment_frames, overlap):
+    """Split [0, frame_count) into (start, stop) ranges.
+
+    Every segment after the first starts `overlap` frames before the previous one
+    ends, so both see the same frames and their track IDs can be stitched.
+    """
+    segments = []
+    start = 0
+    while start < frame_count:
+        stop = min(frame_count, start + segment_frames)
+        segments.append((max(0, start - overlap) if segments else 0, stop))
+        start = stop
+    return segments
+
+def init_worker(settings, threads):
+    """Create this process's tracker; the model registry loads the network once"""
+    global _tracker
+    cv2.setNumThreads(threads)
+    settings = dict(settings)
+    associator = Associator(metric=settings.pop('match_metric', 'hybrid'),
+                            method=settings.pop('assignment', 'hungarian'))
+    gate = settings.pop('motion_gate', None)
+    _tracker = ObjectTracker(associator=associator, motion_gate=MotionGate(gate) if gate else None,
+                             **settings)
+
+def track_segment(task):
+    """Track one frame range of a video.
+
+    Returns the task with a `records` list holding, per frame, a list of
+    (local track id, bbox, class name, confidence) tuples. Frames the tracker
+    only predicts on are grabbed without being decoded. `error` is set when the
+    video cannot be opened or a segment other than the last one ends early,
+    since merging it would shift the frames of every later segment.
+    """
+    path, start, stop = task['path'], task['start'], task['stop']
+    _tracker.reset_tracking()
+
+    records = []
+    task['error'] = None
+    started = time.perf_counter()
+    cap = open_reader(path, **task['capture'])
+    if cap is None:
+        task['records'] = records
+        task['seconds'] = time.perf_counter() - started
+        task['error'] = f"could not open {path}"
+        return task
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    # Track times follow the video, not how fast this worker gets through it
+    _tracker.clock = cap.position
+    for _ in range(start, stop):
+        ret, frame = cap.read(decode=_tracker.should_detect())
+        if not ret:
+            break
+        tracks = _tracker.track_frame(frame)
+        records.append([(track_id, list(info['bbox']), info['class_name'], float(info['confidence']))
+                        for track_id, info in tracks.items() if info['active']])
+    cap.release()
+    _tracker.clock = None
+    if len(records) < stop - start and not task['last']:
+        task['error'] = f"read {len(records)} of frames {start}-{stop}"
+
+    task['records'] = records
+    task['seconds'] = time.perf_counter() - started
+    return task
+
+def stitch_ids(previous, current, overlap, min_iou=0.3):
+    """Map local track IDs of `current` onto those of `previous` over their shared frames.
+
+    `previous` and `current` are per-frame record lists; the last `overlap` frames
+    of `previous` are the first `overlap` frames of `current`. Pairs are scored by
+    mean IoU over the shared frames (same class only) and matched one-to-one.
+    Returns {current id: previous id}.
+    """
+    overlap = min(overlap, len(previous), len(current))
+    if overlap == 0:
+        return {}
+
+    scores = {}
+    for prev_frame, cur_frame in zip(previous[-overlap:], current[:overlap]):
+        if not prev_frame or not cur_frame:
+            continue
+        ious = iou_matrix([r[1] for r in prev_frame], [r[1] for r in cur_frame])
+        for i, prev in enumerate(prev_frame):
+            for j, cur in enumerate(cur_frame):
+                if ious[i, j] > 0 and prev[2] == cur[2]:
+                    scores[prev[0], cur[0]] = scores.get((prev[0], cur[0]), 0.0) + ious[i, j]
+    if not scores:
+        return {}
+
+    prev_ids = sorted({p for p, _ in scores})
+    cur_ids = sorted({c for _, c in scores})
+    cost = np.zeros((len(prev_ids), len(cur_ids)))
+    for (p, c), score in scores.items():
+        cost[prev_ids.index(p), cur_ids.index(c)] = -score / overlap
+
+    rows, cols = hungarian(cost)
+    return {cur_ids[c]: prev_ids[r] for r, c in zip(rows, cols) if -cost[r, c] >= min_iou}
+
+def merge_segments(segments, overlap):
+    """Join the segments of one video into a single record list with global track IDs.
+
+    Shared frames are taken from the earlier segment. Returns (records, stitched)
+    where `stitched` counts tracks carried across segment boundaries.
+    """
+    merged = []
+    next_id = 1
+    stitched = 0
+    previous = None
+    previous_ids = {}
+    for segment in segments:
+        records = segment['records']
+        links = stitch_ids(previous, records, overlap) if previous is not None else {}
+        stitched += len(links)
+
+        global_ids = {}
+        for frame in records:
+            for local_id, _, _, _ in frame:
+                if local_id in global_ids:
+                    continue
+                if local_id in links and links[local_id] in previous_ids:
+                    global_ids[local_id] = previous_ids[links[local_id]]
+                else:
+                    global_ids[local_id] = next_id
+                    next_id += 1
+
+        skip = min(overlap, len(records)) if previous is not None else 0
+        for frame in records[skip:]:
+            merged.append([(global_ids[local_id], bbox, class_name, confidence)
+                           for local_id, bbox, class_name, confidence in frame])
+        previous, previous_ids = records, global_ids
+    return merged, stitched
+
+def write_detections(path, records, fps):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['frame', 'time_s', 'track_id', 'class_name', 'confidence', 'x', 'y', 'w', 'h'])
+        for index, frame in enumerate(records):
+            for track_id, (x, y, w, h), class_name, confidence in frame:
+                writer.writerow([index, f"{index / fps:.3f}", track_id, class_name, f"{confidence:.3f}",
+                                 x, y, w, h])
+
+def render_video(task):
+    """Draw the stitched tracks onto the source video and write the annotated copy"""
+    info = task['info']
+    cap = open_reader(task['path'], **task['capture'])
+    if cap is None:
+        return None
+    writer = open_writer(task['output'], info['fps'], (info['width'], info['height']), **task['encoder'])
+
+    # Trails are rebuilt here from the stitched IDs
+    history = {}
+    for frame_records in task['records']:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        tracks = {}
+        for track_id, bbox, class_name, confidence in frame_records:
+            center = (bbox[0] + bbox[2] // 2, bbox[1] + bbox[3] // 2)
+            if track_id not in history:
+                history[track_id] = TrailBuffer(_tracker.max_history)
+            history[track_id].append(center)
+            tracks[track_id] = {'bbox': bbox, 'class_name': class_name, 'confidence': confidence,
+                                'active': True}
+        writer.write(_tracker.draw_detections(frame, snapshot_tracks(tracks, history)))
+
+    cap.release()
+    writer.release()
+    return task['output']
+
+def run_batch(directory, output_dir=None, workers=None, segment_frames=1500, overlap=10,
+              tracker_settings=None, threads_per_worker=1, capture_options=None, encoder_options=None):
+    """Track every video in `directory` on a process pool and write, per video,
+    an annotated copy and a per-frame detections CSV. With `draw_overlay` off in
+    the tracker settings only the CSVs are written.
+
+    `capture_options` and `encoder_options` go to video_io.open_reader and
+    open_writer; frame stepping is not supported here since every frame gets a
+    CSV row. Returns a summary dict; videos with a failed segment are listed
+    under `failed` and get no output files."""
+    videos = list_videos(directory)
+    if not videos:
+        logger.error(f"No videos found in {directory}")
+        return None
+
+    output_dir = output_dir or os.path.join(directory, 'processed')
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    annotate = (tracker_settings or {}).get('draw_overlay', True)
+    capture_options = dict(capture_options or {}, frame_step=1)
+    encoder_options = encoder_options or {}
+
+    tasks = []
+    infos = {}
+    for path in videos:
+        infos[path] = video_info(path, capture_options.get('max_width'))
+        plan = plan_segments(infos[path]['frames'], segment_frames, overlap)
+        for index, (start, stop) in enumerate(plan):
+            tasks.append({'path': path, 'index': index, 'start': start, 'stop': stop,
+                          'last': index == len(plan) - 1, 'capture': capture_options})
+    logger.info(f"Processing {len(videos)} videos as {len(tasks)} segments on {workers} workers")
+
+    started = time.time()
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(workers, initializer=init_worker,
+                      initargs=(tracker_settings or {}, threads_per_worker)) as pool:
+        segments = {}
+        for done, task in enumerate(pool.imap_unordered(track_segment, tasks), 1):
+            segments.setdefault(task['path'], []).append(task)
+            if task['error']:
+                logger.error(f"[{done}/{len(tasks)}] {os.path.basename(task['path'])} "
+                             f"frames {task['start']}-{task['stop']} failed: {task['error']}")
+                continue
+            logger.info(f"[{done}/{len(tasks)}] {os.path.basename(task['path'])} "
+                        f"frames {task['start']}-{task['stop']}: {len(task['records']) / task['seconds']:.1f} fps")
+        tracked_at = time.time()
+
+        render_tasks = []
+        results = []
+        failed = []
+        for path in videos:
+            parts = sorted(segments.get(path, []), key=lambda task: task['index'])
+            errors = [f"frames {task['start']}-{task['stop']}: {task['error']}" for task in parts if task['error']]
+            if not parts or errors:
+                # Writing the other segments would silently drop frames
+                failed.append({'video': path, 'errors': errors or ['no frames tracked']})
+                continue
+            records, stitched = merge_segments(parts, overlap)
+            name = os.path.splitext(os.path.basename(path))[0]
+            detections_path = os.path.join(output_dir, f"{name}_detections.csv")
+            write_detections(detections_path, records, infos[path]['fps'])
+            annotated_path = os.path.join(output_dir, f"{name}_annotated.mp4") if annotate else None
+            if annotate:
+                render_tasks.append({'path': path, 'info': infos[path], 'records': records,
+                                     'output': annotated_path, 'capture': capture_options,
+                                     'encoder': encoder_options})
+            results.append({
+                'video': path,
+                'frames': len(records),
+                'segments': len(parts),
+                'tracks': len({track_id for frame in records for track_id, _, _, _ in frame}),
+                'stitched_tracks': stitched,
+                'detections_file': detections_path,
+                'annotated_video': annotated_path
+            })
+        if render_tasks:
+            pool.map(render_video, render_tasks)
+
+    finished = time.time()
+    frames = sum(result['frames'] for result in results)
+    tracking_fps = frames / (tracked_at - started) if tracked_at > started else 0.0
+    summary = {
+        'videos': results,
+        'failed': failed,
+        'workers': workers,
+        'frames': frames,
+        'tracking_seconds': tracked_at - started,
+        'total_seconds': finished - started,
+        'tracking_fps': tracking_fps,
+        'fps_per_core': tracking_fps / workers,
+        'overall_fps': frames / (finished - started) if finished > started else 0.0
+    }
+    if failed:
+        logger.error(f"{len(failed)} of {len(videos)} videos failed and were not written")
+    logger.info(f"Batch done: {frames} frames in {summary['total_seconds']:.1f}s, "
+                f"{tracking_fps:.1f} fps tracking ({summary['fps_per_core']:.1f} fps/core on {workers} workers)")
+    return summary
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+import argparse
+import time
+import logging
+
+import cv2
+import numpy as np
+
+from object_detection_tracking import decode_yolo_outputs
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Row counts of the three YOLOv4 output layers for a 416x416 input
+YOLOV4_LAYER_ROWS = (507, 2028, 8112)
+
+def decode_yolo_outputs_loop(outputs, width, height, confidence_threshold):
+    """Reference per-row decoding loop, as previously used by detect_objects"""
+    boxes = []
+    confidences = []
+    class_ids = []
+
+    for output in outputs:
+        for detection in output:
+            scores = detection[5:]
+            class_id = np.argmax(scores)
+            confidence = scores[class_id]
+
+            if confidence > confidence_threshold:
+                center_x = int(detection[0] * width)
+                center_y = int(detection[1] * height)
+                w = int(detection[2] * width)
+                h = int(detection[3] * height)
+
+                x = int(center_x - w / 2)
+                y = int(center_y - h / 2)
+
+                boxes.append([x, y, w, h])
+                confidences.append(float(confidence))
+                class_ids.append(class_id)
+
+    return boxes, confidences, class_ids
+
+def synthetic_outputs(num_classes=80, positive_rate=0.002, seed=0):
+    """Build YOLOv4-shaped outputs with a sparse set of confident rows"""
+    rng = np.random.default_rng(seed)
+    outputs = []
+    for rows in YOLOV4_LAYER_ROWS:
+        output = np.zeros((rows, 5 + num_classes), dtype=np.float32)
+        output[:, :4] = rng.uniform(0.05, 0.95, size=(rows, 4))
+        output[:, 5:] = rng.uniform(0.0, 0.2, size=(rows, num_classes)) * (rng.random((rows, 1)) < 0.05)
+
+        positives = rng.random(rows) < positive_rate
+        classes = rng.integers(0, num_classes, size=positives.sum())
+        output[np.flatnonzero(positives), 5 + classes] = rng.uniform(0.5, 1.0, size=positives.sum())
+        output[:, 4] = output[:, 5:].max(axis=1)
+        outputs.append(output)
+    return outputs
+
+def record_outputs(source, model_path, output_file, frames):
+    """Run the real network on a few frames and store the raw output tensors"""
+    from object_detection_tracking import ObjectTracker
+
+    tracker = ObjectTracker(model_path=model_path)
+    if tracker.use_face_detector:
+        raise RuntimeError("YOLO model not available, cannot record network outputs")
+
+    cap = cv2.VideoCapture(source)
+    arrays = {}
+    recorded = 0
+    while recorded < frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        blob = cv2.dnn.blobFromImage(frame, 1/255.0, tracker.input_size, swapRB=True, crop=False)
+        tracker.net.setInput(blob)
+        for layer, output in enumerate(tracker.net.forward(tracker.get_output_layers())):
+            arrays[f"frame{recorded}_layer{layer}"] = output
+        arrays[f"frame{recorded}_shape"] = np.array(frame.shape[:2])
+        recorded += 1
+    cap.release()
+
+    np.savez_compressed(output_file, **arrays)
+    logger.info(f"Recorded outputs of {recorded} frames to {output_file}")
+
+def load_recorded_outputs(path):
+    """Load outputs saved by --record as a list of (outputs, width, height)"""
+    data = np.load(path)
+    recorded = []
+    frame = 0
+    while f"frame{frame}_shape" in data:
+        height, width = data[f"frame{frame}_shape"]
+        outputs = []
+        layer = 0
+        while f"frame{frame}_layer{layer}" in data:
+            outputs.append(data[f"frame{frame}_layer{layer}"])
+            layer += 1
+        recorded.append((outputs, int(width), int(height)))
+        frame += 1
+    return recorded
+
+def time_decoder(decoder, samples, confidence_threshold, repeats):
+    """Return the mean decode time per frame in milliseconds"""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for outputs, width, height in samples:
+            decoder(outputs, width, height, confidence_threshold)
+    return (time.perf_counter() - start) * 1000 / (repeats * len(samples))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark YOLO output decoding')
+    parser.add_argument('--outputs', type=str, default=None,
+                       help='Recorded network outputs (.npz) to decode; synthetic outputs are used otherwise')
+    parser.add_argument('--record', type=str, default=None,
+                       help='Video source to record network outputs from instead of benchmarking')
+    parser.add_argument('--record-frames', type=int, default=10,
+                       help='Number of frames to record')
+    parser.add_argument('--model', type=str, default=None,
+                       help='Path to YOLO model directory (used with --record)')
+    parser.add_argument('--save', type=str, default='recorded_outputs.npz',
+                       help='Output file for --record')
+    parser.add_argument('--confidence', type=float, default=0.5,
+                       help='Confidence threshold for detection')
+    parser.add_argument('--repeats', type=int, default=20,
+                       help='Number of passes over the samples')
+
+    args = parser.parse_args()
+
+    if args.record is not None:
+        source = int(args.record) if args.record.isdigit() else args.record
+        record_outputs(source, args.model, args.save, args.record_frames)
+        return
+
+    if args.outputs:
+        samples = load_recorded_outputs(args.outputs)
+    else:
+        samples = [(synthetic_outputs(seed=seed), 1920, 1080) for seed in range(5)]
+
+    for outputs, width, height in samples:
+        expected = decode_yolo_outputs_loop(outputs, width, height, args.confidence)
+        actual = decode_yolo_outputs(outputs, width, height, args.confidence)
+        if expected[0] != actual[0] or expected[2] != actual[2] or not np.allclose(expected[1], actual[1]):
+            raise AssertionError("Vectorized decoding does not match the reference loop")
+
+    rows = sum(len(output) for output in samples[0][0])
+    loop_ms = time_decoder(decode_yolo_outputs_loop, samples, args.confidence, args.repeats)
+    vectorized_ms = time_decoder(decode_yolo_outputs, samples, args.confidence, args.repeats)
+
+    print("🎯 YOLO Output Decoding Benchmark")
+    print("=" * 50)
+    print(f"Samples: {len(samples)} ({'recorded' if args.outputs else 'synthetic'}), {rows} rows each")
+    print(f"Python loop:  {loop_ms:8.3f} ms/frame")
+    print(f"Vectorized:   {vectorized_ms:8.3f} ms/frame")
+    print(f"Speedup:      {loop_ms / vectorized_ms:8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import time
+import logging
+
+import cv2
+import numpy as np
+
+from model_registry import MODEL_VARIANTS, BACKENDS, TARGETS
+from object_detection_tracking import ObjectTracker
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def read_frames(source, max_frames):
+    """Read up to `max_frames` frames of a reference video into memory"""
+    cap = cv2.VideoCapture(source)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+def benchmark_variant(frames, model_path, variant, input_size, backend, target, confidence, warmup):
+    """Detect objects on every frame with one model configuration.
+
+    Returns a result dict, or None if the model could not be loaded.
+    """
+    tracker = ObjectTracker(model_path=model_path, confidence_threshold=confidence, variant=variant,
+                            input_size=input_size, backend=backend, target=target)
+    if tracker.use_face_detector:
+        return None
+
+    for frame in frames[:warmup]:
+        tracker.detect_objects(frame)
+
+    latencies = []
+    counts = []
+    for frame in frames:
+        start = time.perf_counter()
+        detections = tracker.detect_objects(frame)
+        latencies.append(time.perf_counter() - start)
+        counts.append(len(detections))
+
+    latencies = np.array(latencies) * 1000
+    return {
+        'variant': variant,
+        'input_size': f"{tracker.input_size[0]}x{tracker.input_size[1]}",
+        'backend': backend,
+        'target': target,
+        'load_seconds': tracker.model.load_seconds,
+        'frames': len(frames),
+        'latency_mean_ms': float(latencies.mean()),
+        'latency_p95_ms': float(np.percentile(latencies, 95)),
+        'fps': float(1000.0 / latencies.mean()),
+        'detections_per_frame': float(np.mean(counts)),
+        'total_detections': int(np.sum(counts))
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare latency, FPS and detections of model variants')
+    parser.add_argument('--video', type=str, required=True,
+                       help='Reference video file')
+    parser.add_argument('--frames', type=int, default=100,
+                       help='Number of frames to benchmark')
+    parser.add_argument('--warmup', type=int, default=3,
+                       help='Untimed frames before measuring each variant')
+    parser.add_argument('--model', type=str, default=None,
+                       help='Directory containing the model files of every variant')
+    parser.add_argument('--variants', type=str, nargs='+', default=list(MODEL_VARIANTS),
+                       choices=list(MODEL_VARIANTS), help='Variants to compare')
+    parser.add_argument('--input-sizes', type=str, nargs='+', default=[None],
+                       help='Inference resolutions to try per variant (default: native)')
+    parser.add_argument('--backend', type=str, default='opencv', choices=list(BACKENDS),
+                       help='OpenCV DNN backend')
+    parser.add_argument('--target', type=str, default='cpu', choices=list(TARGETS),
+                       help='OpenCV DNN target device')
+    parser.add_argument('--confidence', type=float, default=0.5,
+                       help='Confidence threshold for detection')
+    parser.add_argument('--json', type=str, default=None,
+                       help='Write results to this JSON file')
+
+    args = parser.parse_args()
+
+    frames = read_frames(args.video, args.frames)
+    if not frames:
+        print(f"❌ Could not read frames from {args.video}")
+        return
+
+    print("🎯 Model Variant Benchmark")
+    print("=" * 78)
+    print(f"Video: {args.video} ({len(frames)} frames, {frames[0].shape[1]}x{frames[0].shape[0]})")
+    print(f"{'variant':<12} {'input':>9} {'load s':>7} {'mean ms':>8} {'p95 ms':>8} {'fps':>7} "
+          f"{'det/frame':>10} {'total':>7}")
+
+    results = []
+    for variant in args.variants:
+        for input_size in args.input_sizes:
+            result = benchmark_variant(frames, args.model, variant, input_size, args.backend,
+                                       args.target, args.confidence, args.warmup)
+            if result is None:
+                print(f"{variant:<12} {'-':>9}  model files not found, skipped")
+                continue
+            results.append(result)
+            print(f"{variant:<12} {result['input_size']:>9} {result['load_seconds']:>7.2f} "
+                  f"{result['latency_mean_ms']:>8.1f} {result['latency_p95_ms']:>8.1f} {result['fps']:>7.1f} "
+                  f"{result['detections_per_frame']:>10.2f} {result['total_detections']:>7}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'video': args.video, 'frames': len(frames), 'results': results}, f, indent=2)
+        print(f"\nResults saved to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from datetime import datetime
+import logging
+
+import cv2
+import numpy as np
+
+from association import Associator
+from benchmark_decoding import load_recorded_outputs, synthetic_outputs
+from object_detection_tracking import ObjectTracker
+from streaming import encode_jpeg
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RESOLUTIONS = ((640, 480), (1280, 720), (1920, 1080))
+TRACKING_SIZES = (10, 50, 100, 500, 1000, 5000)
+ASSOCIATION_SIZES = (1000, 5000)
+
+# Metrics where a larger value is better; all other numbers are times
+HIGHER_IS_BETTER = ('fps',)
+
+class StubNet:
+    """Stand-in for cv2.dnn.Net that replays recorded (or synthetic) output tensors.
+
+    Batched inputs get the next outputs stacked along a leading batch axis, like
+    OpenCV does; `latency` seconds of sleep per forward pass can mimic a model.
+    """
+    def __init__(self, output_sets, latency=0.0):
+        self.output_sets = output_sets
+        self.latency = latency
+        self.batch = 1
+        self.calls = 0
+
+    def setInput(self, blob):
+        self.batch = blob.shape[0]
+
+    def getLayerNames(self):
+        return [f"yolo_{i}" for i in range(len(self.output_sets[0]))]
+
+    def getUnconnectedOutLayers(self):
+        return np.arange(1, len(self.output_sets[0]) + 1)
+
+    def forward(self, layer_names):
+        if self.latency:
+            time.sleep(self.latency)
+        sets = [self.output_sets[(self.calls + i) % len(self.output_sets)] for i in range(self.batch)]
+        self.calls += self.batch
+        if self.batch == 1:
+            return list(sets[0])
+        return [np.stack([outputs[layer] for outputs in sets]) for layer in range(len(sets[0]))]
+
+def make_tracker(model_path=None, stub_outputs=None, stub_latency=0.0, **settings):
+    """ObjectTracker with the real model, or with a StubNet when `stub_outputs` is given"""
+    tracker = ObjectTracker(model_path=model_path, **settings)
+    if stub_outputs is not None:
+        tracker.model = None
+        tracker.net = StubNet(stub_outputs, stub_latency)
+        tracker.net_lock = threading.Lock()
+        tracker.use_face_detector = False
+    return tracker
+
+def synthetic_frames(count, width=1280, height=720, objects=8, seed=0):
+    """Frames of a textured background with moving coloured rectangles"""
+    rng = np.random.default_rng(seed)
+    background = cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), (31, 31), 0)
+    positions = rng.uniform(0, 1, size=(objects, 2)) * [width - 80, height - 80]
+    velocities = rng.uniform(-6, 6, size=(objects, 2))
+    colors = rng.integers(0, 255, size=(objects, 3)).tolist()
+    for _ in range(count):
+        frame = background.copy()
+        positions = np.clip(positions + velocities, 0, [width - 80, height - 80])
+        for (x, y), color in zip(positions.astype(int), colors):
+            cv2.rectangle(frame, (x, y), (x + 60, y + 80), color, -1)
+        yield frame
+
+def video_frames(path, count):
+    cap = cv2.VideoCapture(path)
+    for _ in range(count):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield frame
+    cap.release()
+
+def latency_stats(seconds):
+    ms = np.asarray(seconds) * 1000
+    if len(ms) == 0:
+        return {'count': 0}
+    return {
+        'count': int(len(ms)),
+        'mean_ms': float(ms.mean()),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'max_ms': float(ms.max()),
+        'fps': float(1000.0 / ms.mean()) if ms.mean() > 0 else 0.0
+    }
+
+def bench_detect(tracker, frames):
+    """Time detect_objects per frame"""
+    timings = []
+    detections = 0
+    for frame in frames:
+        start = time.perf_counter()
+        detections += len(tracker.detect_objects(frame))
+        timings.append(time.perf_counter() - start)
+    result = latency_stats(timings)
+    result['detections'] = detections
+    return result
+
+def bench_replay(tracker, frames):
+    """Full per-frame path: track_frame plus draw_detections"""
+    tracker.reset_tracking()
+    timings = []
+    for frame in frames:
+        start = time.perf_counter()
+        tracks = tracker.track_frame(frame)
+        tracker.draw_detections(frame, tracker.snapshot(tracks))
+        timings.append(time.perf_counter() - start)
+    result = latency_stats(timings)
+    result.update(tracker.track_stats())
+    return result
+
+def synthetic_detections(count, frames, width=3840, height=2160, seed=0):
+    """Per-frame detection lists of `count` objects drifting across a large frame"""
+    rng = np.random.default_rng(seed)
+    sizes = rng.integers(20, 60, size=(count, 2))
+    positions = rng.uniform(0, 1, size=(count, 2)) * [width - 60, height - 60]
+    velocities = rng.uniform(-4, 4, size=(count, 2))
+    for _ in range(frames):
+        positions = np.clip(positions + velocities, 0, [width - 60, height - 60])
+        boxes = np.concatenate([positions.astype(int), sizes], axis=1).tolist()
+        yield [{'bbox': box, 'confidence': 0.9, 'class_id': 0, 'class_name': 'person'} for box in boxes]
+
+def bench_tracking(tracker, sizes, frames):
+    """Time update_tracking for detection sets of increasing size"""
+    results = {}
+    for count in sizes:
+        tracker.max_tracks = max(tracker.max_tracks, count * 2)
+        tracker.reset_tracking()
+        timings = []
+        for detections in synthetic_detections(count, frames):
+            start = time.perf_counter()
+            tracker.update_tracking(detections)
+            timings.append(time.perf_counter() - start)
+        result = latency_stats(timings[1:])
+        result['tracks_created'] = tracker.track_stats()['created_tracks']
+        results[str(count)] = result
+        logger.info(f"update_tracking with {count} objects: {result['mean_ms']:.2f} ms")
+    return results
+
+def bench_association(sizes, repeats=3):
+    """Time Associator.associate with the spatial grid against the dense N x N cost matrix"""
+    results = {}
+    for count in sizes:
+        tracks, detections = [np.array([d['bbox'] for d in frame], dtype=np.float64)
+                              for frame in synthetic_detections(count, 2)]
+        result = {}
+        for path, grid_threshold in (('dense', float('inf')), ('grid', 0)):
+            associator = Associator(grid_threshold=grid_threshold)
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                matches, _, _ = associator.associate(detections, tracks)
+                timings.append(time.perf_counter() - start)
+            result[path] = latency_stats(timings)
+            result[path]['matches'] = len(matches)
+        result['speedup'] = result['dense']['mean_ms'] / max(result['grid']['mean_ms'], 1e-9)
+        results[str(count)] = result
+        logger.info(f"associate {count} objects: dense {result['dense']['mean_ms']:.1f} ms, "
+                    f"grid {result['grid']['mean_ms']:.1f} ms")
+    return results
+
+def bench_render(tracker, resolutions, frames, objects=20):
+    """Time draw_detections and JPEG encoding at several resolutions"""
+    results = {}
+    for width, height in resolutions:
+        tracker.reset_tracking()
+        source = synthetic_frames(frames, width, height)
+        detections = synthetic_detections(objects, frames, width, height)
+        draw_times = []
+        encode_times = []
+        for frame, frame_detections in zip(source, detections):
+            tracks = tracker.update_tracking(frame_detections)
+            start = time.perf_counter()
+            tracker.draw_detections(frame, tracker.snapshot(tracks))
+            draw_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            encode_jpeg(frame, 80)
+            encode_times.append(time.perf_counter() - start)
+        results[f"{width}x{height}"] = {'draw': latency_stats(draw_times), 'encode': latency_stats(encode_times)}
+    return results
+
+def flatten(results, prefix=''):
+    """{'a': {'b': 1}} -> {'a.b': 1} for numeric leaves"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+def compare(baseline, current, threshold):
+    """Print the change of every mean/p95/fps metric; returns the regressed metric names"""
+    before = flatten(baseline['results'])
+    after = flatten(current['results'])
+    regressions = []
+    print(f"\n{'metric':<48} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name in sorted(set(before) & set(after)):
+        if not name.endswith(('mean_ms', 'p95_ms', 'fps')) or not before[name]:
+            continue
+        change = (after[name] - before[name]) / before[name]
+        worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+        flag = ' ⚠️' if worse > threshold else ''
+        if flag:
+            regressions.append(name)
+        print(f"{name:<48} {before[name]:>10.3f} {after[name]:>10.3f} {change * 100:>+7.1f}%{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark detection, tracking and rendering')
+    parser.add_argument('--cases', type=str, nargs='+', default=['detect', 'replay', 'tracking', 'association', 'render'],
+                       choices=['detect', 'replay', 'tracking', 'association', 'render'], help='Benchmarks to run')
+    parser.add_argument('--video', type=str, default=None,
+                       help='Video to replay; synthetic frames are generated otherwise')
+    parser.add_argument('--frames', type=int, default=100,
+                       help='Frames per detect/replay/render case')
+    parser.add_argument('--model', type=str, default=None,
+                       help='Path to YOLO model directory (used unless --stub is given)')
+    parser.add_argument('--stub', action='store_true',
+                       help='Replace the network with a stub that replays recorded or synthetic outputs')
+    parser.add_argument('--outputs', type=str, default=None,
+                       help='Recorded network outputs (.npz from benchmark_decoding.py --record) for --stub')
+    parser.add_argument('--stub-latency-ms', type=float, default=0.0,
+                       help='Simulated forward-pass time of the stub network')
+    parser.add_argument('--tracking-sizes', type=int, nargs='+', default=list(TRACKING_SIZES),
+                       help='Detection counts for the tracking stress test')
+    parser.add_argument('--tracking-frames', type=int, default=30,
+                       help='Frames per tracking size')
+    parser.add_argument('--association-sizes', type=int, nargs='+', default=list(ASSOCIATION_SIZES),
+                       help='Object counts for the dense vs spatial-grid association comparison')
+    parser.add_argument('--threads', type=int, default=None,
+                       help='OpenCV thread count (fix it for comparable runs)')
+    parser.add_argument('--json', type=str, default='benchmark_results.json',
+                       help='Write results to this JSON file')
+    parser.add_argument('--compare', type=str, default=None,
+                       help='Baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                       help='Relative slowdown reported as a regression in --compare')
+
+    args = parser.parse_args()
+
+    if args.threads is not None:
+        cv2.setNumThreads(args.threads)
+
+    stub_outputs = None
+    if args.stub:
+        if args.outputs:
+            stub_outputs = [outputs for outputs, _, _ in load_recorded_outputs(args.outputs)]
+        else:
+            stub_outputs = [synthetic_outputs(seed=seed) for seed in range(5)]
+    tracker = make_tracker(args.model, stub_outputs, args.stub_latency_ms / 1000.0)
+    if tracker.use_face_detector:
+        logger.warning("YOLO model not available: detect/replay measure the face detector fallback")
+
+    def frames():
+        if args.video:
+            return video_frames(args.video, args.frames)
+        return synthetic_frames(args.frames)
+
+    print("🎯 Detection Benchmark Suite")
+    print("=" * 60)
+
+    results = {}
+    if 'detect' in args.cases:
+        results['detect'] = bench_detect(tracker, frames())
+        print(f"detect_objects: {results['detect']['mean_ms']:.2f} ms/frame "
+              f"(p95 {results['detect']['p95_ms']:.2f}), {results['detect']['detections']} detections")
+    if 'replay' in args.cases:
+        results['replay'] = bench_replay(tracker, frames())
+        print(f"track + draw:   {results['replay']['mean_ms']:.2f} ms/frame, {results['replay']['fps']:.1f} fps")
+    if 'tracking' in args.cases:
+        results['tracking'] = bench_tracking(tracker, args.tracking_sizes, args.tracking_frames)
+        for count, result in results['tracking'].items():
+            print(f"update_tracking {count:>5} objects: {result['mean_ms']:8.2f} ms (p95 {result['p95_ms']:.2f})")
+    if 'association' in args.cases:
+        results['association'] = bench_association(args.association_sizes)
+        for count, result in results['association'].items():
+            print(f"associate {count:>5} objects: dense {result['dense']['mean_ms']:8.2f} ms, "
+                  f"grid {result['grid']['mean_ms']:8.2f} ms ({result['speedup']:.1f}x)")
+    if 'render' in args.cases:
+        results['render'] = bench_render(tracker, RESOLUTIONS, min(args.frames, 50))
+        for resolution, result in results['render'].items():
+            print(f"{resolution:>10}: draw {result['draw']['mean_ms']:.2f} ms, "
+                  f"encode {result['encode']['mean_ms']:.2f} ms")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'opencv_threads': cv2.getNumThreads(),
+            'network': 'stub' if args.stub else ('face-detector' if tracker.use_face_detector else 'yolo'),
+            'input': args.video or 'synthetic',
+            'args': vars(args)
+        },
+        'results': results
+    }
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to {args.json}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} metrics regressed by more than {args.threshold * 100:.0f}%")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+import numpy as np
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# One .npy file per column in every chunk directory
+COLUMNS = {
+    'frame': np.int64,
+    'timestamp': np.float64,
+    'source': np.int16,
+    'track_id': np.int64,
+    'class_id': np.int16,
+    'state': np.uint8,
+    'x': np.int32,
+    'y': np.int32,
+    'w': np.int32,
+    'h': np.int32,
+    'confidence': np.float32
+}
+
+# How a track got its box on a frame
+TRACK_STATES = ('detected', 'predicted', 'held')
+
+_CLOSE = object()
+
+def chunk_dirs(directory):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.startswith('chunk_') and not name.endswith('.tmp'))
+
+class EventLogWriter:
+    """Append-only columnar log of per-frame track rows.
+
+    `log_tracks` only snapshots the tracks into a tuple and queues it; a background
+    thread converts rows to column arrays and writes a chunk directory every
+    `chunk_rows` rows or `flush_interval` seconds. Chunks are written under a
+    temporary name and renamed, so readers never see partial chunks, and a new
+    writer on an existing directory continues the chunk numbering. Rows are
+    stamped with wall-clock time, which can step backwards, so each chunk is
+    sorted by timestamp before it is written.
+    """
+    def __init__(self, directory, chunk_rows=65536, flush_interval=60.0, max_queued_frames=10000):
+        self.directory = directory
+        self.chunk_rows = chunk_rows
+        self.flush_interval = flush_interval
+        os.makedirs(directory, exist_ok=True)
+
+        self.classes = self.load_classes()
+        existing = chunk_dirs(directory)
+        self.next_chunk = int(os.path.basename(existing[-1])[6:]) + 1 if existing else 0
+
+        self.queue = queue.Queue(maxsize=max_queued_frames)
+        self.rows = []
+        self.last_flush = time.monotonic()
+        self.rows_written = 0
+        self.chunks_written = 0
+        self.dropped_frames = 0
+
+        self.thread = threading.Thread(target=self.run, name='event-log-writer', daemon=True)
+        self.thread.start()
+
+    def load_classes(self):
+        try:
+            with open(os.path.join(self.directory, 'classes.json')) as f:
+                return {name: index for index, name in enumerate(json.load(f))}
+        except FileNotFoundError:
+            return {}
+
+    def log_tracks(self, frame_index, timestamp, tracks, source=0):
+        """Queue one frame's tracks ({id: track_info}); never blocks the caller"""
+        snapshot = [(track_id, info['class_name'], tuple(info['bbox']), info['confidence'],
+                     info.get('state', 'detected'))
+                    for track_id, info in tracks.items() if info['active']]
+        try:
+            self.queue.put_nowait((frame_index, timestamp, source, snapshot))
+        except queue.Full:
+            self.dropped_frames += 1
+
+    def run(self):
+        closing = False
+        while not closing:
+            try:
+                item = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                item = None
+            if item is _CLOSE:
+                closing = True
+            elif item is not None:
+                self.add_rows(*item)
+
+            if self.rows and (closing or len(self.rows) >= self.chunk_rows
+                              or time.monotonic() - self.last_flush >= self.flush_interval):
+                self.write_chunk()
+
+    def add_rows(self, frame_index, timestamp, source, snapshot):
+        for track_id, class_name, (x, y, w, h), confidence, state in snapshot:
+            class_id = self.classes.setdefault(class_name, len(self.classes))
+            self.rows.append((frame_index, timestamp, source, track_id, class_id,
+                              TRACK_STATES.index(state), x, y, w, h, confidence))
+
+    def write_chunk(self):
+        rows, self.rows = self.rows, []
+        self.last_flush = time.monotonic()
+        rows.sort(key=lambda row: row[1])
+        columns = list(zip(*rows))
+
+        name = f"chunk_{self.next_chunk:06d}"
+        temporary = os.path.join(self.directory, name + '.tmp')
+        os.makedirs(temporary, exist_ok=True)
+        for (column, dtype), values in zip(COLUMNS.items(), columns):
+            np.save(os.path.join(temporary, f"{column}.npy"), np.asarray(values, dtype=dtype))
+
+        timestamps = columns[1]
+        with open(os.path.join(temporary, 'meta.json'), 'w') as f:
+            json.dump({'rows': len(rows), 'start': timestamps[0], 'end': timestamps[-1],
+                       'first_frame': min(columns[0]), 'last_frame': max(columns[0]), 'sorted': True}, f)
+        self.write_classes()
+        os.rename(temporary, os.path.join(self.directory, name))
+
+        self.next_chunk += 1
+        self.chunks_written += 1
+        self.rows_written += len(rows)
+
+    def write_classes(self):
+        names = sorted(self.classes, key=self.classes.get)
+        temporary = os.path.join(self.directory, 'classes.json.tmp')
+        with open(temporary, 'w') as f:
+            json.dump(names, f)
+        os.replace(temporary, os.path.join(self.directory, 'classes.json'))
+
+    def close(self, timeout=10.0):
+        """Flush buffered rows and stop the writer thread"""
+        self.queue.put(_CLOSE)
+        self.thread.join(timeout)
+
+    def stats(self):
+        return {
+            'directory': self.directory,
+            'rows_written': self.rows_written,
+            'chunks_written': self.chunks_written,
+            'buffered_rows': len(self.rows),
+            'queued_frames': self.queue.qsize(),
+            'dropped_frames': self.dropped_frames
+        }
+
+class EventLogReader:
+    """Time-range queries over an event log directory.
+
+    Chunks outside the range are skipped by their meta.json; the others have
+    their columns memory-mapped and cut with a binary search on `timestamp`, so
+    only the requested rows are read from disk. Chunks not marked as sorted in
+    their meta.json (older logs) are checked once and filtered with a mask if
+    their timestamps are out of order.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'classes.json')) as f:
+            self.class_names = json.load(f)
+        self.chunks = []
+        for path in chunk_dirs(directory):
+            with open(os.path.join(path, 'meta.json')) as f:
+                self.chunks.append((path, json.load(f)))
+
+    def is_sorted(self, chunk_path, meta):
+        if 'sorted' not in meta:
+            meta['sorted'] = bool(np.all(np.diff(self.column(chunk_path, 'timestamp')) >= 0))
+        return meta['sorted']
+
+    def column(self, chunk_path, name):
+        return np.load(os.path.join(chunk_path, f"{name}.npy"), mmap_mode='r')
+
+    def query(self, start=None, end=None, columns=None, track_id=None, class_name=None, source=None):
+        """Rows with start <= timestamp < end as {column: array}; adds `class_name`
+        when class_id is among the requested columns"""
+        columns = list(columns or COLUMNS)
+        if 'timestamp' not in columns:
+            columns.append('timestamp')
+        class_id = None
+        if class_name is not None:
+            class_id = self.class_names.index(class_name) if class_name in self.class_names else -1
+        filters = {'track_id': track_id, 'source': source, 'class_id': class_id}
+        for name, value in filters.items():
+            if value is not None and name not in columns:
+                columns.append(name)
+
+        parts = {name: [] for name in columns}
+        for path, meta in self.chunks:
+            if (start is not None and meta['end'] < start) or (end is not None and meta['start'] >= end):
+                continue
+            timestamps = self.column(path, 'timestamp')
+            if self.is_sorted(path, meta):
+                lo = np.searchsorted(timestamps, start, 'left') if start is not None else 0
+                hi = np.searchsorted(timestamps, end, 'left') if end is not None else len(timestamps)
+                rows = slice(lo, hi)
+                count = hi - lo
+            else:
+                in_range = np.ones(len(timestamps), dtype=bool)
+                if start is not None:
+                    in_range &= timestamps >= start
+                if end is not None:
+                    in_range &= timestamps < end
+                rows = np.flatnonzero(in_range)
+                count = len(rows)
+            if count <= 0:
+                continue
+
+            chunk = {name: np.array(self.column(path, name)[rows]) for name in columns}
+            keep = np.ones(count, dtype=bool)
+            for name, value in filters.items():
+                if value is not None:
+                    keep &= chunk[name] == value
+            for name in columns:
+                parts[name].append(chunk[name][keep])
+
+        result = {name: np.concatenate(values) if values else np.empty(0, dtype=COLUMNS[name])
+                  for name, values in parts.items()}
+        if 'class_id' in result:
+            result['class_name'] = np.array(self.class_names, dtype=object)[result['class_id']] \
+                if len(result['class_id']) else np.empty(0, dtype=object)
+        return result
+
+    def time_range(self):
+        if not self.chunks:
+            return None, None
+        return min(meta['start'] for _, meta in self.chunks), max(meta['end'] for _, meta in self.chunks)
+
+    def summary(self, start=None, end=None):
+        rows = self.query(start, end, columns=['track_id', 'class_id', 'source'])
+        unique_tracks = {}
+        for source, track_id, class_name in zip(rows['source'], rows['track_id'], rows['class_name']):
+            unique_tracks[(source, track_id)] = class_name
+        return {
+            'rows': int(len(rows['timestamp'])),
+            'unique_tracks': len(unique_tracks),
+            'tracks_per_class': dict(Counter(unique_tracks.values())),
+            'rows_per_class': dict(Counter(rows['class_name']))
+        }
+
+def parse_time(value):
+    """Epoch seconds or an ISO date/time string"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize or export a detection event log')
+    parser.add_argument('directory', type=str, help='Event log directory')
+    parser.add_argument('--start', type=str, default=None, help='Start time (epoch seconds or ISO format)')
+    parser.add_argument('--end', type=str, default=None, help='End time (epoch seconds or ISO format)')
+    parser.add_argument('--export', type=str, default=None, help='Write the selected rows to this CSV file')
+
+    args = parser.parse_args()
+
+    reader = EventLogReader(args.directory)
+    start, end = parse_time(args.start), parse_time(args.end)
+    first, last = reader.time_range()
+
+    print("📒 Detection Event Log")
+    print("=" * 50)
+    print(f"Chunks: {len(reader.chunks)}")
+    if first is not None:
+        print(f"Covers: {datetime.fromtimestamp(first).isoformat()} - {datetime.fromtimestamp(last).isoformat()}")
+
+    query_start = time.perf_counter()
+    summary = reader.summary(start, end)
+    print(f"Rows in range: {summary['rows']} ({(time.perf_counter() - query_start) * 1000:.1f} ms)")
+    print(f"Unique tracks: {summary['unique_tracks']}")
+    for class_name, count in sorted(summary['tracks_per_class'].items(), key=lambda item: -item[1]):
+        print(f"   {class_name:<16} {count}")
+
+    if args.export:
+        rows = reader.query(start, end)
+        with open(args.export, 'w') as f:
+            names = list(COLUMNS) + ['class_name']
+            f.write(','.join(names) + '\n')
+            for values in zip(*(rows[name] for name in names)):
+                f.write(','.join(str(value) for value in values) + '\n')
+        print(f"\nRows saved to {args.export}")
+
+if __name__ == "__main__":
+    main()
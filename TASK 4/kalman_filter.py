@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+class KalmanBoxFilter:
+    """Constant-velocity Kalman filter for a single bounding box.
+
+    State is [cx, cy, w, h, vx, vy]: the center moves with constant velocity and
+    the box size follows a random walk. Measurements are [cx, cy, w, h].
+    """
+    TRANSITION = np.eye(6)
+    TRANSITION[0, 4] = 1.0
+    TRANSITION[1, 5] = 1.0
+    MEASUREMENT = np.eye(4, 6)
+
+    def __init__(self, bbox, process_noise=1.0, measurement_noise=10.0):
+        self.state = np.zeros(6)
+        self.state[:4] = self._to_measurement(bbox)
+        self.covariance = np.diag([10.0, 10.0, 10.0, 10.0, 1000.0, 1000.0])
+        self.process_covariance = np.diag([1.0, 1.0, 1.0, 1.0, 0.5, 0.5]) * process_noise
+        self.measurement_covariance = np.eye(4) * measurement_noise
+
+    @staticmethod
+    def _to_measurement(bbox):
+        x, y, w, h = bbox
+        return np.array([x + w / 2, y + h / 2, w, h], dtype=np.float64)
+
+    def predict(self):
+        """Advance the state by one frame and return the predicted box"""
+        F = self.TRANSITION
+        self.state = F @ self.state
+        self.covariance = F @ self.covariance @ F.T + self.process_covariance
+        return self.bbox()
+
+    def update(self, bbox):
+        """Fuse a detected box into the state"""
+        H = self.MEASUREMENT
+        residual = self._to_measurement(bbox) - H @ self.state
+        innovation = H @ self.covariance @ H.T + self.measurement_covariance
+        gain = self.covariance @ H.T @ np.linalg.inv(innovation)
+        self.state = self.state + gain @ residual
+        self.covariance = (np.eye(6) - gain @ H) @ self.covariance
+        return self.bbox()
+
+    def bbox(self):
+        """Current state as an integer [x, y, w, h] box"""
+        cx, cy = self.state[0], self.state[1]
+        w, h = max(self.state[2], 1.0), max(self.state[3], 1.0)
+        return [int(cx - w / 2), int(cy - h / 2), int(w), int(h)]
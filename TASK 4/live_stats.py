@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+import json
+import threading
+import time
+from collections import deque
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def sse_event(data, event_id=None):
+    """One Server-Sent Events message carrying pre-serialized JSON bytes"""
+    header = f'id: {event_id}\n'.encode() if event_id is not None else b''
+    return header + b'data: ' + data + b'\n\n'
+
+# Comment line that keeps idle SSE connections (and proxies) open
+SSE_KEEPALIVE = b': keepalive\n\n'
+
+class RollingRate:
+    """Events per second over the last `window` seconds"""
+    def __init__(self, window=2.0):
+        self.window = window
+        self.times = deque()
+
+    def tick(self, now=None):
+        now = time.monotonic() if now is None else now
+        self.times.append(now)
+        while self.times[0] < now - self.window:
+            self.times.popleft()
+
+    def rate(self, now=None):
+        now = time.monotonic() if now is None else now
+        while self.times and self.times[0] < now - self.window:
+            self.times.popleft()
+        if len(self.times) < 2:
+            return 0.0
+        return (len(self.times) - 1) / (self.times[-1] - self.times[0])
+
+class StatsPublisher:
+    """Latest statistics snapshot of a session, shared by every reader.
+
+    The processing thread builds a new dict and its JSON once per publish and
+    swaps both in with a single attribute assignment, so readers never see a
+    half-updated snapshot and never take a lock; published snapshots are not
+    mutated afterwards. Snapshots are published at most every `min_interval`
+    seconds. Stream readers block on a condition variable (or register a
+    listener) until the version changes, like FrameBroadcaster viewers.
+    """
+    def __init__(self, initial=None, min_interval=0.25):
+        self.min_interval = min_interval
+        self.condition = threading.Condition()
+        self.listeners = []
+        self.subscribers = 0
+        self.closed = False
+        self.last_publish = 0.0
+        self.current = (0, dict(initial or {}), json.dumps(initial or {}).encode())
+
+    def due(self, now=None):
+        """Whether enough time has passed for the next snapshot"""
+        now = time.monotonic() if now is None else now
+        return now - self.last_publish >= self.min_interval
+
+    def publish(self, snapshot):
+        """Make `snapshot` (a fresh dict, not to be modified later) the current one"""
+        self.last_publish = time.monotonic()
+        version = self.current[0] + 1
+        snapshot['version'] = version
+        self.current = (version, snapshot, json.dumps(snapshot).encode())
+        with self.condition:
+            self.condition.notify_all()
+            listeners = list(self.listeners)
+        for listener in listeners:
+            listener(version)
+
+    def snapshot(self):
+        return self.current[1]
+
+    def peek(self):
+        """(version, snapshot, json bytes) of the current snapshot"""
+        return self.current
+
+    def wait_for_update(self, last_version, timeout=15.0):
+        """Block until a snapshot newer than `last_version` exists or the publisher
+        closes; returns (version, json bytes), json being None on timeout"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.current[0] != last_version or self.closed, timeout)
+        version, _, data = self.current
+        return (version, data) if version != last_version else (last_version, None)
+
+    def stream(self, keepalive=15.0):
+        """Generate SSE messages: the current snapshot, then every new one"""
+        last_version = None
+        self.add_subscriber()
+        try:
+            while not self.closed:
+                version, data = self.wait_for_update(last_version, keepalive)
+                if data is None:
+                    yield SSE_KEEPALIVE
+                    continue
+                last_version = version
+                yield sse_event(data, version)
+        finally:
+            self.remove_subscriber()
+
+    def close(self):
+        """End all streams; called when the session stops"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+            listeners = list(self.listeners)
+        for listener in listeners:
+            listener(self.current[0])
+
+    def add_listener(self, callback):
+        """Call `callback(version)` from the publishing thread on every new snapshot"""
+        with self.condition:
+            self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self.condition:
+            if callback in self.listeners:
+                self.listeners.remove(callback)
+
+    def add_subscriber(self):
+        with self.condition:
+            self.subscribers += 1
+
+    def remove_subscriber(self):
+        with self.condition:
+            self.subscribers -= 1
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+def read_process_cpu(pid):
+    """Total user + system CPU seconds of a process, from /proc (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, IndexError, ValueError):
+        return None
+
+async def run_viewer(host, port, path, stop_at, result):
+    """Read a multipart MJPEG stream, recording frame arrival and latency"""
+    start = time.time()
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError as e:
+        result['error'] = str(e)
+        return
+
+    writer.write(f"GET {path} HTTP/1.0\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+
+    try:
+        await reader.readuntil(b'\r\n\r\n')
+        while time.time() < stop_at:
+            headers = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), stop_at - time.time())
+            length = None
+            timestamp = None
+            for line in headers.decode(errors='ignore').split('\r\n'):
+                name, _, value = line.partition(':')
+                if name.lower() == 'x-timestamp':
+                    timestamp = float(value)
+                elif name.lower() == 'content-length':
+                    length = int(value)
+
+            if length is not None:
+                await reader.readexactly(length)
+            else:
+                await reader.readuntil(b'\r\n--frame')
+
+            now = time.time()
+            if 'first_frame' not in result:
+                result['first_frame'] = now - start
+            result['frames'] = result.get('frames', 0) + 1
+            if timestamp is not None:
+                result.setdefault('latencies', []).append(now - timestamp)
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+async def run_level(host, port, path, viewers, duration):
+    stop_at = time.time() + duration
+    results = [{} for _ in range(viewers)]
+    await asyncio.gather(*(run_viewer(host, port, path, stop_at, r) for r in results))
+    return results
+
+def summarize(viewers, duration, results, cpu_seconds):
+    frames = [r.get('frames', 0) for r in results]
+    latencies = np.array([lat for r in results for lat in r.get('latencies', [])])
+    summary = {
+        'viewers': viewers,
+        'errors': sum(1 for r in results if 'error' in r),
+        'fps_per_viewer': float(np.mean(frames)) / duration if frames else 0.0,
+        'min_fps_per_viewer': min(frames) / duration if frames else 0.0,
+        'server_cpu_percent': 100.0 * cpu_seconds / duration if cpu_seconds is not None else None
+    }
+    if len(latencies):
+        summary.update({
+            'latency_p50_ms': float(np.percentile(latencies, 50) * 1000),
+            'latency_p95_ms': float(np.percentile(latencies, 95) * 1000),
+            'latency_max_ms': float(latencies.max() * 1000)
+        })
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the MJPEG /video_feed stream')
+    parser.add_argument('--url', type=str, default='http://localhost:5020/video_feed',
+                       help='Stream URL')
+    parser.add_argument('--viewers', type=int, nargs='+', default=[1, 5, 10, 25, 50],
+                       help='Concurrent viewer counts to test')
+    parser.add_argument('--duration', type=float, default=10.0,
+                       help='Seconds per viewer level')
+    parser.add_argument('--server-pid', type=int, default=None,
+                       help='PID of the server process, to sample its CPU usage')
+    parser.add_argument('--json', type=str, default=None,
+                       help='Write results to this JSON file')
+
+    args = parser.parse_args()
+
+    url = urlparse(args.url)
+    host, port = url.hostname, url.port or 80
+    path = url.path + (f"?{url.query}" if url.query else '')
+
+    print("📈 Stream Load Test")
+    print("=" * 78)
+    print(f"{'viewers':>8} {'errors':>7} {'fps/viewer':>11} {'min fps':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'cpu %':>7}")
+
+    summaries = []
+    for viewers in args.viewers:
+        cpu_before = read_process_cpu(args.server_pid) if args.server_pid else None
+        results = asyncio.run(run_level(host, port, path, viewers, args.duration))
+        cpu_after = read_process_cpu(args.server_pid) if args.server_pid else None
+        cpu_seconds = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+
+        summary = summarize(viewers, args.duration, results, cpu_seconds)
+        summaries.append(summary)
+
+        def fmt(key):
+            value = summary.get(key)
+            return f"{value:.1f}" if value is not None else '-'
+
+        print(f"{viewers:>8} {summary['errors']:>7} {fmt('fps_per_viewer'):>11} {fmt('min_fps_per_viewer'):>8} "
+              f"{fmt('latency_p50_ms'):>8} {fmt('latency_p95_ms'):>8} {fmt('latency_max_ms'):>8} "
+              f"{fmt('server_cpu_percent'):>7}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'url': args.url, 'duration': args.duration, 'levels': summaries}, f, indent=2)
+        print(f"\nResults saved to {args.json}")
+
+if __name__ == "__main__":
+    main()
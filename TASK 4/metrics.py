@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+import bisect
+import threading
+from collections import deque
+import numpy as np
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Hot-path stages in processing order
+STAGES = ('capture', 'blob', 'forward', 'decode', 'nms', 'tracking', 'draw', 'encode', 'frame_interval')
+
+# Prometheus histogram bucket bounds, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+class LatencyHistogram:
+    """Latency samples of one stage.
+
+    Cumulative bucket counts, sum and count back the Prometheus histogram;
+    the last `window` samples give rolling percentiles, so spikes show up
+    instead of being averaged away.
+    """
+    def __init__(self, window=1024):
+        self.window = deque(maxlen=window)
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.window.append(seconds)
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentiles(self):
+        if not self.window:
+            return {q: 0.0 for q in QUANTILES}
+        values = np.percentile(np.fromiter(self.window, dtype=np.float64, count=len(self.window)),
+                               [q * 100 for q in QUANTILES])
+        return dict(zip(QUANTILES, values.tolist()))
+
+class StageMetrics:
+    """Per-stage latency histograms shared by the threads of one tracker or session"""
+    def __init__(self, window=1024):
+        self.window_size = window
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = LatencyHistogram(self.window_size)
+            histogram.observe(seconds)
+
+    def totals(self):
+        """{stage: (count, total seconds)} since creation, for computing deltas"""
+        with self.lock:
+            return {stage: (histogram.count, histogram.total) for stage, histogram in self.histograms.items()}
+
+    def ordered_stages(self):
+        return sorted(self.histograms, key=lambda s: (STAGES.index(s) if s in STAGES else len(STAGES), s))
+
+    def snapshot(self):
+        """{stage: {count, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}}"""
+        with self.lock:
+            result = {}
+            for stage in self.ordered_stages():
+                histogram = self.histograms[stage]
+                percentiles = histogram.percentiles()
+                result[stage] = {
+                    'count': histogram.count,
+                    'mean_ms': histogram.total / histogram.count * 1000 if histogram.count else 0.0,
+                    'p50_ms': percentiles[0.5] * 1000,
+                    'p95_ms': percentiles[0.95] * 1000,
+                    'p99_ms': percentiles[0.99] * 1000,
+                    'max_ms': histogram.max * 1000
+                }
+            return result
+
+    def prometheus(self, labels=None):
+        """Histogram and rolling-quantile lines in Prometheus text format, without
+        HELP/TYPE headers (see `prometheus_text`)"""
+        base = format_labels(labels) + ',' if labels else ''
+        histogram_lines = []
+        quantile_lines = []
+        with self.lock:
+            for stage in self.ordered_stages():
+                histogram = self.histograms[stage]
+                prefix = f'{base}stage="{stage}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.buckets):
+                    cumulative += count
+                    histogram_lines.append(f'detection_stage_seconds_bucket{{{prefix},le="{bound}"}} {cumulative}')
+                histogram_lines.append(f'detection_stage_seconds_bucket{{{prefix},le="+Inf"}} {histogram.count}')
+                histogram_lines.append(f'detection_stage_seconds_sum{{{prefix}}} {histogram.total:.6f}')
+                histogram_lines.append(f'detection_stage_seconds_count{{{prefix}}} {histogram.count}')
+                for quantile, value in histogram.percentiles().items():
+                    quantile_lines.append(
+                        f'detection_stage_rolling_seconds{{{prefix},quantile="{quantile}"}} {value:.6f}'
+                    )
+        return histogram_lines, quantile_lines
+
+    def summary_lines(self):
+        lines = [f"{'stage':<15} {'count':>7} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}"]
+        for stage, s in self.snapshot().items():
+            lines.append(f"{stage:<15} {s['count']:>7} {s['mean_ms']:>8.2f} {s['p50_ms']:>8.2f} "
+                         f"{s['p95_ms']:>8.2f} {s['p99_ms']:>8.2f} {s['max_ms']:>8.2f}")
+        return lines
+
+    def log_summary(self):
+        if not self.histograms:
+            return
+        logger.info("Stage latency summary:\n" + '\n'.join(self.summary_lines()))
+
+def label_value(value):
+    """A label value escaped for the text exposition format (backslash, quote, newline)"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(labels):
+    """`key="value",...` for a label dict, values escaped"""
+    return ','.join(f'{key}="{label_value(value)}"' for key, value in labels.items())
+
+def prometheus_text(labelled_metrics, gauges=None):
+    """Render a /metrics page.
+
+    `labelled_metrics` is a list of (labels, StageMetrics); `gauges` maps a metric
+    name to (help text, [(labels, value)]) or, for other metric types such as
+    'counter', to (help text, [(labels, value)], type).
+    """
+    histogram_lines = []
+    quantile_lines = []
+    for labels, metrics in labelled_metrics:
+        histograms, quantiles = metrics.prometheus(labels)
+        histogram_lines.extend(histograms)
+        quantile_lines.extend(quantiles)
+
+    lines = [
+        '# HELP detection_stage_seconds Latency of each detection pipeline stage',
+        '# TYPE detection_stage_seconds histogram'
+    ] + histogram_lines + [
+        '# HELP detection_stage_rolling_seconds Rolling latency percentiles over the last samples',
+        '# TYPE detection_stage_rolling_seconds gauge'
+    ] + quantile_lines
+
+    for name, (help_text, samples, *metric_type) in (gauges or {}).items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type[0] if metric_type else "gauge"}')
+        for labels, value in samples:
+            label_text = format_labels(labels)
+            lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+    return '\n'.join(lines) + '\n'
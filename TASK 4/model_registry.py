@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+import os
+import threading
+import time
+import cv2
+import numpy as np
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Network files and native input size of each selectable model variant
+MODEL_VARIANTS = {
+    'yolov4': {'cfg': 'yolov4.cfg', 'weights': 'yolov4.weights', 'input_size': 416},
+    'yolov4-tiny': {'cfg': 'yolov4-tiny.cfg', 'weights': 'yolov4-tiny.weights', 'input_size': 416},
+    'onnx': {'cfg': None, 'weights': 'yolov5s.onnx', 'input_size': 640}
+}
+
+BACKENDS = {
+    'opencv': cv2.dnn.DNN_BACKEND_OPENCV,
+    'cuda': cv2.dnn.DNN_BACKEND_CUDA,
+    'openvino': cv2.dnn.DNN_BACKEND_INFERENCE_ENGINE
+}
+
+TARGETS = {
+    'cpu': cv2.dnn.DNN_TARGET_CPU,
+    'opencl': cv2.dnn.DNN_TARGET_OPENCL,
+    'opencl_fp16': cv2.dnn.DNN_TARGET_OPENCL_FP16,
+    'cuda': cv2.dnn.DNN_TARGET_CUDA,
+    'cuda_fp16': cv2.dnn.DNN_TARGET_CUDA_FP16
+}
+
+def model_files(model_path=None, variant='yolov4'):
+    """(cfg, weights) paths of a variant in a model directory, or the working directory.
+
+    `model_path` may also name an .onnx file directly; cfg is None for ONNX models.
+    """
+    if variant not in MODEL_VARIANTS:
+        raise ValueError(f"Unknown model variant: {variant} (choose from {', '.join(MODEL_VARIANTS)})")
+    files = MODEL_VARIANTS[variant]
+
+    if model_path and model_path.endswith('.onnx'):
+        return None, model_path
+    if model_path and os.path.isdir(model_path):
+        cfg = os.path.join(model_path, files['cfg']) if files['cfg'] else None
+        return cfg, os.path.join(model_path, files['weights'])
+    return files['cfg'], files['weights']
+
+def parse_input_size(value, variant='yolov4'):
+    """(width, height) from 416, "416", "512x288" or [512, 288]; None selects the
+    variant's native size"""
+    if value is None:
+        size = MODEL_VARIANTS.get(variant, MODEL_VARIANTS['yolov4'])['input_size']
+        return size, size
+    if isinstance(value, str):
+        value = [int(v) for v in value.lower().split('x')]
+    if isinstance(value, int):
+        value = [value]
+    value = [int(v) for v in value]
+    width, height = value if len(value) == 2 else (value[0], value[0])
+    if width % 32 or height % 32:
+        raise ValueError(f"Input size must be a multiple of 32, got {width}x{height}")
+    return width, height
+
+def backend_id(name):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend: {name} (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name]
+
+def target_id(name):
+    if name not in TARGETS:
+        raise ValueError(f"Unknown target: {name} (choose from {', '.join(TARGETS)})")
+    return TARGETS[name]
+
+class ModelHandle:
+    """A loaded network shared by every tracker that asked for the same key.
+
+    cv2.dnn.Net is not safe for concurrent forward passes, so users must hold
+    `lock` around setInput/forward. Each user builds blobs at its own input
+    size; `input_size` is the one the network was first requested with, used
+    for warm-up.
+    """
+    def __init__(self, key, net, load_seconds, input_size=(416, 416)):
+        self.key = key
+        self.net = net
+        self.input_size = tuple(int(v) for v in input_size)
+        self.lock = threading.Lock()
+        self.load_seconds = load_seconds
+        self.warmup_seconds = None
+        self.loaded_at = time.time()
+        self._output_layers = None
+
+    @property
+    def output_format(self):
+        """'yolov5' for ONNX exports (pixel boxes, separate objectness), else 'darknet'"""
+        return 'yolov5' if self.key[1].endswith('.onnx') else 'darknet'
+
+    def output_layers(self):
+        if self._output_layers is None:
+            layer_names = self.net.getLayerNames()
+            self._output_layers = [layer_names[i - 1]
+                                   for i in np.asarray(self.net.getUnconnectedOutLayers()).flatten()]
+        return self._output_layers
+
+    def warm_up(self, runs=1):
+        """Run forward passes on a blank image so the first real frame is not slow"""
+        width, height = self.input_size
+        blob = cv2.dnn.blobFromImage(np.zeros((height, width, 3), np.uint8), 1/255.0,
+                                     (width, height), swapRB=True, crop=False)
+        start = time.perf_counter()
+        with self.lock:
+            for _ in range(runs):
+                self.net.setInput(blob)
+                self.net.forward(self.output_layers())
+        self.warmup_seconds = time.perf_counter() - start
+        logger.info(f"Warmed up {os.path.basename(self.key[1])} in {self.warmup_seconds:.2f}s")
+        return self.warmup_seconds
+
+    def describe(self):
+        cfg, weights, backend, target = self.key
+        return {
+            'cfg': cfg,
+            'weights': weights,
+            'backend': backend,
+            'target': target,
+            'input_size': list(self.input_size),
+            'format': self.output_format,
+            'load_seconds': round(self.load_seconds, 3),
+            'warmup_seconds': round(self.warmup_seconds, 3) if self.warmup_seconds is not None else None,
+            'loaded_at': self.loaded_at
+        }
+
+class ModelRegistry:
+    """Process-wide cache of loaded networks.
+
+    Networks are keyed by (cfg, weights, backend, target) and loaded once, from
+    Darknet cfg/weights or from an .onnx file (cfg None); later requests for the
+    same key get the same ModelHandle. The input size is not part of the key:
+    OpenCV reshapes the network to whatever blob it is given, so trackers at
+    different (or adaptively changing) sizes share one copy of the weights.
+    Loads of different keys do not block each other.
+    """
+    def __init__(self):
+        self.handles = {}
+        self.lock = threading.Lock()
+        self.key_locks = {}
+
+    def key(self, cfg, weights, backend=cv2.dnn.DNN_BACKEND_OPENCV, target=cv2.dnn.DNN_TARGET_CPU):
+        return (os.path.abspath(cfg) if cfg else None, os.path.abspath(weights), int(backend), int(target))
+
+    def get(self, cfg, weights, backend=cv2.dnn.DNN_BACKEND_OPENCV, target=cv2.dnn.DNN_TARGET_CPU,
+            input_size=(416, 416)):
+        """Return the handle for this network, loading it on first use.
+
+        `input_size` only sets the warm-up size of a network loaded by this call.
+        Raises cv2.error (or OSError) if the files cannot be loaded.
+        """
+        key = self.key(cfg, weights, backend, target)
+        with self.lock:
+            handle = self.handles.get(key)
+            if handle is not None:
+                return handle
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self.lock:
+                if key in self.handles:
+                    return self.handles[key]
+
+            start = time.perf_counter()
+            if weights.endswith('.onnx'):
+                net = cv2.dnn.readNetFromONNX(weights)
+            else:
+                net = cv2.dnn.readNetFromDarknet(cfg, weights)
+            net.setPreferableBackend(backend)
+            net.setPreferableTarget(target)
+            handle = ModelHandle(key, net, time.perf_counter() - start, input_size)
+            logger.info(f"Loaded {weights} in {handle.load_seconds:.2f}s")
+
+            with self.lock:
+                self.handles[key] = handle
+            return handle
+
+    def warm_up(self, runs=1):
+        """Warm up every loaded network; returns {weights: seconds}"""
+        with self.lock:
+            handles = list(self.handles.values())
+        return {handle.key[1]: handle.warm_up(runs) for handle in handles}
+
+    def clear(self):
+        with self.lock:
+            self.handles.clear()
+            self.key_locks.clear()
+
+    def stats(self):
+        with self.lock:
+            handles = list(self.handles.values())
+        return [handle.describe() for handle in handles]
+
+registry = ModelRegistry()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+import cv2
+import numpy as np
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def merge_regions(regions):
+    """Merge overlapping (x, y, w, h) rectangles until all are disjoint"""
+    regions = [list(region) for region in regions]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                ax, ay, aw, ah = regions[i]
+                bx, by, bw, bh = regions[j]
+                if ax < bx + bw and bx < ax + aw and ay < by + bh and by < ay + ah:
+                    x, y = min(ax, bx), min(ay, by)
+                    regions[i] = [x, y, max(ax + aw, bx + bw) - x, max(ay + ah, by + bh) - y]
+                    del regions[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return [tuple(region) for region in regions]
+
+class MotionGate:
+    """Cheap motion check run before the detector.
+
+    Each frame is downscaled to `scale_width` pixels wide, converted to gray and
+    compared with the frame of the last detector pass (`diff`, so slow motion
+    accumulates until it is seen) or a MOG2 background model (`mog2`).
+    `regions(frame)` then returns:
+
+    - None: run the detector on the whole frame (no reference yet, periodic
+      refresh, or motion covering most of the frame)
+    - []: nothing moved, skip the detector
+    - a list of (x, y, w, h) full-resolution regions to run the detector on
+    """
+    METHODS = ('diff', 'mog2')
+
+    def __init__(self, method='diff', scale_width=160, threshold=25, min_area=0.001,
+                 padding=0.15, min_region_size=128, max_region_fraction=0.5, refresh_interval=100):
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown motion gate method: {method} (choose from {', '.join(self.METHODS)})")
+        self.settings = {
+            'method': method, 'scale_width': scale_width, 'threshold': threshold,
+            'min_area': min_area, 'padding': padding, 'min_region_size': min_region_size,
+            'max_region_fraction': max_region_fraction, 'refresh_interval': refresh_interval
+        }
+        self.method = method
+        self.scale_width = scale_width
+        self.threshold = threshold
+        self.min_area = min_area
+        self.padding = padding
+        self.min_region_size = min_region_size
+        self.max_region_fraction = max_region_fraction
+        self.refresh_interval = refresh_interval
+        self.reset()
+
+    def reset(self):
+        self.previous = None
+        self.subtractor = None
+        if self.method == 'mog2':
+            self.subtractor = cv2.createBackgroundSubtractorMOG2(history=200, varThreshold=self.threshold,
+                                                                 detectShadows=False)
+        self.frames = 0
+        self.skipped_frames = 0
+        self.roi_frames = 0
+        self.full_frames = 0
+        self.roi_area = 0.0
+
+    def clone(self):
+        """A gate with the same settings and no background state"""
+        return MotionGate(**self.settings)
+
+    def motion_mask(self, small):
+        if self.subtractor is not None:
+            mask = self.subtractor.apply(small)
+            return mask if self.frames > 1 else None
+
+        if self.previous is None:
+            self.previous = small
+            return None
+        _, mask = cv2.threshold(cv2.absdiff(small, self.previous), self.threshold, 255, cv2.THRESH_BINARY)
+        return mask
+
+    def regions(self, frame):
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.scale_width / width)
+        small = cv2.resize(frame, (max(1, int(width * scale)), max(1, int(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+        small = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+        self.frames += 1
+        mask = self.motion_mask(small)
+        if mask is None or (self.refresh_interval and self.frames % self.refresh_interval == 0):
+            self.full_frames += 1
+            self.previous = small
+            return None
+
+        mask = cv2.dilate(mask, None, iterations=2)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        min_area = self.min_area * small.shape[0] * small.shape[1]
+        boxes = [cv2.boundingRect(c) for c in contours if cv2.contourArea(c) >= min_area]
+        if not boxes:
+            self.skipped_frames += 1
+            return []
+
+        self.previous = small
+        regions = merge_regions(self.scale_region(box, scale, width, height) for box in boxes)
+        area = sum(w * h for _, _, w, h in regions) / float(width * height)
+        if area > self.max_region_fraction:
+            self.full_frames += 1
+            return None
+
+        self.roi_frames += 1
+        self.roi_area += area
+        return regions
+
+    def scale_region(self, box, scale, width, height):
+        """Map a downscaled box to the full frame, padded and grown to a minimum size"""
+        x, y, w, h = (np.array(box, dtype=np.float64) / scale)
+        pad_w = max(w * self.padding, (self.min_region_size - w) / 2)
+        pad_h = max(h * self.padding, (self.min_region_size - h) / 2)
+        x0, y0 = max(0, int(x - pad_w)), max(0, int(y - pad_h))
+        x1, y1 = min(width, int(x + w + pad_w)), min(height, int(y + h + pad_h))
+        return x0, y0, x1 - x0, y1 - y0
+
+    def stats(self):
+        return {
+            'method': self.method,
+            'gated_frames': self.frames,
+            'skipped_frames': self.skipped_frames,
+            'roi_frames': self.roi_frames,
+            'full_frames': self.full_frames,
+            'avg_roi_area': self.roi_area / self.roi_frames if self.roi_frames else 0.0
+        }
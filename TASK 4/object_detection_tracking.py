@@ -3,23 +3,152 @@
 import cv2
 import numpy as np
 import argparse
+import copy
+import threading
 import time
 import os
 import sys
-from collections import deque
 import logging
 
+from association import Associator
+from event_log import EventLogWriter
+from kalman_filter import KalmanBoxFilter
+from metrics import StageMetrics
+from motion_gate import MotionGate
+from model_registry import (MODEL_VARIANTS, BACKENDS, TARGETS, model_files, parse_input_size,
+                            backend_id, target_id, registry)
+from overlay import OverlayRenderer, snapshot_tracks
+from pipeline import FramePipeline
+from track_store import TrackStore
+from video_io import CAPTURE_BACKENDS, HW_ACCELERATION, open_reader, open_writer
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def decode_yolo_outputs(outputs, width, height, confidence_threshold):
+    """Decode raw YOLO output layers into NMS-ready boxes, confidences and class ids.
+
+    All output layers are stacked into one (rows, 5 + classes) array and filtered,
+    arg-maxed and converted to pixel boxes with whole-array NumPy operations.
+    """
+    predictions = np.concatenate(
+        [np.asarray(output).reshape(-1, output.shape[-1]) for output in outputs], axis=0
+    )
+    scores = predictions[:, 5:]
+    
+    class_ids = np.argmax(scores, axis=1)
+    confidences = scores[np.arange(len(scores)), class_ids]
+    
+    keep = confidences > confidence_threshold
+    if not np.any(keep):
+        return [], [], []
+    
+    kept = predictions[keep, :4]
+    center_x = (kept[:, 0] * width).astype(np.int64)
+    center_y = (kept[:, 1] * height).astype(np.int64)
+    w = (kept[:, 2] * width).astype(np.int64)
+    h = (kept[:, 3] * height).astype(np.int64)
+    
+    x = (center_x - w / 2).astype(np.int64)
+    y = (center_y - h / 2).astype(np.int64)
+    
+    boxes = np.stack([x, y, w, h], axis=1).tolist()
+    return boxes, confidences[keep].astype(float).tolist(), class_ids[keep].tolist()
+
+def normalize_yolov5_outputs(outputs, input_size):
+    """Convert YOLOv5-style ONNX outputs to the Darknet layout decode_yolo_outputs expects.
+
+    YOLOv5 exports give boxes in input-image pixels and keep objectness separate
+    from the class scores; Darknet layers give normalized boxes and class scores
+    already multiplied by objectness.
+    """
+    width, height = input_size
+    scale = np.array([width, height, width, height], dtype=np.float32)
+    normalized = []
+    for output in outputs:
+        output = np.asarray(output)
+        boxes = output[..., :4] / scale
+        scores = output[..., 5:] * output[..., 4:5]
+        normalized.append(np.concatenate([boxes, output[..., 4:5], scores], axis=-1))
+    return normalized
+
+def split_batch_outputs(outputs, batch_size):
+    """Split batched output layers into a per-image list of output layers.
+
+    OpenCV returns (batch, rows, 5 + classes) layers for batches larger than one and
+    plain (rows, 5 + classes) layers otherwise.
+    """
+    per_image = [[] for _ in range(batch_size)]
+    for output in outputs:
+        if output.ndim == 3:
+            chunks = output
+        else:
+            chunks = np.split(output, batch_size, axis=0)
+        for i in range(batch_size):
+            per_image[i].append(chunks[i])
+    return per_image
+
+def offset_region_detections(region_detections, regions):
+    """Shift detections made on region crops back to full-frame coordinates"""
+    detections = []
+    for (x, y, _, _), crop_detections in zip(regions, region_detections):
+        for detection in crop_detections:
+            bx, by, bw, bh = detection['bbox']
+            detection['bbox'] = [bx + x, by + y, bw, bh]
+            detections.append(detection)
+    return detections
+
+def boxes_overlap(bbox, regions):
+    """Whether an (x, y, w, h) box intersects any of the regions"""
+    x, y, w, h = bbox
+    return any(x < rx + rw and rx < x + w and y < ry + rh and ry < y + h for rx, ry, rw, rh in regions)
+
+def is_live_source(source):
+    """Cameras and network streams are live; plain file paths are not"""
+    return not isinstance(source, str) or source.isdigit() or '://' in source
+
 class ObjectTracker:
-    def __init__(self, model_path=None, confidence_threshold=0.5, nms_threshold=0.4):
+    def __init__(self, model_path=None, confidence_threshold=0.5, nms_threshold=0.4, associator=None,
+                 max_tracks=1000, track_ttl=10.0, detect_interval=1, min_track_confidence=0.3,
+                 motion_prediction=None, variant='yolov4', input_size=None, backend='opencv', target='cpu',
+                 motion_gate=None, event_log=None, draw_overlay=True):
         self.confidence_threshold = confidence_threshold
         self.nms_threshold = nms_threshold
-        self.trackers = {}
-        self.track_id = 0
-        self.track_history = {}
         self.max_history = 30
+        self.max_tracks = max_tracks
+        self.track_ttl = track_ttl
+        self.associator = associator or Associator()
+        
+        # Between detector passes tracks are propagated by Kalman prediction; each
+        # predicted frame decays tracking confidence until a re-detection is forced
+        self.detect_interval = max(1, int(detect_interval))
+        self.min_track_confidence = min_track_confidence
+        self.confidence_decay = 0.9
+        self.motion_prediction = detect_interval > 1 if motion_prediction is None else motion_prediction
+        
+        # Optional MotionGate: skips the detector on still frames and crops it to
+        # moving regions otherwise
+        self.motion_gate = motion_gate
+        
+        # Optional EventLogWriter receiving every frame's tracks; `event_source`
+        # tells sources sharing one log apart
+        self.event_log = event_log
+        self.event_source = 0
+        
+        # Rolling per-stage latency histograms (capture, forward, tracking, ...)
+        self.metrics = StageMetrics()
+        
+        # Clock of track times (last seen, TTL): wall-clock time unless set, e.g.
+        # to VideoReader.position so files expire tracks in video time
+        self.clock = None
+        self.reset_tracking()
+        
+        # Network variant, inference resolution and backend/target; the input
+        # size defaults to the variant's native resolution
+        self.variant = variant
+        self.input_size = parse_input_size(input_size, variant)
+        self.backend = backend
+        self.target = target
         
         self.load_yolo_model(model_path)
         
@@ -27,25 +156,72 @@ class ObjectTracker:
         
         self.colors = np.random.uniform(0, 255, size=(len(self.class_names), 3))
         
+        # Boxes, labels and trails; headless and recording modes can turn the
+        # overlay off and get frames back untouched
+        self.draw_overlay = draw_overlay
+        self.renderer = OverlayRenderer(self.class_names, self.colors)
+        
         logger.info("Object Detection and Tracking system initialized")
     
+    def reset_tracking(self):
+        """Clear all track state"""
+        self.trackers = TrackStore(max_tracks=self.max_tracks, ttl=self.track_ttl,
+                                   max_history=self.max_history, clock=self.now)
+        self.track_id = 0
+        self.track_history = self.trackers.history
+        self.frames_since_detection = self.detect_interval
+        self.frame_index = 0
+        if self.motion_gate is not None:
+            self.motion_gate.reset()
+    
+    def clone(self, **overrides):
+        """Return a tracker that shares this network but keeps its own track state.
+
+        Keyword arguments override constructor settings such as
+        confidence_threshold or detect_interval on the copy.
+        """
+        tracker = copy.copy(self)
+        tracker.metrics = StageMetrics()
+        if tracker.motion_gate is not None:
+            tracker.motion_gate = tracker.motion_gate.clone()
+        for name, value in overrides.items():
+            if not hasattr(tracker, name):
+                raise AttributeError(f"Unknown tracker setting: {name}")
+            setattr(tracker, name, value)
+        if 'detect_interval' in overrides and 'motion_prediction' not in overrides:
+            tracker.detect_interval = max(1, int(tracker.detect_interval))
+            tracker.motion_prediction = tracker.detect_interval > 1
+        tracker.reset_tracking()
+        return tracker
+    
+    def now(self):
+        """Current time on the tracking clock"""
+        return self.clock() if self.clock is not None else time.time()
+    
+    def track_stats(self):
+        """Counters for live, stored and evicted tracks"""
+        return self.trackers.stats()
+    
+    def motion_stats(self):
+        """Skipped, cropped and full-frame detector counts of the motion gate"""
+        return self.motion_gate.stats() if self.motion_gate is not None else None
+    
     def load_yolo_model(self, model_path):
+        # Networks come from the process-wide registry, so constructing another
+        # tracker for an already loaded model does not re-read the weights
+        self.model = None
+        self.net_lock = threading.Lock()
+        cfg, weights = model_files(model_path, self.variant)
+        backend, target = backend_id(self.backend), target_id(self.target)
         try:
+            self.model = registry.get(cfg, weights, backend, target, self.input_size)
+            self.net = self.model.net
+            self.net_lock = self.model.lock
             if model_path and os.path.exists(model_path):
-                self.net = cv2.dnn.readNetFromDarknet(
-                    os.path.join(model_path, "yolov4.cfg"),
-                    os.path.join(model_path, "yolov4.weights")
-                )
-                logger.info(f"Loaded custom YOLO model from {model_path}")
+                logger.info(f"Using custom {self.variant} model from {model_path}")
             else:
-                self.net = cv2.dnn.readNetFromDarknet(
-                    "yolov4.cfg",
-                    "yolov4.weights"
-                )
-                logger.info("Loaded OpenCV YOLO model")
-            
-            self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
-            self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+                logger.info(f"Using OpenCV {self.variant} model")
+            logger.info(f"Inference at {self.input_size[0]}x{self.input_size[1]} on {self.backend}/{self.target}")
             
         except Exception as e:
             logger.error(f"Error loading YOLO model: {e}")
@@ -55,6 +231,15 @@ class ObjectTracker:
         else:
             self.use_face_detector = False
     
+    def set_input_size(self, input_size):
+        """Switch inference resolution.
+
+        Only the size of this tracker's blobs changes; the shared network is
+        reshaped to each blob under `net_lock`, so no weights are reloaded and
+        other trackers on the same network keep their own size.
+        """
+        self.input_size = tuple(input_size)
+    
     def load_class_names(self):
         try:
             with open("coco.names", "r") as f:
@@ -74,6 +259,8 @@ class ObjectTracker:
             ]
     
     def get_output_layers(self):
+        if self.model is not None:
+            return self.model.output_layers()
         layer_names = self.net.getLayerNames()
         try:
             return [layer_names[i - 1] for i in self.net.getUnconnectedOutLayers()]
@@ -87,39 +274,61 @@ class ObjectTracker:
         
         height, width = frame.shape[:2]
         
-        blob = cv2.dnn.blobFromImage(frame, 1/255.0, (416, 416), swapRB=True, crop=False)
-        self.net.setInput(blob)
+        start = time.perf_counter()
+        blob = cv2.dnn.blobFromImage(frame, 1/255.0, self.input_size, swapRB=True, crop=False)
+        self.metrics.observe('blob', time.perf_counter() - start)
+        with self.net_lock:
+            start = time.perf_counter()
+            self.net.setInput(blob)
+            
+            outputs = self.net.forward(self.get_output_layers())
+            self.metrics.observe('forward', time.perf_counter() - start)
         
-        outputs = self.net.forward(self.get_output_layers())
+        return self.build_detections(outputs, width, height)
+    
+    def detect_objects_batch(self, frames):
+        """Detect objects in several frames with a single batched forward pass"""
+        if not frames:
+            return []
         
-        boxes = []
-        confidences = []
-        class_ids = []
+        if self.use_face_detector:
+            return [self.detect_faces(frame) for frame in frames]
         
-        for output in outputs:
-            for detection in output:
-                scores = detection[5:]
-                class_id = np.argmax(scores)
-                confidence = scores[class_id]
-                
-                if confidence > self.confidence_threshold:
-                    center_x = int(detection[0] * width)
-                    center_y = int(detection[1] * height)
-                    w = int(detection[2] * width)
-                    h = int(detection[3] * height)
-                    
-                    x = int(center_x - w / 2)
-                    y = int(center_y - h / 2)
-                    
-                    boxes.append([x, y, w, h])
-                    confidences.append(float(confidence))
-                    class_ids.append(class_id)
+        start = time.perf_counter()
+        blob = cv2.dnn.blobFromImages(frames, 1/255.0, self.input_size, swapRB=True, crop=False)
+        self.metrics.observe('blob', time.perf_counter() - start)
+        with self.net_lock:
+            start = time.perf_counter()
+            self.net.setInput(blob)
+            
+            outputs = self.net.forward(self.get_output_layers())
+            self.metrics.observe('forward', time.perf_counter() - start)
         
+        results = []
+        for frame, frame_outputs in zip(frames, split_batch_outputs(outputs, len(frames))):
+            height, width = frame.shape[:2]
+            results.append(self.build_detections(frame_outputs, width, height))
+        
+        return results
+    
+    def build_detections(self, outputs, width, height):
+        """Decode one image's network outputs and apply NMS"""
+        start = time.perf_counter()
+        if self.model is not None and self.model.output_format == 'yolov5':
+            outputs = normalize_yolov5_outputs(outputs, self.input_size)
+        
+        boxes, confidences, class_ids = decode_yolo_outputs(
+            outputs, width, height, self.confidence_threshold
+        )
+        self.metrics.observe('decode', time.perf_counter() - start)
+        
+        start = time.perf_counter()
         indices = cv2.dnn.NMSBoxes(boxes, confidences, self.confidence_threshold, self.nms_threshold)
+        self.metrics.observe('nms', time.perf_counter() - start)
         
         detections = []
         if len(indices) > 0:
-            for i in indices.flatten():
+            for i in np.asarray(indices).flatten():
                 x, y, w, h = boxes[i]
                 detections.append({
                     'bbox': [x, y, w, h],
@@ -146,139 +355,268 @@ class ObjectTracker:
         
         return detections
     
-    def update_tracking(self, detections):
-        """Update object tracking using simple tracking algorithm"""
+    def update_tracking(self, detections, regions=None):
+        """Update object tracking by one-to-one association of detections with active tracks.
+
+        When `regions` is given the detector only looked at those crops; active
+        tracks outside all of them are kept as they are instead of going stale.
+        """
         current_tracks = {}
         
-        for detection in detections:
+        active_ids = self.trackers.active_ids()
+        detection_boxes = [detection['bbox'] for detection in detections]
+        if self.motion_prediction:
+            track_boxes = [self.motion_filter(track_id).predict() for track_id in active_ids]
+        else:
+            track_boxes = [self.trackers[track_id]['bbox'] for track_id in active_ids]
+        
+        matches, _, _ = self.associator.associate(detection_boxes, track_boxes)
+        matched_tracks = {d: active_ids[t] for d, t in matches}
+        
+        self.frames_since_detection = 0
+        
+        current_time = self.now()
+        for index, detection in enumerate(detections):
             bbox = detection['bbox']
             center_x = bbox[0] + bbox[2] // 2
             center_y = bbox[1] + bbox[3] // 2
             
-            min_distance = float('inf')
-            best_track_id = None
-            
-            for track_id, track_info in self.trackers.items():
-                if track_info['active']:
-                    track_center = track_info['center']
-                    distance = np.sqrt((center_x - track_center[0])**2 + (center_y - track_center[1])**2)
-                    
-                    if distance < min_distance and distance < 100:
-                        min_distance = distance
-                        best_track_id = track_id
+            best_track_id = matched_tracks.get(index)
             
             if best_track_id is not None:
                 self.trackers[best_track_id]['center'] = (center_x, center_y)
                 self.trackers[best_track_id]['bbox'] = bbox
                 self.trackers[best_track_id]['class_name'] = detection['class_name']
                 self.trackers[best_track_id]['confidence'] = detection['confidence']
-                self.trackers[best_track_id]['last_seen'] = time.time()
-                
-                if best_track_id not in self.track_history:
-                    self.track_history[best_track_id] = deque(maxlen=self.max_history)
-                self.track_history[best_track_id].append((center_x, center_y))
+                self.trackers[best_track_id]['last_seen'] = current_time
+                self.trackers[best_track_id]['tracking_confidence'] = 1.0
+                self.trackers[best_track_id]['state'] = 'detected'
+                self.trackers.touch(best_track_id, (center_x, center_y))
+                if self.motion_prediction:
+                    self.motion_filter(best_track_id).update(bbox)
                 
                 current_tracks[best_track_id] = self.trackers[best_track_id]
             else:
                 self.track_id += 1
-                self.trackers[self.track_id] = {
+                self.trackers.add(self.track_id, {
                     'center': (center_x, center_y),
                     'bbox': bbox,
                     'class_name': detection['class_name'],
                     'confidence': detection['confidence'],
-                    'last_seen': time.time(),
+                    'last_seen': current_time,
+                    'tracking_confidence': 1.0,
+                    'state': 'detected',
                     'active': True
-                }
-                
-                self.track_history[self.track_id] = deque(maxlen=self.max_history)
-                self.track_history[self.track_id].append((center_x, center_y))
+                }, (center_x, center_y))
                 
                 current_tracks[self.track_id] = self.trackers[self.track_id]
         
-        current_time = time.time()
-        for track_id in self.trackers:
-            if track_id not in current_tracks:
-                if current_time - self.trackers[track_id]['last_seen'] > 2.0:
-                    self.trackers[track_id]['active'] = False
+        if regions is not None:
+            for track_id in active_ids:
+                if track_id not in current_tracks and not boxes_overlap(self.trackers[track_id]['bbox'], regions):
+                    current_tracks[track_id] = self.hold_track(track_id, current_time)
+        
+        self.trackers.expire(current_time)
         
         return current_tracks
     
-    def draw_detections(self, frame, tracks):
-        """Draw bounding boxes, labels, and tracking IDs"""
-        for track_id, track_info in tracks.items():
-            if not track_info['active']:
-                continue
-            
-            bbox = track_info['bbox']
-            x, y, w, h = bbox
-            class_name = track_info['class_name']
-            confidence = track_info['confidence']
-            
-            class_id = 0
-            if class_name in self.class_names:
-                class_id = self.class_names.index(class_name)
-            color = self.colors[class_id]
-            
-            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
-            
-            label = f"{class_name} #{track_id} ({confidence:.2f})"
-            label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)[0]
-            
-            cv2.rectangle(frame, (x, y - label_size[1] - 10), (x + label_size[0], y), color, -1)
+    def hold_track(self, track_id, now):
+        """Keep a track that the detector did not look at this frame"""
+        track_info = self.trackers[track_id]
+        track_info['last_seen'] = now
+        track_info['state'] = 'held'
+        self.trackers.refresh(track_id)
+        return track_info
+    
+    def hold_tracks(self):
+        """Keep every active track in place on a frame where nothing moved"""
+        self.frames_since_detection += 1
+        
+        current_time = self.now()
+        current_tracks = {track_id: self.hold_track(track_id, current_time)
+                          for track_id in self.trackers.active_ids()}
+        
+        self.trackers.expire(current_time)
+        
+        return current_tracks
+    
+    def motion_filter(self, track_id):
+        """Kalman filter of a track, created from its last box on first use"""
+        track_info = self.trackers[track_id]
+        if 'kalman' not in track_info:
+            track_info['kalman'] = KalmanBoxFilter(track_info['bbox'])
+        return track_info['kalman']
+    
+    def predict_tracks(self):
+        """Propagate active tracks by motion prediction on frames without detection"""
+        self.frames_since_detection += 1
+        
+        current_tracks = {}
+        for track_id in self.trackers.active_ids():
+            track_info = self.trackers[track_id]
+            bbox = self.motion_filter(track_id).predict()
+            center = (bbox[0] + bbox[2] // 2, bbox[1] + bbox[3] // 2)
             
-            cv2.putText(frame, label, (x, y - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+            track_info['bbox'] = bbox
+            track_info['center'] = center
+            track_info['tracking_confidence'] = track_info.get('tracking_confidence', 1.0) * self.confidence_decay
+            track_info['state'] = 'predicted'
+            self.trackers.append_history(track_id, center)
             
-            if track_id in self.track_history and len(self.track_history[track_id]) > 1:
-                points = list(self.track_history[track_id])
-                for i in range(1, len(points)):
-                    cv2.line(frame, points[i-1], points[i], color, 2)
+            current_tracks[track_id] = track_info
+        
+        self.trackers.expire()
+        
+        return current_tracks
+    
+    def should_detect(self):
+        """Whether the next frame needs a detector pass rather than prediction only"""
+        if self.detect_interval <= 1 or self.frames_since_detection + 1 >= self.detect_interval:
+            return True
+        
+        for track_id in self.trackers.active_ids():
+            if self.trackers[track_id].get('tracking_confidence', 1.0) < self.min_track_confidence:
+                return True
+        return False
+    
+    def snapshot(self, tracks):
+        """Immutable copy of `tracks` and their trails for `draw_detections`.
         
+        Take it right after tracking the frame: the track dicts and trails are
+        updated in place by the frames that follow.
+        """
+        return snapshot_tracks(tracks, self.track_history)
+    
+    def draw_detections(self, frame, tracks):
+        """Draw bounding boxes, labels, and tracking IDs of a `snapshot`"""
+        if not self.draw_overlay:
+            return frame
+        start = time.perf_counter()
+        self.renderer.draw(frame, tracks)
+        self.metrics.observe('draw', time.perf_counter() - start)
         return frame
     
-    def process_video(self, source=0, output_path=None):
-        """Process video stream with object detection and tracking"""
-        if isinstance(source, str):
-            cap = cv2.VideoCapture(source)
+    def plan_detection(self, frame):
+        """Decide what the detector has to look at for this frame.
+        
+        Returns (crops, regions): crops is None when the detector is skipped,
+        regions is None for a full-frame pass and [] when the motion gate saw no
+        motion. Pass the detections of the crops to `finish_frame`.
+        """
+        if not self.should_detect():
+            return None, None
+        
+        regions = self.motion_gate.regions(frame) if self.motion_gate is not None else None
+        if regions is None:
+            return [frame], None
+        if not regions:
+            return None, []
+        return [frame[y:y + h, x:x + w] for x, y, w, h in regions], regions
+    
+    def finish_frame(self, crop_detections, regions):
+        """Update tracks from the detections of the crops chosen by `plan_detection`"""
+        start = time.perf_counter()
+        if crop_detections is None:
+            tracks = self.hold_tracks() if regions == [] else self.predict_tracks()
+        elif regions is None:
+            tracks = self.update_tracking(crop_detections[0])
         else:
-            cap = cv2.VideoCapture(source)
+            tracks = self.update_tracking(offset_region_detections(crop_detections, regions), regions)
+        self.metrics.observe('tracking', time.perf_counter() - start)
+        
+        if self.event_log is not None:
+            self.event_log.log_tracks(self.frame_index, time.time(), tracks, self.event_source)
+        self.frame_index += 1
+        return tracks
+    
+    def track_frame(self, frame):
+        """Run detection and tracking on a single frame, or only motion prediction
+        when the detect interval or the motion gate allows skipping the detector"""
+        crops, regions = self.plan_detection(frame)
+        crop_detections = self.detect_objects_batch(crops) if crops is not None else None
+        return self.finish_frame(crop_detections, regions)
+    
+    def read_frame(self, capture):
+        """capture.read() with its latency recorded"""
+        start = time.perf_counter()
+        ret, frame = capture.read()
+        self.metrics.observe('capture', time.perf_counter() - start)
+        return ret, frame
+    
+    def process_video(self, source=0, output_path=None, pipelined=False, queue_size=2,
+                      capture_options=None, encoder_options=None):
+        """Process video stream with object detection and tracking.
         
-        if not cap.isOpened():
+        `capture_options` go to video_io.open_reader (backend, buffer size, decoder
+        threads, hardware decode, frame step, downscale width) and
+        `encoder_options` to video_io.open_writer (codec, quality, hardware encode).
+        """
+        cap = open_reader(source, **(capture_options or {}))
+        if cap is None:
             logger.error("Error opening video source")
             return
         
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = cap.fps()
+        width, height = cap.frame_size()
+        if not is_live_source(source):
+            self.clock = cap.position
         
-        logger.info(f"Video source opened: {width}x{height} @ {fps}fps")
+        logger.info(f"Video source opened: {width}x{height} @ {fps:.1f}fps")
         
         writer = None
         if output_path:
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            writer = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+            writer = open_writer(output_path, fps, (width, height), **(encoder_options or {}))
         
         frame_count = 0
         start_time = time.time()
+        last_render = None
+        
+        def render(item):
+            nonlocal frame_count, last_render
+            frame, tracks = item
+            frame_count += 1
+            
+            now = time.perf_counter()
+            if last_render is not None:
+                self.metrics.observe('frame_interval', now - last_render)
+            last_render = now
+            
+            frame = self.draw_detections(frame, tracks)
+            
+            elapsed_time = time.time() - start_time
+            current_fps = frame_count / elapsed_time if elapsed_time > 0 else 0
+            
+            info_text = f"FPS: {current_fps:.1f} | Objects: {len(tracks)}"
+            cv2.putText(frame, info_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+            
+            return frame, tracks
+        
+        pipeline = None
+        if pipelined:
+            # Live sources drop stale frames; files must not lose any
+            pipeline = FramePipeline(
+                lambda: self.read_frame(cap),
+                lambda frame: (frame, self.snapshot(self.track_frame(frame))),
+                render,
+                queue_size=queue_size,
+                drop_oldest=is_live_source(source)
+            ).start()
         
         try:
             while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                frame_count += 1
-                
-                detections = self.detect_objects(frame)
-                
-                tracks = self.update_tracking(detections)
-                
-                frame = self.draw_detections(frame, tracks)
-                
-                elapsed_time = time.time() - start_time
-                current_fps = frame_count / elapsed_time if elapsed_time > 0 else 0
-                
-                info_text = f"FPS: {current_fps:.1f} | Objects: {len(tracks)}"
-                cv2.putText(frame, info_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+                if pipeline:
+                    result = pipeline.get(timeout=0.5)
+                    if result is None:
+                        if pipeline.finished:
+                            break
+                        continue
+                    frame, tracks = result
+                else:
+                    ret, frame = self.read_frame(cap)
+                    if not ret:
+                        break
+                    
+                    frame, tracks = render((frame, self.snapshot(self.track_frame(frame))))
                 
                 if writer:
                     writer.write(frame)
@@ -297,12 +635,73 @@ class ObjectTracker:
             logger.info("Processing interrupted by user")
         
         finally:
+            if pipeline:
+                pipeline.stop()
+                pipeline.log_stats()
             cap.release()
+            self.clock = None
             if writer:
                 writer.release()
             cv2.destroyAllWindows()
             
-            logger.info(f"Processing completed. Processed {frame_count} frames")
+            logger.info(f"Processing completed. Processed {frame_count} frames ({cap.stats()})")
+            self.metrics.log_summary()
+            if self.motion_gate is not None:
+                logger.info(f"Motion gate: {self.motion_stats()}")
+
+def run_batch_mode(args, capture_options=None, encoder_options=None):
+    """Headless processing of a directory of recorded videos"""
+    from batch_processing import run_batch
+    
+    print("🎯 Object Detection and Tracking - Batch Mode")
+    print("=" * 50)
+    print(f"Input: {args.batch}")
+    print(f"Workers: {args.workers or os.cpu_count()}")
+    print("=" * 50)
+    
+    summary = run_batch(
+        args.batch,
+        output_dir=args.batch_output,
+        workers=args.workers,
+        segment_frames=args.segment_frames,
+        overlap=args.segment_overlap,
+        tracker_settings={
+            'model_path': args.model,
+            'confidence_threshold': args.confidence,
+            'nms_threshold': args.nms,
+            'match_metric': args.match_metric,
+            'assignment': args.assignment,
+            'max_tracks': args.max_tracks,
+            'track_ttl': args.track_ttl,
+            'detect_interval': args.detect_interval,
+            'min_track_confidence': args.min_track_confidence,
+            'variant': args.variant,
+            'input_size': args.input_size,
+            'backend': args.backend,
+            'target': args.target,
+            'motion_gate': args.motion_gate,
+            'draw_overlay': not args.no_overlay
+        },
+        capture_options=capture_options,
+        encoder_options=encoder_options
+    )
+    if summary is None:
+        return
+    
+    for video in summary['videos']:
+        print(f"{os.path.basename(video['video'])}: {video['frames']} frames, {video['tracks']} tracks "
+              f"({video['stitched_tracks']} stitched across {video['segments']} segments)")
+        if video['annotated_video']:
+            print(f"   {video['annotated_video']}")
+        print(f"   {video['detections_file']}")
+    print(f"Tracking: {summary['tracking_fps']:.1f} fps total, "
+          f"{summary['fps_per_core']:.1f} fps per core ({summary['workers']} workers)")
+    print(f"Overall (including rendering): {summary['overall_fps']:.1f} fps")
+    
+    if summary['failed']:
+        for video in summary['failed']:
+            print(f"❌ {os.path.basename(video['video'])}: {'; '.join(video['errors'])}")
+        sys.exit(1)
 
 def main():
     """Main function to run object detection and tracking"""
@@ -311,15 +710,88 @@ def main():
                        help='Video source (0 for webcam, or path to video file)')
     parser.add_argument('--output', type=str, default=None,
                        help='Output video path (optional)')
+    parser.add_argument('--capture-backend', type=str, default='auto', choices=list(CAPTURE_BACKENDS),
+                       help='VideoCapture backend (gstreamer builds a decode pipeline, or pass a pipeline string as --source)')
+    parser.add_argument('--buffer-size', type=int, default=None,
+                       help='Capture buffer size in frames (1 keeps live streams current)')
+    parser.add_argument('--decode-threads', type=int, default=None,
+                       help='Decoder threads')
+    parser.add_argument('--hw-decode', type=str, default='none', choices=list(HW_ACCELERATION),
+                       help='Hardware video decoding')
+    parser.add_argument('--frame-step', type=int, default=1,
+                       help='Process every Nth frame; the frames in between are grabbed but not decoded')
+    parser.add_argument('--max-width', type=int, default=None,
+                       help='Downscale frames wider than this right after decoding')
+    parser.add_argument('--codec', type=str, default='mp4v',
+                       help='FOURCC of the output video codec (e.g. mp4v, avc1, MJPG)')
+    parser.add_argument('--encode-quality', type=int, default=None,
+                       help='Output encoder quality 0-100, where the codec supports it')
+    parser.add_argument('--hw-encode', type=str, default='none', choices=list(HW_ACCELERATION),
+                       help='Hardware video encoding')
     parser.add_argument('--model', type=str, default=None,
                        help='Path to YOLO model directory')
+    parser.add_argument('--variant', type=str, default='yolov4', choices=list(MODEL_VARIANTS),
+                       help='Network variant (Darknet YOLOv4, YOLOv4-tiny or a YOLOv5-style ONNX export)')
+    parser.add_argument('--input-size', type=str, default=None,
+                       help='Inference resolution, e.g. 320 or 512x288 (multiples of 32; default: variant native)')
+    parser.add_argument('--backend', type=str, default='opencv', choices=list(BACKENDS),
+                       help='OpenCV DNN backend')
+    parser.add_argument('--target', type=str, default='cpu', choices=list(TARGETS),
+                       help='OpenCV DNN target device')
     parser.add_argument('--confidence', type=float, default=0.5,
                        help='Confidence threshold for detection')
     parser.add_argument('--nms', type=float, default=0.4,
                        help='Non-maximum suppression threshold')
+    parser.add_argument('--match-metric', type=str, default='hybrid', choices=Associator.METRICS,
+                       help='Cost used to associate detections with tracks')
+    parser.add_argument('--assignment', type=str, default='hungarian', choices=Associator.METHODS,
+                       help='Detection-to-track assignment method')
+    parser.add_argument('--max-tracks', type=int, default=1000,
+                       help='Maximum number of stored tracks before LRU eviction')
+    parser.add_argument('--track-ttl', type=float, default=10.0,
+                       help='Seconds an unseen track is kept before eviction (video time for files)')
+    parser.add_argument('--detect-interval', type=int, default=1,
+                       help='Run the detector every N frames and predict tracks in between')
+    parser.add_argument('--min-track-confidence', type=float, default=0.3,
+                       help='Force a detector pass when a predicted track decays below this')
+    parser.add_argument('--motion-gate', type=str, default=None, choices=MotionGate.METHODS,
+                       help='Skip the detector on still frames and crop it to moving regions')
+    parser.add_argument('--motion-threshold', type=int, default=25,
+                       help='Pixel difference (diff) or variance (mog2) counted as motion')
+    parser.add_argument('--event-log', type=str, default=None,
+                       help='Directory of an append-only columnar log of every frame\'s tracks')
+    parser.add_argument('--no-overlay', action='store_true',
+                       help='Skip drawing boxes, labels and trails (batch mode then only writes detections)')
+    parser.add_argument('--pipeline', action='store_true',
+                       help='Run capture, inference and rendering as pipelined stages')
+    parser.add_argument('--queue-size', type=int, default=2,
+                       help='Maximum frames buffered between pipeline stages')
+    parser.add_argument('--batch', type=str, default=None,
+                       help='Headless batch mode: process every video in this directory on a process pool')
+    parser.add_argument('--batch-output', type=str, default=None,
+                       help='Output directory for batch mode (default: <batch dir>/processed)')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Worker processes for batch mode (default: CPU count)')
+    parser.add_argument('--segment-frames', type=int, default=1500,
+                       help='Frames per batch segment')
+    parser.add_argument('--segment-overlap', type=int, default=10,
+                       help='Frames shared by neighbouring segments for stitching track IDs')
     
     args = parser.parse_args()
     
+    capture_options = {
+        'backend': args.capture_backend,
+        'buffer_size': args.buffer_size,
+        'threads': args.decode_threads,
+        'hw_decode': args.hw_decode,
+        'max_width': args.max_width
+    }
+    encoder_options = {'codec': args.codec, 'quality': args.encode_quality, 'hw_encode': args.hw_encode}
+    
+    if args.batch:
+        run_batch_mode(args, capture_options, encoder_options)
+        return
+    
     try:
         source = int(args.source)
     except ValueError:
@@ -329,9 +801,15 @@ def main():
     print("=" * 50)
     print(f"Source: {source}")
     print(f"Output: {args.output}")
-    print(f"Model: {args.model}")
+    print(f"Model: {args.model} ({args.variant}, {args.backend}/{args.target})")
     print(f"Confidence: {args.confidence}")
     print(f"NMS: {args.nms}")
+    print(f"Matching: {args.match_metric} / {args.assignment}")
+    print(f"Detect interval: {args.detect_interval}")
+    print(f"Decode: {args.capture_backend}, hw {args.hw_decode}, every {args.frame_step} frame(s)"
+          + (f", max width {args.max_width}" if args.max_width else ''))
+    print(f"Motion gate: {args.motion_gate or 'off'}")
+    print(f"Pipelined: {args.pipeline}")
     print("\nControls:")
     print("- Press 'q' to quit")
     print("- Press 's' to save current frame")
@@ -340,10 +818,30 @@ def main():
     tracker = ObjectTracker(
         model_path=args.model,
         confidence_threshold=args.confidence,
-        nms_threshold=args.nms
+        nms_threshold=args.nms,
+        associator=Associator(metric=args.match_metric, method=args.assignment),
+        max_tracks=args.max_tracks,
+        track_ttl=args.track_ttl,
+        detect_interval=args.detect_interval,
+        min_track_confidence=args.min_track_confidence,
+        variant=args.variant,
+        input_size=args.input_size,
+        backend=args.backend,
+        target=args.target,
+        motion_gate=MotionGate(args.motion_gate, threshold=args.motion_threshold) if args.motion_gate else None,
+        event_log=EventLogWriter(args.event_log) if args.event_log else None,
+        draw_overlay=not args.no_overlay
     )
     
-    tracker.process_video(source=source, output_path=args.output)
+    try:
+        tracker.process_video(source=source, output_path=args.output,
+                              pipelined=args.pipeline, queue_size=args.queue_size,
+                              capture_options=dict(capture_options, frame_step=args.frame_step),
+                              encoder_options=encoder_options)
+    finally:
+        if tracker.event_log is not None:
+            tracker.event_log.close()
+            logger.info(f"Event log: {tracker.event_log.stats()}")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
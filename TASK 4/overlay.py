@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+from collections import defaultdict, namedtuple
+import cv2
+import numpy as np
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FONT_SCALE = 0.5
+FONT_THICKNESS = 2
+TEXT_COLOR = (255, 255, 255)
+
+class TrailBuffer:
+    """Fixed-size ring buffer of (x, y) trail points.
+
+    Every point is written twice, at i and i + size, so the most recent points
+    are always one contiguous int32 slice that cv2.polylines takes as is.
+    """
+    def __init__(self, size, points=()):
+        self.size = size
+        self.data = np.zeros((2 * size, 2), dtype=np.int32)
+        self.next = 0
+        self.count = 0
+        for point in points:
+            self.append(point)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return map(tuple, self.points().tolist())
+
+    def append(self, point):
+        self.data[self.next] = point
+        self.data[self.next + self.size] = point
+        self.next = (self.next + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def points(self):
+        """Oldest-to-newest view of the stored points (no copy)"""
+        end = self.next + self.size
+        return self.data[end - self.count:end]
+
+# Drawable state of one track at one frame; `bbox` is an (x, y, w, h) tuple and
+# `trail` a read-only int32 copy of its trail points (empty for fewer than two)
+TrackSnapshot = namedtuple('TrackSnapshot', 'track_id bbox class_name confidence active trail')
+
+NO_TRAIL = np.zeros((0, 2), dtype=np.int32)
+NO_TRAIL.flags.writeable = False
+
+def snapshot_tracks(tracks, history):
+    """Copy what the overlay needs out of live track dicts and trails.
+
+    Tracking keeps updating both after the frame is done; a snapshot taken with
+    the frame can be drawn later or on another thread and still matches it.
+    """
+    snapshot = []
+    for track_id, track_info in tracks.items():
+        trail = history.get(track_id)
+        if trail is not None and len(trail) > 1:
+            points = trail.points().copy()
+            points.flags.writeable = False
+        else:
+            points = NO_TRAIL
+        x, y, w, h = track_info['bbox']
+        snapshot.append(TrackSnapshot(track_id, (int(x), int(y), int(w), int(h)), track_info['class_name'],
+                                      float(track_info['confidence']), bool(track_info['active']), points))
+    return tuple(snapshot)
+
+class OverlayRenderer:
+    """Draws boxes, labels and trails with per-frame work limited to the drawing calls.
+
+    Class colors are looked up in a dict built once, label sizes come from
+    caches of the per-track prefix ("person #12") and the confidence suffix
+    ("(0.87)"), and the trails of all tracks sharing a color are drawn by one
+    cv2.polylines call.
+    """
+    def __init__(self, class_names, colors, max_cached_labels=4096):
+        self.class_colors = {name: tuple(float(c) for c in colors[i]) for i, name in enumerate(class_names)}
+        self.default_color = tuple(float(c) for c in colors[0])
+        self.max_cached_labels = max_cached_labels
+
+        # Text height only depends on the font
+        (_, self.label_height), _ = cv2.getTextSize('Ag', FONT, FONT_SCALE, FONT_THICKNESS)
+        self.prefixes = {}
+        self.suffixes = {}
+
+    def prefix(self, class_name, track_id):
+        key = (class_name, track_id)
+        cached = self.prefixes.get(key)
+        if cached is None:
+            if len(self.prefixes) >= self.max_cached_labels:
+                self.prefixes.clear()
+            text = f"{class_name} #{track_id} "
+            cached = self.prefixes[key] = (text, cv2.getTextSize(text, FONT, FONT_SCALE, FONT_THICKNESS)[0][0])
+        return cached
+
+    def suffix(self, confidence):
+        text = f"({confidence:.2f})"
+        cached = self.suffixes.get(text)
+        if cached is None:
+            cached = self.suffixes[text] = (text, cv2.getTextSize(text, FONT, FONT_SCALE, FONT_THICKNESS)[0][0])
+        return cached
+
+    def draw(self, frame, tracks):
+        """Draw the active tracks of a `snapshot_tracks` snapshot onto `frame` in place"""
+        trails = defaultdict(list)
+        for track in tracks:
+            if not track.active:
+                continue
+
+            x, y, w, h = track.bbox
+            color = self.class_colors.get(track.class_name, self.default_color)
+            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+
+            prefix, prefix_width = self.prefix(track.class_name, track.track_id)
+            suffix, suffix_width = self.suffix(track.confidence)
+            label_width = prefix_width + suffix_width - FONT_THICKNESS
+            cv2.rectangle(frame, (x, y - self.label_height - 10), (x + label_width, y), color, -1)
+            cv2.putText(frame, prefix + suffix, (x, y - 5), FONT, FONT_SCALE, TEXT_COLOR, FONT_THICKNESS)
+
+            if len(track.trail):
+                trails[color].append(track.trail)
+
+        for color, points in trails.items():
+            cv2.polylines(frame, points, False, color, 2)
+        return frame
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+from collections import deque
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class DropOldestQueue:
+    """Bounded queue between pipeline stages.
+
+    When full, `put` either discards the oldest queued item (live sources, so
+    latency never builds up) or blocks until the consumer catches up (files).
+    """
+    def __init__(self, maxsize=2, drop_oldest=True):
+        self.maxsize = max(1, maxsize)
+        self.drop_oldest = drop_oldest
+        self.items = deque()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self.condition:
+            while len(self.items) >= self.maxsize and not self.closed:
+                if self.drop_oldest:
+                    self.items.popleft()
+                    self.dropped += 1
+                    break
+                self.condition.wait(0.1)
+            if self.closed:
+                return False
+            self.items.append(item)
+            self.condition.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """Return the next item, or None on timeout or once closed and drained"""
+        with self.condition:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not self.items:
+                if self.closed:
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+            item = self.items.popleft()
+            self.condition.notify_all()
+            return item
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def __len__(self):
+        with self.condition:
+            return len(self.items)
+
+class StageStats:
+    """Timing counters for a single pipeline stage"""
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.last_time = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, elapsed):
+        with self.lock:
+            self.count += 1
+            self.total_time += elapsed
+            self.last_time = elapsed
+            self.max_time = max(self.max_time, elapsed)
+
+    def snapshot(self):
+        with self.lock:
+            avg = self.total_time / self.count if self.count else 0.0
+            return {
+                'count': self.count,
+                'avg_ms': avg * 1000,
+                'last_ms': self.last_time * 1000,
+                'max_ms': self.max_time * 1000,
+                'max_fps': 1.0 / avg if avg > 0 else 0.0
+            }
+
+class FramePipeline:
+    """Capture, inference and render stages running on their own threads.
+
+    Each stage is a callable:
+      read_fn()        -> (ok, item)   runs on the capture thread
+      infer_fn(item)   -> item         runs on the inference worker
+      render_fn(item)  -> item         runs on the render/encode worker
+    Rendered items are collected with `get`. Stages are connected by bounded
+    queues, so the slowest stage sets the pace while the others overlap with it.
+    """
+    STAGES = ('capture', 'inference', 'render')
+
+    def __init__(self, read_fn, infer_fn, render_fn, queue_size=2, drop_oldest=True):
+        self.read_fn = read_fn
+        self.infer_fn = infer_fn
+        self.render_fn = render_fn
+        self.captured = DropOldestQueue(queue_size, drop_oldest)
+        self.inferred = DropOldestQueue(queue_size, drop_oldest)
+        self.rendered = DropOldestQueue(queue_size, drop_oldest)
+        self.stage_stats = {name: StageStats(name) for name in self.STAGES}
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.error = None
+
+    def start(self):
+        self.threads = [
+            threading.Thread(target=self._capture_loop, name='pipeline-capture', daemon=True),
+            threading.Thread(target=self._stage_loop, name='pipeline-inference', daemon=True,
+                             args=('inference', self.infer_fn, self.captured, self.inferred)),
+            threading.Thread(target=self._stage_loop, name='pipeline-render', daemon=True,
+                             args=('render', self.render_fn, self.inferred, self.rendered)),
+        ]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        for queue in (self.captured, self.inferred, self.rendered):
+            queue.close()
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=2.0)
+
+    def get(self, timeout=None):
+        """Return the next rendered item, or None on timeout or end of stream"""
+        return self.rendered.get(timeout)
+
+    @property
+    def finished(self):
+        return self.rendered.closed and len(self.rendered) == 0
+
+    def _capture_loop(self):
+        stats = self.stage_stats['capture']
+        try:
+            while not self.stop_event.is_set():
+                start = time.perf_counter()
+                ret, item = self.read_fn()
+                if not ret:
+                    break
+                stats.record(time.perf_counter() - start)
+                self.captured.put(item)
+        except Exception as e:
+            self.error = e
+            logger.error(f"Error in capture stage: {e}")
+        finally:
+            self.captured.close()
+
+    def _stage_loop(self, name, fn, source, target):
+        stats = self.stage_stats[name]
+        try:
+            while not self.stop_event.is_set():
+                item = source.get(timeout=0.5)
+                if item is None:
+                    if source.closed:
+                        break
+                    continue
+                start = time.perf_counter()
+                result = fn(item)
+                stats.record(time.perf_counter() - start)
+                target.put(result)
+        except Exception as e:
+            self.error = e
+            logger.error(f"Error in {name} stage: {e}")
+            self.stop_event.set()
+            source.close()
+        finally:
+            target.close()
+
+    def stats(self):
+        """Per-stage timings plus queue depth and drop counts"""
+        result = {}
+        queues = {'capture': self.captured, 'inference': self.inferred, 'render': self.rendered}
+        for name in self.STAGES:
+            stage = self.stage_stats[name].snapshot()
+            stage['queued'] = len(queues[name])
+            stage['dropped'] = queues[name].dropped
+            result[name] = stage
+
+        bottleneck = max(self.STAGES, key=lambda name: result[name]['avg_ms'])
+        result['bottleneck'] = bottleneck if result[bottleneck]['count'] else None
+        return result
+
+    def log_stats(self):
+        stats = self.stats()
+        for name in self.STAGES:
+            stage = stats[name]
+            logger.info(f"Stage {name}: {stage['count']} items, avg {stage['avg_ms']:.1f}ms, "
+                        f"max {stage['max_ms']:.1f}ms, dropped {stage['dropped']}")
+        if stats['bottleneck']:
+            logger.info(f"Bottleneck stage: {stats['bottleneck']}")
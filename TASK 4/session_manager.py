@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+import cv2
+import logging
+
+from adaptive_controller import AdaptiveController
+from association import Associator
+from event_log import EventLogWriter
+from live_stats import RollingRate, StatsPublisher
+from metrics import StageMetrics
+from model_registry import parse_input_size
+from motion_gate import MotionGate
+from object_detection_tracking import ObjectTracker, is_live_source
+from pipeline import FramePipeline
+from streaming import FrameBroadcaster
+from video_io import CAPTURE_BACKENDS, HW_ACCELERATION, check_option, open_reader
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Sessions started with "event_log": true log their tracks to EVENT_LOG_DIR/<session id>
+EVENT_LOG_DIR = 'event_logs'
+
+def tile_frames(frames):
+    """Place frames side by side, scaled to the height of the first one"""
+    if len(frames) == 1:
+        return frames[0]
+
+    height = frames[0].shape[0]
+    resized = []
+    for frame in frames:
+        if frame.shape[0] != height:
+            width = int(frame.shape[1] * height / frame.shape[0])
+            frame = cv2.resize(frame, (width, height))
+        resized.append(frame)
+    return cv2.hconcat(resized)
+
+def tracker_settings(config):
+    """ObjectTracker keyword arguments from a /start_detection payload"""
+    return {
+        'confidence_threshold': float(config.get('confidence', 0.5)),
+        'nms_threshold': float(config.get('nms', 0.4)),
+        'associator': Associator(
+            metric=config.get('match_metric', 'hybrid'),
+            method=config.get('assignment', 'hungarian')
+        ),
+        'max_tracks': int(config.get('max_tracks', 1000)),
+        'track_ttl': float(config.get('track_ttl', 10.0)),
+        'detect_interval': int(config.get('detect_interval', 1)),
+        'min_track_confidence': float(config.get('min_track_confidence', 0.3)),
+        'motion_gate': MotionGate(config['motion_gate'], threshold=int(config.get('motion_threshold', 25)))
+                       if config.get('motion_gate') else None,
+        'draw_overlay': bool(config.get('overlay', True))
+    }
+
+def capture_settings(config):
+    """open_reader keyword arguments from a /start_detection payload"""
+    settings = {
+        'backend': config.get('capture_backend', 'auto'),
+        'buffer_size': config.get('buffer_size'),
+        'threads': config.get('decode_threads'),
+        'hw_decode': config.get('hw_decode', 'none'),
+        'frame_step': int(config.get('frame_step', 1)),
+        'max_width': int(config['max_width']) if config.get('max_width') else None
+    }
+    check_option('capture backend', settings['backend'], CAPTURE_BACKENDS)
+    check_option('hardware acceleration', settings['hw_decode'], HW_ACCELERATION)
+    return settings
+
+def model_settings(config):
+    """ObjectTracker network arguments from a /start_detection payload"""
+    variant = config.get('variant', 'yolov4')
+    return {
+        'model_path': config.get('model'),
+        'variant': variant,
+        'input_size': parse_input_size(config.get('input_size'), variant),
+        'backend': config.get('backend', 'opencv'),
+        'target': config.get('target', 'cpu')
+    }
+
+class DetectionSession:
+    """One named detection job: a group of sources processed together, with its
+    own tracker state, statistics and MJPEG stream.
+
+    Several sources in one session are read in lockstep, detected with a single
+    batched forward pass and shown side by side.
+    """
+    def __init__(self, session_id, sources, tracker, config=None):
+        self.id = session_id
+        self.sources = sources
+        self.config = config or {}
+        self.tracker = tracker
+        self.capture_options = capture_settings(self.config)
+        self.source_trackers = [tracker] + [tracker.clone() for _ in sources[1:]]
+        
+        self.event_log = None
+        if self.config.get('event_log'):
+            log_name = re.sub(r'[^\w.-]', '_', str(session_id)).lstrip('.') or 'session'
+            self.event_log = EventLogWriter(os.path.join(EVENT_LOG_DIR, log_name))
+        
+        # One set of stage latency histograms for all of the session's sources
+        self.metrics = StageMetrics()
+        for index, source_tracker in enumerate(self.source_trackers):
+            source_tracker.event_log = self.event_log
+            source_tracker.event_source = index
+            source_tracker.metrics = self.metrics
+        self.captures = []
+        self.broadcaster = FrameBroadcaster(jpeg_quality=int(self.config.get('jpeg_quality', 80)),
+                                            metrics=self.metrics)
+        self.last_render = None
+        self.max_fps = self.config.get('max_fps')
+        self.pipelined = bool(self.config.get('pipeline', False))
+        self.queue_size = int(self.config.get('queue_size', 2))
+        self.drop_oldest = all(is_live_source(source) for source in sources)
+
+        # Paces the loop and, given "target_fps" or "latency_budget_ms", adapts the
+        # detect interval, input size and frame skipping to stay within budget
+        latency_budget = self.config.get('latency_budget_ms')
+        self.controller = AdaptiveController(
+            self.source_trackers, self.metrics,
+            target_fps=self.config.get('target_fps'),
+            latency_budget=float(latency_budget) / 1000.0 if latency_budget else None,
+            max_detect_interval=int(self.config.get('max_detect_interval', 4)),
+            min_input_width=int(self.config.get('min_input_size', 256)),
+            max_frame_step=int(self.config.get('max_frame_step', 4))
+        )
+
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.started_at = None
+
+        # Counters below belong to the processing thread; everyone else reads the
+        # immutable snapshots it publishes (`stats`, `/stats_stream`)
+        self.frame_count = 0
+        self.frame_rate = RollingRate(window=2.0)
+        self.last_track_ids = [0] * len(sources)
+        self.unique_tracks = Counter()
+        self.last_tracks = []
+        self.pipeline_stats = None
+        self.publisher = StatsPublisher({
+            'total_objects': 0,
+            'current_objects': 0,
+            'fps': 0,
+            'frame_count': 0,
+            'sources': len(sources)
+        }, min_interval=float(self.config.get('stats_interval', 0.25)))
+
+    @property
+    def stats(self):
+        """Latest published statistics snapshot (do not modify)"""
+        return self.publisher.snapshot()
+
+    def open(self):
+        for source, source_tracker in zip(self.sources, self.source_trackers):
+            capture = open_reader(source, **self.capture_options)
+            if capture is None:
+                self.release()
+                return False
+            self.captures.append(capture)
+            if not is_live_source(source):
+                source_tracker.clock = capture.position
+        self.controller.attach_readers(self.captures)
+        # Without a target, files play back at their own frame rate
+        if self.controller.pace_fps is None and not self.drop_oldest:
+            self.controller.pace_fps = self.captures[0].fps()
+        return True
+
+    def release(self):
+        for capture in self.captures:
+            capture.release()
+        self.captures = []
+
+    def start(self):
+        self.started_at = time.time()
+        self.thread = threading.Thread(target=self.run, name=f"session-{self.id}", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=5.0):
+        """Stop processing and end the session's streams.
+
+        Captures and the event log belong to the processing thread while it
+        runs; if it does not exit within `timeout` it closes them itself when it
+        finishes, so they are never released under a running read.
+        """
+        self.stop_event.set()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+        self.broadcaster.close()
+        self.publisher.close()
+        if self.running:
+            logger.warning(f"Session {self.id} did not stop within {timeout}s; it will release its sources on exit")
+        else:
+            self.close_sources()
+
+    def close_sources(self):
+        self.release()
+        if self.event_log is not None:
+            self.event_log.close()
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def describe(self):
+        return {
+            'id': self.id,
+            'sources': self.sources,
+            'running': self.running,
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat() if self.started_at else None,
+            'stream': f"/video_feed/{self.id}",
+            'stream_stats': self.broadcaster.stats(),
+            'stats': self.stats
+        }
+
+    def read_frames(self):
+        frames = []
+        for source_tracker, capture in zip(self.source_trackers, self.captures):
+            ret, frame = source_tracker.read_frame(capture)
+            if not ret:
+                return False, None
+            frames.append(frame)
+        return True, frames
+
+    def infer(self, frames):
+        # Full frames and motion crops of every source go through one batched forward pass
+        plans = [source_tracker.plan_detection(frame)
+                 for source_tracker, frame in zip(self.source_trackers, frames)]
+        batch_detections = iter(self.tracker.detect_objects_batch(
+            [crop for crops, _ in plans if crops is not None for crop in crops]
+        ))
+        
+        # Snapshots, not the live track dicts: in pipeline mode the next frame is
+        # tracked while this one is drawn and its statistics are built
+        source_tracks = []
+        for source_tracker, (crops, regions) in zip(self.source_trackers, plans):
+            crop_detections = [next(batch_detections) for _ in crops] if crops is not None else None
+            source_tracks.append(source_tracker.snapshot(source_tracker.finish_frame(crop_detections, regions)))
+        return frames, source_tracks
+
+    def render(self, item):
+        frames, source_tracks = item
+        self.frame_count += 1
+        self.frame_rate.tick()
+
+        now = time.perf_counter()
+        if self.last_render is not None:
+            self.metrics.observe('frame_interval', now - self.last_render)
+        self.last_render = now
+
+        all_tracks = []
+        for i, tracks in enumerate(source_tracks):
+            frames[i] = self.source_trackers[i].draw_detections(frames[i], tracks)
+            all_tracks.extend(tracks)
+            self.count_new_tracks(i, tracks)
+        self.last_tracks = all_tracks
+
+        frame = tile_frames(frames)
+
+        current_fps = self.frame_rate.rate()
+        if self.publisher.due():
+            self.publish_stats()
+
+        info_text = f"FPS: {current_fps:.1f} | Objects: {len(all_tracks)}"
+        cv2.putText(frame, info_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        cv2.putText(frame, timestamp, (10, frame.shape[0] - 10),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+
+        # In pipeline mode JPEG encoding happens here, on the render worker
+        encoded = None
+        if self.pipelined and self.broadcaster.viewers:
+            encoded = self.broadcaster.encode(frame)
+
+        return frame, encoded
+
+    def count_new_tracks(self, index, tracks):
+        """Add tracks created since the previous frame to the per-class unique totals"""
+        last = self.last_track_ids[index]
+        for track in tracks:
+            if track.track_id > last:
+                self.unique_tracks[track.class_name] += 1
+        self.last_track_ids[index] = max([last] + [track.track_id for track in tracks])
+
+    def publish_stats(self):
+        """Build a new statistics snapshot and publish it"""
+        now = time.time()
+        elapsed = now - self.started_at if self.started_at else 0
+        active = [t for t in self.last_tracks if t.active]
+        snapshot = {
+            'timestamp': now,
+            'total_objects': len(self.last_tracks),
+            'current_objects': len(active),
+            'fps': self.frame_rate.rate(),
+            'average_fps': self.frame_count / elapsed if elapsed > 0 else 0,
+            'frame_count': self.frame_count,
+            'sources': len(self.sources),
+            'class_counts': dict(Counter(t.class_name for t in active)),
+            'unique_tracks': sum(self.unique_tracks.values()),
+            'unique_tracks_per_class': dict(self.unique_tracks)
+        }
+        for key in ('active_tracks', 'stored_tracks', 'evicted_tracks'):
+            snapshot[key] = sum(t.track_stats()[key] for t in self.source_trackers)
+        if self.tracker.motion_gate is not None:
+            snapshot['motion'] = self.motion_stats()
+        if self.event_log is not None:
+            snapshot['event_log'] = self.event_log.stats()
+        snapshot['video'] = [capture.stats() for capture in self.captures]
+        snapshot['adaptive'] = self.controller.stats()
+        if self.pipeline_stats is not None:
+            snapshot['pipeline'] = self.pipeline_stats
+        self.publisher.publish(snapshot)
+
+    def motion_stats(self):
+        """Motion gate counters summed over the session's sources"""
+        per_source = [t.motion_stats() for t in self.source_trackers]
+        stats = {key: sum(s[key] for s in per_source)
+                 for key in ('gated_frames', 'skipped_frames', 'roi_frames', 'full_frames')}
+        stats['method'] = per_source[0]['method']
+        stats['skip_ratio'] = stats['skipped_frames'] / stats['gated_frames'] if stats['gated_frames'] else 0.0
+        return stats
+
+    def publish(self, result):
+        frame, encoded = result
+        self.broadcaster.publish(frame, encoded)
+
+    def run(self):
+        try:
+            if self.pipelined:
+                self._run_pipelined()
+            else:
+                self._run_sequential()
+        except Exception as e:
+            logger.error(f"Session {self.id} failed: {e}")
+        finally:
+            self.publish_stats()
+            if self.stop_event.is_set():
+                self.close_sources()
+            logger.info(f"Session {self.id} finished after {self.frame_count} frames")
+
+    def _run_sequential(self):
+        while not self.stop_event.is_set():
+            start = time.perf_counter()
+            ret, frames = self.read_frames()
+            if not ret:
+                break
+
+            self.publish(self.render(self.infer(frames)))
+
+            delay = self.controller.frame_done(time.perf_counter() - start)
+            if delay > 0:
+                self.stop_event.wait(delay)
+
+    def _run_pipelined(self):
+        pipeline = FramePipeline(self.read_frames, self.infer, self.render,
+                                 queue_size=self.queue_size, drop_oldest=self.drop_oldest).start()
+        # The slowest stage paces the pipeline, so the controller only adapts here
+        self.controller.pace_fps = None
+        last_output = time.perf_counter()
+        try:
+            while not self.stop_event.is_set():
+                result = pipeline.get(timeout=0.5)
+                if result is None:
+                    if pipeline.finished:
+                        break
+                    continue
+                self.publish(result)
+                self.pipeline_stats = pipeline.stats()
+                now = time.perf_counter()
+                self.controller.frame_done(now - last_output)
+                last_output = now
+        finally:
+            pipeline.stop()
+            pipeline.log_stats()
+
+class SessionManager:
+    """Runs many named detection sessions in one process.
+
+    Networks come from the model registry, so each is loaded once per process;
+    sessions get trackers cloned from one base tracker per model configuration
+    and only own their track state.
+    """
+    def __init__(self):
+        self.sessions = {}
+        self.base_trackers = {}
+        self.lock = threading.Lock()
+        # Serializes start/stop of one session ID without blocking other sessions;
+        # {session id: [lock, users]}, dropped when the last user releases it
+        self.session_locks = {}
+
+    def base_tracker(self, model_path=None, **model_options):
+        """The tracker holding the loaded network for a model configuration, loaded on first use"""
+        key = (model_path,) + tuple(sorted(model_options.items()))
+        with self.lock:
+            if key not in self.base_trackers:
+                self.base_trackers[key] = ObjectTracker(model_path=model_path, **model_options)
+            return self.base_trackers[key]
+
+    @contextmanager
+    def session_lock(self, session_id):
+        with self.lock:
+            entry = self.session_locks.setdefault(session_id, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self.lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self.session_locks[session_id]
+
+    def start(self, session_id, config):
+        """Start (or restart) a session; raises RuntimeError if a source fails to open.
+
+        Concurrent starts of the same ID run one after the other, so the last one
+        wins and no session is left running outside `sessions`.
+        """
+        with self.session_lock(session_id):
+            self._stop(session_id)
+
+            source = config.get('source', 0)
+            sources = source if isinstance(source, list) else [source]
+            if not sources:
+                raise RuntimeError('No video source given')
+
+            tracker = self.base_tracker(**model_settings(config)).clone(**tracker_settings(config))
+            session = DetectionSession(session_id, sources, tracker, config)
+            if not session.open():
+                session.stop()
+                raise RuntimeError('Failed to initialize camera')
+
+            session.start()
+            with self.lock:
+                self.sessions[session_id] = session
+        logger.info(f"Session {session_id} started with sources {sources}")
+        return session
+
+    def stop(self, session_id):
+        """Stop and remove a session; returns False if it did not exist"""
+        with self.session_lock(session_id):
+            return self._stop(session_id)
+
+    def _stop(self, session_id):
+        with self.lock:
+            session = self.sessions.pop(session_id, None)
+        if session is None:
+            return False
+        session.stop()
+        logger.info(f"Session {session_id} stopped")
+        return True
+
+    def stop_all(self):
+        for session_id in list(self.sessions):
+            self.stop(session_id)
+
+    def get(self, session_id):
+        with self.lock:
+            return self.sessions.get(session_id)
+
+    def all(self):
+        with self.lock:
+            return list(self.sessions.values())
+
+    def describe(self):
+        return {session.id: session.describe() for session in self.all()}
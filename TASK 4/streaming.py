@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+import cv2
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def encode_jpeg(frame, quality=80):
+    """Encode a frame to JPEG bytes, or None if encoding fails"""
+    (flag, encoded_image) = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)])
+    return encoded_image.tobytes() if flag else None
+
+def multipart_chunk(jpeg, timestamp=None):
+    """One part of a multipart/x-mixed-replace MJPEG stream.
+
+    `timestamp` is the publish time of the frame and lets clients measure latency.
+    """
+    header = b'--frame\r\nContent-Type: image/jpeg\r\n'
+    header += f'Content-Length: {len(jpeg)}\r\n'.encode()
+    if timestamp is not None:
+        header += f'X-Timestamp: {timestamp:.6f}\r\n'.encode()
+    return header + b'\r\n' + jpeg + b'\r\n'
+
+class FrameBroadcaster:
+    """Latest-frame buffer shared by every stream viewer.
+
+    Each published frame gets a new version number and is JPEG-encoded at most
+    once, by the publisher if anyone is watching or lazily by the first viewer
+    that asks for it. Viewers block on a condition variable until the version
+    changes, so idle streams cost no CPU and encoding does not scale with viewers.
+    """
+    def __init__(self, jpeg_quality=80, metrics=None):
+        self.jpeg_quality = jpeg_quality
+        self.metrics = metrics
+        self.condition = threading.Condition()
+        self.encode_lock = threading.Lock()
+        self.version = 0
+        self.frame = None
+        self.jpeg = None
+        self.timestamp = None
+        self.viewers = 0
+        self.encoded_frames = 0
+        self.listeners = []
+        self.closed = False
+
+    def publish(self, frame, jpeg=None):
+        """Make `frame` the current frame; pass `jpeg` if it is already encoded"""
+        if jpeg is None and self.viewers > 0:
+            jpeg = self.encode(frame)
+        with self.condition:
+            self.frame = frame
+            self.jpeg = jpeg
+            self.timestamp = time.time()
+            self.version += 1
+            self.condition.notify_all()
+            version = self.version
+            listeners = list(self.listeners)
+        for listener in listeners:
+            listener(version)
+
+    def add_listener(self, callback):
+        """Call `callback(version)` from the publishing thread on every new frame"""
+        with self.condition:
+            self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self.condition:
+            if callback in self.listeners:
+                self.listeners.remove(callback)
+
+    def encode(self, frame):
+        start = time.perf_counter()
+        jpeg = encode_jpeg(frame, self.jpeg_quality)
+        if self.metrics is not None:
+            self.metrics.observe('encode', time.perf_counter() - start)
+        if jpeg is not None:
+            self.encoded_frames += 1
+        return jpeg
+
+    def clear(self):
+        with self.condition:
+            self.frame = None
+            self.jpeg = None
+            self.version += 1
+            self.condition.notify_all()
+
+    def close(self):
+        """End all streams; called when the session stops"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+            listeners = list(self.listeners)
+        for listener in listeners:
+            listener(self.version)
+
+    def latest_frame(self):
+        with self.condition:
+            return self.frame
+
+    def peek(self):
+        """Return (version, jpeg, timestamp) without encoding; jpeg may be None"""
+        with self.condition:
+            return self.version, self.jpeg, self.timestamp
+
+    def latest(self):
+        """Return (version, jpeg) of the current frame without waiting"""
+        with self.condition:
+            version, frame, jpeg = self.version, self.frame, self.jpeg
+        if frame is None:
+            return version, None
+        if jpeg is None:
+            jpeg = self._encode_version(version, frame)
+        return version, jpeg
+
+    def wait_for_frame(self, last_version, timeout=1.0):
+        """Block until a frame newer than `last_version` exists or the broadcaster closes.
+
+        Returns (version, jpeg); jpeg is None if the wait timed out.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != last_version or self.closed, timeout)
+            if self.version == last_version or self.frame is None:
+                return last_version, None
+        return self.latest()
+
+    def _encode_version(self, version, frame):
+        with self.encode_lock:
+            with self.condition:
+                if self.version == version and self.jpeg is not None:
+                    return self.jpeg
+            jpeg = self.encode(frame)
+            with self.condition:
+                if self.version == version:
+                    self.jpeg = jpeg
+            return jpeg
+
+    def add_viewer(self):
+        with self.condition:
+            self.viewers += 1
+
+    def remove_viewer(self):
+        with self.condition:
+            self.viewers -= 1
+
+    def stream(self, max_fps=None, timeout=1.0):
+        """Generate multipart MJPEG chunks, at most `max_fps` per second"""
+        min_interval = 1.0 / max_fps if max_fps else 0.0
+        last_version = 0
+        last_sent = 0.0
+        self.add_viewer()
+        try:
+            while not self.closed:
+                version, jpeg = self.wait_for_frame(last_version, timeout)
+                if jpeg is None:
+                    continue
+
+                if min_interval:
+                    delay = last_sent + min_interval - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                        version, jpeg = self.latest()
+                        if jpeg is None:
+                            continue
+                    last_sent = time.monotonic()
+
+                last_version = version
+                yield multipart_chunk(jpeg, self.timestamp)
+        finally:
+            self.remove_viewer()
+
+    def stats(self):
+        with self.condition:
+            return {
+                'frame_version': self.version,
+                'viewers': self.viewers,
+                'encoded_frames': self.encoded_frames,
+                'jpeg_quality': self.jpeg_quality
+            }
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+import time
+from collections import OrderedDict
+import logging
+
+from overlay import TrailBuffer
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class TrackStore:
+    """Bounded storage for track state and trail history.
+
+    Active and inactive tracks live in two OrderedDicts kept in least-recently-seen
+    order. Expiry only looks at the stale end of each, so per-frame upkeep is
+    proportional to the tracks that change state, not to every track ever created.
+
+    - a track not seen for `inactive_after` seconds is marked inactive
+    - an inactive track is evicted `ttl` seconds after it was last seen
+    - beyond `max_tracks` stored tracks, the least recently seen are evicted,
+      inactive ones first
+
+    Times come from `clock`: wall-clock seconds by default, video time for files.
+    """
+    def __init__(self, max_tracks=1000, ttl=10.0, inactive_after=2.0, max_history=30, clock=time.time):
+        self.max_tracks = max_tracks
+        self.ttl = ttl
+        self.inactive_after = inactive_after
+        self.max_history = max_history
+        self.clock = clock
+
+        self.active = OrderedDict()
+        self.inactive = OrderedDict()
+        self.history = {}
+
+        self.created = 0
+        self.evicted_ttl = 0
+        self.evicted_lru = 0
+
+    def __len__(self):
+        return len(self.active) + len(self.inactive)
+
+    def __contains__(self, track_id):
+        return track_id in self.active or track_id in self.inactive
+
+    def __getitem__(self, track_id):
+        if track_id in self.active:
+            return self.active[track_id]
+        return self.inactive[track_id]
+
+    def get(self, track_id, default=None):
+        return self[track_id] if track_id in self else default
+
+    def items(self):
+        yield from self.inactive.items()
+        yield from self.active.items()
+
+    def active_ids(self):
+        return list(self.active)
+
+    def add(self, track_id, track_info, center):
+        """Insert a new active track with the first point of its trail"""
+        self.active[track_id] = track_info
+        self.history[track_id] = TrailBuffer(self.max_history, [center])
+        self.created += 1
+        self._enforce_capacity()
+
+    def touch(self, track_id, center):
+        """Record that an active track was matched this frame"""
+        self.active.move_to_end(track_id)
+        if track_id not in self.history:
+            self.history[track_id] = TrailBuffer(self.max_history)
+        self.history[track_id].append(center)
+
+    def refresh(self, track_id):
+        """Mark an active track as recently seen without extending its trail"""
+        self.active.move_to_end(track_id)
+
+    def append_history(self, track_id, center):
+        """Extend a trail without changing the track's recency (predicted positions)"""
+        if track_id in self.history:
+            self.history[track_id].append(center)
+
+    def expire(self, now=None):
+        """Deactivate tracks that stopped being seen and evict those past their TTL"""
+        now = self.clock() if now is None else now
+
+        while self.active:
+            track_id, track_info = next(iter(self.active.items()))
+            if now - track_info['last_seen'] <= self.inactive_after:
+                break
+            del self.active[track_id]
+            track_info['active'] = False
+            self.inactive[track_id] = track_info
+
+        while self.inactive:
+            track_id, track_info = next(iter(self.inactive.items()))
+            if now - track_info['last_seen'] <= self.ttl:
+                break
+            self._evict(track_id)
+            self.evicted_ttl += 1
+
+    def _enforce_capacity(self):
+        while len(self) > self.max_tracks:
+            oldest = next(iter(self.inactive or self.active))
+            self._evict(oldest)
+            self.evicted_lru += 1
+
+    def _evict(self, track_id):
+        if track_id in self.active:
+            self.active.pop(track_id)['active'] = False
+        else:
+            self.inactive.pop(track_id)
+        self.history.pop(track_id, None)
+
+    def stats(self):
+        return {
+            'active_tracks': len(self.active),
+            'stored_tracks': len(self),
+            'created_tracks': self.created,
+            'evicted_tracks': self.evicted_ttl + self.evicted_lru,
+            'evicted_ttl': self.evicted_ttl,
+            'evicted_lru': self.evicted_lru
+        }
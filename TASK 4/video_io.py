@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import time
+import cv2
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# VideoCapture API preferences
+CAPTURE_BACKENDS = {
+    'auto': cv2.CAP_ANY,
+    'ffmpeg': cv2.CAP_FFMPEG,
+    'gstreamer': cv2.CAP_GSTREAMER,
+    'v4l2': cv2.CAP_V4L2
+}
+
+# Hardware decode/encode through OpenCV's FFmpeg backend
+HW_ACCELERATION = {
+    'none': cv2.VIDEO_ACCELERATION_NONE,
+    'any': cv2.VIDEO_ACCELERATION_ANY,
+    'vaapi': cv2.VIDEO_ACCELERATION_VAAPI,
+    'd3d11': cv2.VIDEO_ACCELERATION_D3D11,
+    'mfx': cv2.VIDEO_ACCELERATION_MFX
+}
+
+def parse_source(source):
+    """Camera indices given as strings become ints"""
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+def scaled_size(width, height, max_width=None):
+    """Frame size after downscaling to at most `max_width` pixels wide"""
+    if not max_width or width <= max_width:
+        return width, height
+    return max_width, max(1, int(round(height * max_width / width)))
+
+def gstreamer_pipeline(source, max_width=None, buffer_size=1):
+    """GStreamer pipeline string for a camera index, file or stream URL.
+
+    decodebin picks a hardware decoder when the matching plugins are installed,
+    and the optional downscale happens inside the pipeline, before frames are
+    converted to BGR and copied into Python. Strings that already contain '!'
+    are returned unchanged.
+    """
+    if isinstance(source, str) and '!' in source:
+        return source
+    if isinstance(source, int):
+        head = f"v4l2src device=/dev/video{source} ! decodebin"
+    else:
+        uri = source if '://' in source else 'file://' + os.path.abspath(source)
+        head = f"uridecodebin uri={uri}"
+    scale = f" ! videoscale ! video/x-raw,width={max_width},pixel-aspect-ratio=1/1" if max_width else ''
+    return (f"{head} ! videoconvert{scale} ! video/x-raw,format=BGR"
+            f" ! appsink drop=true max-buffers={buffer_size or 1} sync=false")
+
+def check_option(kind, value, choices):
+    if value not in choices:
+        raise ValueError(f"Unknown {kind}: {value} (choose from {', '.join(choices)})")
+
+def open_video(source=0, backend='auto', buffer_size=None, threads=None, hw_decode='none', max_width=None):
+    """Open a camera index, file path or stream URL; returns None on failure.
+
+    Open parameters the backend rejects (hardware decode, decoder threads) are
+    dropped with a warning rather than failing the source.
+    """
+    check_option('capture backend', backend, CAPTURE_BACKENDS)
+    check_option('hardware acceleration', hw_decode, HW_ACCELERATION)
+
+    source = parse_source(source)
+    if backend == 'gstreamer':
+        source = gstreamer_pipeline(source, max_width, buffer_size)
+
+    params = []
+    if hw_decode != 'none':
+        params += [cv2.CAP_PROP_HW_ACCELERATION, HW_ACCELERATION[hw_decode]]
+    if threads:
+        params += [cv2.CAP_PROP_N_THREADS, int(threads)]
+
+    try:
+        capture = cv2.VideoCapture(source, CAPTURE_BACKENDS[backend], params)
+        if not capture.isOpened() and params:
+            logger.warning(f"Could not open {source} with {backend} decode options {params}, retrying without")
+            capture = cv2.VideoCapture(source, CAPTURE_BACKENDS[backend])
+        if not capture.isOpened():
+            logger.error(f"Failed to open video source: {source}")
+            return None
+    except Exception as e:
+        logger.error(f"Error opening video source {source}: {e}")
+        return None
+
+    if buffer_size:
+        capture.set(cv2.CAP_PROP_BUFFERSIZE, int(buffer_size))
+    logger.info(f"Video source opened: {source} ({capture.getBackendName()})")
+    return capture
+
+def open_writer(path, fps, size, codec='mp4v', quality=None, hw_encode='none'):
+    """cv2.VideoWriter with a FOURCC codec, optional quality (0-100, codec dependent)
+    and hardware encoding; falls back to plain mp4v when the encoder is unavailable"""
+    check_option('hardware acceleration', hw_encode, HW_ACCELERATION)
+
+    params = []
+    if quality is not None:
+        params += [cv2.VIDEOWRITER_PROP_QUALITY, int(quality)]
+    if hw_encode != 'none':
+        params += [cv2.VIDEOWRITER_PROP_HW_ACCELERATION, HW_ACCELERATION[hw_encode]]
+
+    fourcc = cv2.VideoWriter_fourcc(*codec)
+    writer = cv2.VideoWriter(path, cv2.CAP_FFMPEG, fourcc, fps, size, params)
+    if not writer.isOpened() and (codec != 'mp4v' or params):
+        logger.warning(f"Encoder {codec} with options {params} unavailable, falling back to mp4v")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    return writer
+
+class VideoReader:
+    """Frame reader over a VideoCapture that only decodes what is used.
+
+    With `frame_step` N only every Nth frame is decoded; the others are grabbed
+    (demuxed) and dropped. `read(decode=False)` advances without decoding, for
+    frames whose pixels nobody will look at. Decoded frames wider than
+    `max_width` are downscaled before they leave the reader.
+    """
+    def __init__(self, capture, frame_step=1, max_width=None):
+        self.capture = capture
+        self.frame_step = max(1, int(frame_step))
+        self.max_width = max_width
+        self.decoded_frames = 0
+        self.grabbed_frames = 0
+
+    def read(self, decode=True):
+        for _ in range(self.frame_step):
+            if not self.capture.grab():
+                return False, None
+            self.grabbed_frames += 1
+        if not decode:
+            return True, None
+
+        ret, frame = self.capture.retrieve()
+        if not ret:
+            return False, None
+        self.decoded_frames += 1
+        if self.max_width and frame.shape[1] > self.max_width:
+            frame = cv2.resize(frame, scaled_size(frame.shape[1], frame.shape[0], self.max_width),
+                               interpolation=cv2.INTER_AREA)
+        return True, frame
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def get(self, prop):
+        return self.capture.get(prop)
+
+    def set(self, prop, value):
+        return self.capture.set(prop, value)
+
+    def position(self):
+        """Seconds of video grabbed so far (source frame index / source frame rate).
+
+        Used as the tracking clock for files, whose frames are not read in real time.
+        """
+        return self.grabbed_frames / (self.capture.get(cv2.CAP_PROP_FPS) or 25.0)
+
+    def fps(self):
+        """Frame rate of the frames returned by `read`"""
+        return (self.capture.get(cv2.CAP_PROP_FPS) or 25.0) / self.frame_step
+
+    def frame_size(self):
+        """(width, height) of the frames returned by `read`"""
+        return scaled_size(int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                           int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)), self.max_width)
+
+    def release(self):
+        self.capture.release()
+
+    def stats(self):
+        return {
+            'frame_step': self.frame_step,
+            'max_width': self.max_width,
+            'grabbed_frames': self.grabbed_frames,
+            'decoded_frames': self.decoded_frames
+        }
+
+def open_reader(source=0, frame_step=1, max_width=None, **capture_options):
+    """VideoReader over `open_video(source, **capture_options)`, or None on failure"""
+    capture = open_video(source, max_width=max_width, **capture_options)
+    if capture is None:
+        return None
+    return VideoReader(capture, frame_step, max_width)
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure decode throughput of a video with different reader options')
+    parser.add_argument('source', type=str, help='Video file, stream URL or camera index')
+    parser.add_argument('--backend', type=str, default='auto', choices=list(CAPTURE_BACKENDS),
+                       help='Capture backend')
+    parser.add_argument('--hw-decode', type=str, default='none', choices=list(HW_ACCELERATION),
+                       help='Hardware decode acceleration')
+    parser.add_argument('--threads', type=int, default=None, help='Decoder threads')
+    parser.add_argument('--frame-step', type=int, default=1, help='Decode every Nth frame')
+    parser.add_argument('--max-width', type=int, default=None, help='Downscale decoded frames to this width')
+    parser.add_argument('--frames', type=int, default=300, help='Maximum frames to read per run')
+
+    args = parser.parse_args()
+
+    runs = [('default cv2.VideoCapture', {}, 1, None)]
+    options = {'backend': args.backend, 'hw_decode': args.hw_decode, 'threads': args.threads}
+    runs.append(('configured reader', options, args.frame_step, args.max_width))
+
+    print("🎞️ Video Decode Benchmark")
+    print("=" * 60)
+    for name, capture_options, frame_step, max_width in runs:
+        reader = open_reader(args.source, frame_step, max_width, **capture_options)
+        if reader is None:
+            print(f"{name}: failed to open")
+            continue
+        start = time.perf_counter()
+        frames = 0
+        size = '-'
+        while frames < args.frames:
+            ret, frame = reader.read()
+            if not ret:
+                break
+            frames += 1
+            size = f"{frame.shape[1]}x{frame.shape[0]}"
+        elapsed = time.perf_counter() - start
+        reader.release()
+        print(f"{name:<26} {frames:>5} frames ({size}), {reader.grabbed_frames} grabbed, "
+              f"{frames / elapsed if elapsed > 0 else 0:.1f} decoded fps, "
+              f"{reader.grabbed_frames / elapsed if elapsed > 0 else 0:.1f} source fps")
+
+if __name__ == "__main__":
+    main()
@@ -3,15 +3,15 @@
 from flask import Flask, render_template, Response, request, jsonify
 from flask_cors import CORS
 import cv2
-import numpy as np
-import threading
 import time
 import os
 import json
 from datetime import datetime
 import logging
 
-from object_detection_tracking import ObjectTracker
+from metrics import prometheus_text
+from model_registry import registry
+from session_manager import SessionManager, model_settings
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,92 +19,26 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
-camera = None
-output_frame = None
-lock = threading.Lock()
-tracker = None
-is_processing = False
-detection_stats = {
+sessions = SessionManager()
+DEFAULT_SESSION = 'default'
+
+# Served by /get_stats when the default session is not running
+IDLE_STATS = {
     'total_objects': 0,
     'current_objects': 0,
     'fps': 0,
     'frame_count': 0
 }
 
-def initialize_camera(source=0):
-    global camera
-    try:
-        if isinstance(source, str) and source.isdigit():
-            source = int(source)
-        camera = cv2.VideoCapture(source)
-        if not camera.isOpened():
-            logger.error("Failed to open camera")
-            return False
-        logger.info(f"Camera initialized with source: {source}")
-        return True
-    except Exception as e:
-        logger.error(f"Error initializing camera: {e}")
-        return False
-
-def process_frames():
-    global output_frame, tracker, is_processing, detection_stats
-    
-    if not camera:
-        return
-    
-    frame_count = 0
-    start_time = time.time()
-    
-    while is_processing:
-        ret, frame = camera.read()
-        if not ret:
-            break
-        
-        frame_count += 1
-        
-        detections = tracker.detect_objects(frame)
-        
-        tracks = tracker.update_tracking(detections)
-        
-        frame = tracker.draw_detections(frame, tracks)
-        
-        elapsed_time = time.time() - start_time
-        current_fps = frame_count / elapsed_time if elapsed_time > 0 else 0
-        
-        detection_stats.update({
-            'total_objects': len(tracks),
-            'current_objects': len([t for t in tracks.values() if t['active']]),
-            'fps': current_fps,
-            'frame_count': frame_count
-        })
-        
-        info_text = f"FPS: {current_fps:.1f} | Objects: {len(tracks)}"
-        cv2.putText(frame, info_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-        
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        cv2.putText(frame, timestamp, (10, frame.shape[0] - 10), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        
-        with lock:
-            output_frame = frame.copy()
-        
-        time.sleep(0.03)
+def session_stats(session_id=DEFAULT_SESSION):
+    session = sessions.get(session_id)
+    return session.stats if session else IDLE_STATS
 
-def generate_frames():
+def generate_frames(session, max_fps=None):
     """Generate video frames for streaming"""
-    global output_frame
-    
-    while True:
-        with lock:
-            if output_frame is None:
-                continue
-            
-            (flag, encoded_image) = cv2.imencode(".jpg", output_frame)
-            if not flag:
-                continue
-        
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + encoded_image.tobytes() + b'\r\n')
+    if max_fps is None:
+        max_fps = session.max_fps
+    return session.broadcaster.stream(max_fps=max_fps)
 
 @app.route('/')
 def index():
@@ -112,94 +46,176 @@ def index():
     return render_template('index.html')
 
 @app.route('/video_feed')
-def video_feed():
+@app.route('/video_feed/<session_id>')
+def video_feed(session_id=DEFAULT_SESSION):
     """Video streaming route"""
-    return Response(generate_frames(),
+    session = sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': f'No running session: {session_id}'}), 404
+    
+    max_fps = request.args.get('max_fps', None, type=float)
+    return Response(generate_frames(session, max_fps),
                    mimetype='multipart/x-mixed-replace; boundary=frame')
 
-@app.route('/start_detection', methods=['POST'])
-def start_detection():
-    """Start object detection and tracking"""
-    global tracker, is_processing
-    
+def start_detection_with(data):
+    """Start object detection and tracking; returns (payload, status)"""
     try:
-        data = request.get_json()
-        source = data.get('source', 0)
-        confidence = data.get('confidence', 0.5)
-        nms = data.get('nms', 0.4)
-        
-        if not initialize_camera(source):
-            return jsonify({'error': 'Failed to initialize camera'}), 500
-        
-        tracker = ObjectTracker(
-            confidence_threshold=confidence,
-            nms_threshold=nms
-        )
-        
-        is_processing = True
-        processing_thread = threading.Thread(target=process_frames)
-        processing_thread.daemon = True
-        processing_thread.start()
-        
-        logger.info("Object detection started")
-        return jsonify({'status': 'success', 'message': 'Detection started'})
+        data = data or {}
+        session_id = str(data.get('id', DEFAULT_SESSION))
+        
+        try:
+            sessions.start(session_id, data)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        except RuntimeError as e:
+            return {'error': str(e)}, 500
+        
+        logger.info(f"Object detection started for session {session_id}")
+        return {'status': 'success', 'message': 'Detection started', 'id': session_id,
+                'stream': f"/video_feed/{session_id}"}, 200
     
     except Exception as e:
         logger.error(f"Error starting detection: {e}")
-        return jsonify({'error': str(e)}), 500
+        return {'error': str(e)}, 500
 
-@app.route('/stop_detection', methods=['POST'])
-def stop_detection():
-    """Stop object detection and tracking"""
-    global is_processing, camera
-    
+def stop_detection_now(session_id=DEFAULT_SESSION):
+    """Stop object detection and tracking; returns (payload, status)"""
     try:
-        is_processing = False
-        if camera:
-            camera.release()
+        if session_id == '*':
+            sessions.stop_all()
+        else:
+            sessions.stop(session_id)
         
         logger.info("Object detection stopped")
-        return jsonify({'status': 'success', 'message': 'Detection stopped'})
+        return {'status': 'success', 'message': 'Detection stopped', 'id': session_id}, 200
     
     except Exception as e:
         logger.error(f"Error stopping detection: {e}")
-        return jsonify({'error': str(e)}), 500
+        return {'error': str(e)}, 500
 
-@app.route('/get_stats')
-def get_stats():
-    """Get current detection statistics"""
-    return jsonify(detection_stats)
-
-@app.route('/save_frame', methods=['POST'])
-def save_frame():
-    """Save current frame"""
-    global output_frame
-    
+def save_current_frame(session_id=DEFAULT_SESSION):
+    """Save current frame; returns (payload, status)"""
     try:
+        session = sessions.get(session_id)
+        output_frame = session.broadcaster.latest_frame() if session else None
         if output_frame is None:
-            return jsonify({'error': 'No frame available'}), 400
+            return {'error': 'No frame available'}, 400
         
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"frame_{timestamp}.jpg"
+        filename = f"frame_{session_id}_{timestamp}.jpg"
         
         cv2.imwrite(filename, output_frame)
         
         logger.info(f"Frame saved as {filename}")
-        return jsonify({'status': 'success', 'filename': filename})
+        return {'status': 'success', 'filename': filename}, 200
     
     except Exception as e:
         logger.error(f"Error saving frame: {e}")
-        return jsonify({'error': str(e)}), 500
+        return {'error': str(e)}, 500
+
+def health_status():
+    """Health check payload"""
+    running = sessions.describe()
+    default = sessions.get(DEFAULT_SESSION)
+    return {
+        'status': 'ok',
+        'timestamp': datetime.now().isoformat(),
+        'is_processing': any(session['running'] for session in running.values()),
+        'camera_initialized': default is not None and default.running,
+        'sessions': {session_id: {'running': session['running'], 'stream': session['stream_stats']}
+                     for session_id, session in running.items()},
+        'loaded_models': len(registry.handles),
+        'models': registry.stats()
+    }
+
+def metrics_text():
+    """Prometheus text exposition of per-stage latencies and session gauges"""
+    running = sessions.all()
+    
+    def gauge(help_text, value):
+        return help_text, [({'session': session.id}, value(session)) for session in running]
+    
+    def counter(help_text, value):
+        return gauge(help_text, value) + ('counter',)
+    
+    return prometheus_text(
+        [({'session': session.id}, session.metrics) for session in running],
+        {
+            'detection_fps': gauge('Processed frames per second over the last 2 seconds',
+                                   lambda s: round(s.stats['fps'], 3)),
+            'detection_unique_tracks_total': counter('Tracks created since the session started',
+                                                     lambda s: s.stats.get('unique_tracks', 0)),
+            'detection_frames_total': counter('Frames processed', lambda s: s.stats['frame_count']),
+            'detection_active_tracks': gauge('Active tracks', lambda s: s.stats.get('active_tracks', 0)),
+            'detection_stream_viewers': gauge('Connected MJPEG viewers', lambda s: s.broadcaster.viewers),
+            'detection_stats_subscribers': gauge('Connected statistics streams', lambda s: s.publisher.subscribers),
+            'detection_model_load_seconds': ('Network load time', [
+                ({'weights': model['weights']}, model['load_seconds']) for model in registry.stats()
+            ])
+        }
+    )
+
+def warm_up_models(runs=1):
+    """Load the default model and run warm-up passes before the first request"""
+    start = time.perf_counter()
+    tracker = sessions.base_tracker(**model_settings({}))
+    if tracker.model is not None:
+        tracker.model.warm_up(runs)
+    logger.info(f"Models ready in {time.perf_counter() - start:.2f}s")
+
+def request_session_id():
+    data = request.get_json(silent=True) or {}
+    return str(data.get('id', request.args.get('id', DEFAULT_SESSION)))
+
+@app.route('/start_detection', methods=['POST'])
+def start_detection():
+    """Start object detection and tracking"""
+    payload, status = start_detection_with(request.get_json(silent=True))
+    return jsonify(payload), status
+
+@app.route('/stop_detection', methods=['POST'])
+def stop_detection():
+    """Stop object detection and tracking"""
+    payload, status = stop_detection_now(request_session_id())
+    return jsonify(payload), status
+
+@app.route('/get_stats')
+@app.route('/get_stats/<session_id>')
+def get_stats(session_id=DEFAULT_SESSION):
+    """Get current detection statistics"""
+    return jsonify(session_stats(session_id))
+
+@app.route('/stats_stream')
+@app.route('/stats_stream/<session_id>')
+def stats_stream(session_id=DEFAULT_SESSION):
+    """Server-Sent Events stream of statistics snapshots"""
+    session = sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': f'No running session: {session_id}'}), 404
+    
+    return Response(session.publisher.stream(), mimetype='text/event-stream',
+                   headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/sessions')
+def list_sessions():
+    """List running detection sessions"""
+    return jsonify(sessions.describe())
+
+@app.route('/save_frame', methods=['POST'])
+def save_frame():
+    """Save current frame"""
+    payload, status = save_current_frame(request_session_id())
+    return jsonify(payload), status
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics endpoint"""
+    return Response(metrics_text(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/health')
 def health():
     """Health check endpoint"""
-    return jsonify({
-        'status': 'ok',
-        'timestamp': datetime.now().isoformat(),
-        'is_processing': is_processing,
-        'camera_initialized': camera is not None and camera.isOpened() if camera else False
-    })
+    return jsonify(health_status())
 
 if __name__ == '__main__':
     print("🌐 Object Detection Web Interface")
@@ -208,4 +224,6 @@ if __name__ == '__main__':
     print("Health check: http://localhost:5020/health")
     print("=" * 40)
     
-    app.run(host='0.0.0.0', port=5020, debug=True, threaded=True) 
\ No newline at end of file
+    warm_up_models()
+    # The reloader would re-run this module in a child process and load the models twice
+    app.run(host='0.0.0.0', port=5020, debug=True, threaded=True, use_reloader=False) 
\ No newline at end of file